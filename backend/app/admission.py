@@ -0,0 +1,278 @@
+"""
+Upstream Admission Control
+Per-host concurrency caps and token-bucket rate limits with a bounded, deadline-limited wait queue
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Any, List, Optional, Sequence
+from app.config import settings
+from app.metrics import registry
+from app.resilience import UpstreamUnavailableError
+from app.timing import phase
+
+QUEUE_WAIT = registry.histogram(
+    "adiyogi_upstream_queue_wait_seconds", "Time an upstream request waited for admission, by host", ("host",)
+)
+ADMISSION_REJECTIONS = registry.counter(
+    "adiyogi_upstream_admission_rejections",
+    "Upstream requests refused admission, by host and reason (queue_full, rate_limited, timeout)",
+    ("host", "reason"),
+)
+
+
+class TokenBucket:
+    """One rate window: capacity tokens, refilled evenly over period seconds"""
+
+    def __init__(self, capacity: float, period: float):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class RateLimit:
+    """
+    Several token buckets that must all grant a token, e.g. per-minute, per-hour and per-day quotas
+
+    A limit configured for a domain suffix is shared by every host under it,
+    since providers such as Open-Meteo count requests across their API hosts.
+    The buckets are per process, so each of `workers` processes gets an equal
+    share of every window's rate (and of its burst, down to one request).
+    """
+
+    def __init__(self, name: str, windows: Sequence[Sequence[float]], workers: int = 1):
+        self.name = name
+        self.workers = workers
+        self.buckets = []
+        for requests, period in windows:
+            capacity = max(1.0, requests / workers)
+            self.buckets.append(TokenBucket(capacity, period * workers * capacity / requests))
+
+    def delay(self) -> float:
+        now = time.monotonic()
+        return max((bucket.delay(now) for bucket in self.buckets), default=0.0)
+
+    def take(self):
+        for bucket in self.buckets:
+            bucket.tokens -= 1
+
+    def headroom(self) -> float:
+        """Fraction of the tightest bucket still available"""
+        now = time.monotonic()
+        for bucket in self.buckets:
+            bucket._refill(now)
+        return min((bucket.tokens / bucket.capacity for bucket in self.buckets), default=1.0)
+
+    def stats(self) -> List[Dict[str, float]]:
+        now = time.monotonic()
+        for bucket in self.buckets:
+            bucket._refill(now)
+        return [
+            {"capacity": bucket.capacity, "per_second": round(bucket.rate, 4), "tokens": round(bucket.tokens, 2)}
+            for bucket in self.buckets
+        ]
+
+
+class HostAdmission:
+    """
+    Admission gate for one upstream host
+
+    A request is admitted when the host has a free concurrency slot and its
+    rate limit grants a token; otherwise it joins a FIFO queue. The queue is
+    bounded, and a request waits at most upstream_queue_timeout_seconds; one
+    that cannot be admitted in time (or that the rate limit could not admit
+    before its deadline anyway) fails with UpstreamUnavailableError instead of
+    being sent and earning a 429.
+    """
+
+    def __init__(self, host: str, concurrency: int, rate: Optional[RateLimit]):
+        self.host = host
+        self.concurrency = concurrency
+        self.rate = rate
+        self.in_use = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._wait = QUEUE_WAIT.labels(host)
+        self._rejections = {
+            reason: ADMISSION_REJECTIONS.labels(host, reason) for reason in ("queue_full", "rate_limited", "timeout")
+        }
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    async def acquire(self):
+        """Wait for a slot and a token; release() must follow once the request completes"""
+        if not self._waiters and self._try_admit():
+            self._wait.observe(0.0)
+            return
+
+        if self.queue_depth >= settings.upstream_queue_max_waiters:
+            self._reject("queue_full", "admission queue full")
+        token_delay = self.rate.delay() if self.rate is not None else 0.0
+        if token_delay > settings.upstream_queue_timeout_seconds:
+            self._reject("rate_limited", "rate limit exhausted", retry_after=token_delay)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.queued += 1
+        self._wake()
+        started = time.perf_counter()
+        try:
+            with phase("queue", host=self.host):
+                await asyncio.wait_for(future, settings.upstream_queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            self._wait.observe(time.perf_counter() - started)
+            self._reject("timeout", "timed out waiting for admission")
+        except BaseException:
+            # Admitted just as the caller was cancelled: hand the slot back
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        self._wait.observe(time.perf_counter() - started)
+
+    def release(self):
+        self.in_use -= 1
+        self._wake()
+
+    def _try_admit(self) -> bool:
+        if self.in_use >= self.concurrency:
+            return False
+        if self.rate is not None:
+            if self.rate.delay() > 0:
+                return False
+            self.rate.take()
+        self.in_use += 1
+        self.admitted += 1
+        return True
+
+    def _wake(self):
+        """Admit queued requests in order while slots and tokens allow"""
+        while self._waiters:
+            waiter = self._waiters[0]
+            if waiter.done():  # timed out or cancelled
+                self._waiters.popleft()
+                continue
+            if self.in_use >= self.concurrency:
+                return
+            token_delay = self.rate.delay() if self.rate is not None else 0.0
+            if token_delay > 0:
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(token_delay, self._on_timer)
+                return
+            self._try_admit()
+            self._waiters.popleft()
+            waiter.set_result(None)
+
+    def _on_timer(self):
+        self._timer = None
+        self._wake()
+
+    def _reject(self, reason: str, message: str, retry_after: Optional[float] = None):
+        self.rejected += 1
+        self._rejections[reason].inc()
+        raise UpstreamUnavailableError(self.host, message, retry_after)
+
+    def headroom(self) -> float:
+        """Unused share of this host's concurrency and rate budget (0 while requests are queued)"""
+        if self.queue_depth:
+            return 0.0
+        headroom = 1 - self.in_use / self.concurrency
+        if self.rate is not None:
+            headroom = min(headroom, self.rate.headroom())
+        return max(0.0, headroom)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "in_use": self.in_use,
+            "queue_depth": self.queue_depth,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "rate_limit": self.rate.name if self.rate is not None else None,
+        }
+
+
+class AdmissionController:
+    """Creates one HostAdmission per upstream host, sharing rate limits configured for a domain"""
+
+    def __init__(self):
+        self.hosts: Dict[str, HostAdmission] = {}
+        self.rate_limits: Dict[str, RateLimit] = {}
+
+    def for_host(self, host: str) -> Optional[HostAdmission]:
+        if not settings.upstream_admission_enabled:
+            return None
+        admission = self.hosts.get(host)
+        if admission is None:
+            admission = HostAdmission(host, self._concurrency_for(host), self._rate_limit_for(host))
+            self.hosts[host] = admission
+        return admission
+
+    def headroom(self, host: str) -> float:
+        """Unused share of a host's admission budget (1.0 when admission control is off)"""
+        admission = self.for_host(host)
+        return admission.headroom() if admission is not None else 1.0
+
+    @staticmethod
+    def _concurrency_for(host: str) -> int:
+        limit = settings.upstream_host_concurrency_limits.get(host)
+        if limit is None:
+            limit = settings.upstream_host_connection_limits.get(host, settings.upstream_max_connections_per_host)
+        return max(1, limit)
+
+    def _rate_limit_for(self, host: str) -> Optional[RateLimit]:
+        # Exact host first, then the longest configured parent domain
+        name = _match_domain(host, settings.upstream_rate_limits)
+        if name is None:
+            return None
+        rate = self.rate_limits.get(name)
+        if rate is None:
+            rate = self.rate_limits[name] = RateLimit(name, settings.upstream_rate_limits[name], _worker_count())
+        return rate
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.upstream_admission_enabled,
+            "hosts": {host: admission.stats() for host, admission in self.hosts.items()},
+            "rate_limits": {name: rate.stats() for name, rate in self.rate_limits.items()},
+        }
+
+
+def _worker_count() -> int:
+    """Worker processes the configured quotas are split between"""
+    workers = settings.upstream_rate_limit_workers or int(os.environ.get("WEB_CONCURRENCY") or 1)
+    return max(1, workers)
+
+
+def _match_domain(host: str, configured: Dict[str, Any]) -> Optional[str]:
+    if host in configured:
+        return host
+    matches = [name for name in configured if host.endswith("." + name)]
+    return max(matches, key=len) if matches else None
+
+
+admission_controller = AdmissionController()
+
+registry.collected(
+    "adiyogi_upstream_queue_depth",
+    "Upstream requests waiting for admission, by host",
+    "gauge",
+    lambda: (("", {"host": host}, admission.queue_depth) for host, admission in admission_controller.hosts.items()),
+)
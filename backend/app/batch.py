@@ -0,0 +1,71 @@
+"""
+Multi-Location Batches
+Per-point cached lookups for many coordinates, fetched upstream with comma-separated coordinate lists
+"""
+
+from typing import Dict, Any, Awaitable, Callable, List, Tuple
+from app.config import settings
+from app.cache import CacheNamespace
+from app.grid import snap, echo_coordinates
+
+Point = Tuple[float, float]
+
+
+def join_coordinates(points: List[Point]) -> Tuple[str, str]:
+    """Comma-separated latitude and longitude lists for an Open-Meteo multi-point request"""
+    latitudes = ",".join(str(lat) for lat, _ in points)
+    longitudes = ",".join(str(lon) for _, lon in points)
+    return latitudes, longitudes
+
+
+def split_locations(data: Any) -> List[Dict[str, Any]]:
+    """Open-Meteo returns an object for one point and a list for several"""
+    return data if isinstance(data, list) else [data]
+
+
+async def load_points(
+    namespace: CacheNamespace,
+    dataset: str,
+    coordinates: List[Dict[str, float]],
+    cache_key: Callable[[float, float], str],
+    fetch_many: Callable[[List[Point]], Awaitable[List[Any]]],
+    echo: Callable[[Any, float, float], Any] = echo_coordinates,
+) -> List[Any]:
+    """
+    Look up many locations through one cache namespace
+
+    Points are snapped to the dataset grid and share entries with the
+    single-point endpoints. Only missing grid points are fetched, in
+    concurrent chunks of settings.batch_chunk_size points. A chunk upstream
+    rejects (4xx) is retried point by point, so one bad point fails alone.
+
+    Args:
+        namespace: Cache namespace of the single-point endpoint
+        dataset: Grid dataset name passed to snap()
+        coordinates: List of {"lat": float, "lon": float} dictionaries
+        cache_key: Builds the single-point cache key from a grid point
+        fetch_many: Fetches a list of grid points upstream, in order
+        echo: Rewrites a cached payload with the caller's coordinates
+
+    Returns:
+        One payload per input coordinate, in input order; points whose
+        chunk failed get {"error": "..."}
+    """
+    grid_points: Dict[str, Point] = {}
+    keys = []
+    for coord in coordinates:
+        grid_point = snap(dataset, coord["lat"], coord["lon"])
+        key = cache_key(*grid_point)
+        grid_points[key] = grid_point
+        keys.append(key)
+
+    values = await namespace.get_or_load_many(
+        keys,
+        lambda batch: fetch_many([grid_points[key] for key in batch]),
+        chunk_size=settings.batch_chunk_size,
+    )
+
+    return [
+        {"error": str(value)} if isinstance(value, Exception) else echo(value, coord["lat"], coord["lon"])
+        for value, coord in zip(values, coordinates)
+    ]
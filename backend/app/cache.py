@@ -0,0 +1,699 @@
+"""
+Response Cache
+Bounded LRU + TTL cache shared by every service, partitioned into per-service namespaces,
+with an optional shared second-level backend for multi-worker deployments and a persistent
+on-disk tier for long-lived namespaces
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from contextvars import Context, ContextVar
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Sequence, Tuple, Union
+from pydantic import BaseModel
+from app.config import settings
+from app.resilience import is_client_error
+from app.singleflight import SingleFlight
+from app.timing import phase
+from app.cache_backends import (
+    CacheBackend,
+    DiskCacheBackend,
+    create_backend,
+    create_disk_backend,
+    encode_entry,
+    decode_entry,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    """A cached value with its soft/hard expiry and estimated size"""
+
+    value: Any
+    size: int
+    stored_at: float  # wall-clock time the value was stored
+    fresh_until: float  # time.monotonic() soft TTL deadline; stale but servable after this
+    expires_at: float  # time.monotonic() hard TTL deadline; unusable after this
+    origin: str = "upstream"  # where the value was loaded from: upstream, shared or disk
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.monotonic() < self.fresh_until
+
+
+@dataclass
+class NamespaceStats:
+    """Hit/miss/eviction counters for a single namespace"""
+
+    hits: int = 0
+    stale_hits: int = 0
+    shared_hits: int = 0  # L1 misses answered by the shared backend
+    disk_hits: int = 0  # L1 misses answered by the persistent disk store
+    misses: int = 0  # L1 misses, including those then answered by shared_hits or disk_hits
+    prewarms: int = 0  # entries reloaded ahead of expiry by the prewarm scheduler
+    stale_if_error_hits: int = 0  # failed loads answered with an expired entry
+    refreshes: int = 0
+    refresh_failures: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+
+@dataclass
+class CacheLookup:
+    """One get_or_load call recorded by a cache trace"""
+
+    namespace: str
+    key: str
+    status: str  # hit, stale, shared, disk, miss, uncacheable or volatile
+    entry: Optional[CacheEntry]  # None when the load failed
+
+
+_trace: ContextVar[Optional[List[CacheLookup]]] = ContextVar("cache_trace", default=None)
+
+
+def start_trace() -> List[CacheLookup]:
+    """
+    Record every get_or_load made by the current task and the tasks it spawns
+
+    Returns:
+        The list the lookups are appended to
+    """
+    lookups: List[CacheLookup] = []
+    _trace.set(lookups)
+    return lookups
+
+
+def current_trace() -> Optional[List[CacheLookup]]:
+    """The trace the current task records into, if any"""
+    return _trace.get()
+
+
+def mark_uncacheable():
+    """Flag the current response as incomplete so HTTP caching skips it"""
+    lookups = _trace.get()
+    if lookups is not None:
+        lookups.append(CacheLookup("", "", "uncacheable", None))
+
+
+def mark_volatile():
+    """Flag the current response as carrying per-request details (timings, cache status) so HTTP caching validates it but never replays its body"""
+    lookups = _trace.get()
+    if lookups is not None:
+        lookups.append(CacheLookup("", "", "volatile", None))
+
+
+@dataclass
+class PrewarmContext:
+    """Marks get_or_load calls made on behalf of the prewarm scheduler"""
+
+    lead_seconds: float  # reload entries with less freshness left than this
+    loads: int = 0  # entries actually loaded (upstream fetches spent)
+
+
+_prewarm: ContextVar[Optional[PrewarmContext]] = ContextVar("cache_prewarm", default=None)
+
+
+def start_prewarm(lead_seconds: float) -> PrewarmContext:
+    """
+    Switch get_or_load in the current task to prewarm mode
+
+    Entries with more than lead_seconds of freshness left are returned
+    untouched; others (including missing ones) are reloaded now. Prewarm calls
+    leave hit/miss statistics and LRU order alone.
+    """
+    context = PrewarmContext(lead_seconds)
+    _prewarm.set(context)
+    return context
+
+
+def summarize_trace(lookups: List[CacheLookup]) -> str:
+    """Collapse a trace into one status: the worst of miss, stale, disk, shared, hit"""
+    if not lookups:
+        return "none"
+    statuses = {lookup.status for lookup in lookups}
+    for status in ("miss", "stale", "disk", "shared"):
+        if status in statuses:
+            return status
+    return "hit"
+
+
+def estimate_size(value: Any) -> int:
+    """Estimate the memory footprint of a value by its serialized JSON length"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, BaseModel):
+        return len(value.model_dump_json())
+    try:
+        return len(json.dumps(value, separators=(",", ":"), default=str))
+    except (TypeError, ValueError):
+        return 1024
+
+
+class Cache:
+    """LRU cache bounded by entry count and estimated bytes, with per-namespace TTLs"""
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        backend: Optional[CacheBackend] = None,
+        disk: Optional[DiskCacheBackend] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self.disk = disk
+        self._entries: "OrderedDict[Tuple[str, str], CacheEntry]" = OrderedDict()
+        self._stats: Dict[str, NamespaceStats] = {}
+        self._bytes = 0
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def namespace(
+        self,
+        name: str,
+        ttl_seconds: float,
+        stale_seconds: Optional[float] = None,
+    ) -> "CacheNamespace":
+        """
+        Get a view of the cache bound to one namespace
+
+        Args:
+            name: Namespace name, used for statistics
+            ttl_seconds: Soft TTL; entries are served as fresh until it passes
+            stale_seconds: Extra window after the soft TTL during which the stale
+                value is served while a background refresh runs (defaults to
+                settings.cache_stale_seconds for the namespace)
+        """
+        self._stats.setdefault(name, NamespaceStats())
+        if stale_seconds is None:
+            stale_seconds = settings.cache_stale_seconds.get(name, 0)
+        return CacheNamespace(self, name, ttl_seconds, stale_seconds)
+
+    def lookup(self, namespace: str, key: str) -> Optional[CacheEntry]:
+        """Get an entry that has not passed its hard TTL, refreshing its LRU position"""
+        stats = self._stats.setdefault(namespace, NamespaceStats())
+        entry = self._entries.get((namespace, key))
+        if entry is None:
+            stats.misses += 1
+            return None
+
+        now = time.monotonic()
+        if entry.expires_at <= now:
+            # Past its hard TTL, but kept a while to answer loads that fail
+            if now >= entry.expires_at + settings.cache_stale_if_error_seconds:
+                self._remove((namespace, key))
+                stats.expirations += 1
+            stats.misses += 1
+            return None
+
+        self._entries.move_to_end((namespace, key))
+        if entry.is_fresh:
+            stats.hits += 1
+        else:
+            stats.stale_hits += 1
+        return entry
+
+    def lookup_stale(self, namespace: str, key: str) -> Optional[CacheEntry]:
+        """Get an entry past its hard TTL that is still retained for stale-if-error"""
+        entry = self._entries.get((namespace, key))
+        if entry is None or time.monotonic() >= entry.expires_at + settings.cache_stale_if_error_seconds:
+            return None
+        self._stats[namespace].stale_if_error_hits += 1
+        return entry
+
+    def peek(self, namespace: str, key: str) -> Optional[CacheEntry]:
+        """Get an unexpired entry without touching statistics or LRU order"""
+        entry = self._entries.get((namespace, key))
+        if entry is None or entry.expires_at <= time.monotonic():
+            return None
+        return entry
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Get a value if it has not passed its hard TTL"""
+        entry = self.lookup(namespace, key)
+        return entry.value if entry is not None else None
+
+    def set(
+        self,
+        namespace: str,
+        key: str,
+        value: Any,
+        ttl_seconds: float,
+        stale_seconds: float = 0,
+        stored_at: Optional[float] = None,
+    ) -> CacheEntry:
+        """Store a value, evicting least-recently-used entries to stay within budget"""
+        now = time.monotonic()
+        entry = CacheEntry(
+            value=value,
+            size=estimate_size(value),
+            stored_at=stored_at or time.time(),
+            fresh_until=now + ttl_seconds,
+            expires_at=now + ttl_seconds + stale_seconds,
+        )
+        size = entry.size
+        if size > self.max_bytes:
+            logger.warning("Not caching %s/%s: %d bytes exceeds the cache byte budget", namespace, key, size)
+            return entry
+
+        if (namespace, key) in self._entries:
+            self._remove((namespace, key))
+
+        self._entries[(namespace, key)] = entry
+        stats = self._stats.setdefault(namespace, NamespaceStats())
+        stats.entries += 1
+        stats.bytes += size
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats[oldest[0]].evictions += 1
+
+        return entry
+
+    def delete(self, namespace: str, key: str):
+        """Drop a single entry if present"""
+        if (namespace, key) in self._entries:
+            self._remove((namespace, key))
+
+    def _remove(self, full_key: Tuple[str, str]):
+        entry = self._entries.pop(full_key)
+        stats = self._stats[full_key[0]]
+        stats.entries -= 1
+        stats.bytes -= entry.size
+        self._bytes -= entry.size
+
+    def sweep(self) -> int:
+        """Remove every expired entry past its stale-if-error window, returning how many were dropped"""
+        now = time.monotonic() - settings.cache_stale_if_error_seconds
+        expired = [k for k, entry in self._entries.items() if entry.expires_at <= now]
+        for full_key in expired:
+            self._remove(full_key)
+            self._stats[full_key[0]].expirations += 1
+        return len(expired)
+
+    async def _sweep_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            removed = self.sweep()
+            if removed:
+                logger.debug("Cache sweep removed %d expired entries", removed)
+            for store in (self.backend, self.disk):
+                if store is None:
+                    continue
+                try:
+                    await store.purge_expired()
+                except Exception as e:
+                    logger.warning("%s cache purge failed: %s", store.name, e)
+
+    def start_sweeper(self, interval: Optional[float] = None):
+        """Start the periodic expiry sweep (called from the app lifespan)"""
+        if self._sweeper is None:
+            interval = interval or settings.cache_sweep_interval_seconds
+            self._sweeper = asyncio.create_task(self._sweep_loop(interval))
+
+    async def stop_sweeper(self):
+        """Stop the periodic expiry sweep"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    async def close(self):
+        """Stop the sweeper and release the shared backend and disk store"""
+        await self.stop_sweeper()
+        for store in (self.backend, self.disk):
+            if store is not None:
+                await store.close()
+
+    def clear(self):
+        """Drop every entry (statistics are kept)"""
+        for full_key in list(self._entries):
+            self._remove(full_key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Global usage plus per-namespace hit/miss/eviction statistics"""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "backend": self.backend.name if self.backend is not None else "memory",
+            "disk": self.disk.usage() if self.disk is not None else None,
+            "namespaces": self.namespace_stats(),
+        }
+
+    def namespace_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-namespace counters alone, without the global or tier usage"""
+        return {name: asdict(stats) for name, stats in self._stats.items()}
+
+
+class CacheNamespace:
+    """View of the shared cache bound to one namespace, its TTLs and its in-flight fetches"""
+
+    def __init__(self, cache: Cache, name: str, ttl_seconds: float, stale_seconds: float = 0):
+        self.cache = cache
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.flight = SingleFlight(name)
+        self._refresh_tasks: Dict[str, asyncio.Task] = {}
+
+        # Lower tiers consulted on an in-process miss, nearest first
+        self._tiers: List[CacheBackend] = []
+        if cache.backend is not None:
+            self._tiers.append(cache.backend)
+        if cache.disk is not None and name in settings.cache_disk_namespaces:
+            self._tiers.append(cache.disk)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a cached value (fresh or stale), or None on a miss"""
+        return self.cache.get(self.name, key)
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> CacheEntry:
+        """Store a value in the in-process cache using the namespace TTL unless one is given"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        return self.cache.set(self.name, key, value, ttl, self.stale_seconds)
+
+    def delete(self, key: str):
+        """Drop a cached value"""
+        self.cache.delete(self.name, key)
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl_seconds: Optional[float] = None,
+    ) -> Any:
+        """
+        Get a value from the cache, loading it on a miss
+
+        Fresh entries are returned directly. Stale entries (past the soft TTL but
+        within the hard TTL) are returned immediately while a single background
+        task refreshes them. In-process misses fall through to the shared backend
+        and the disk store (if configured for the namespace) and then to the
+        loader; concurrent misses on the same key share one in-flight call.
+
+        Args:
+            key: Cache key
+            loader: Zero-argument coroutine function fetching the value upstream
+            ttl_seconds: Soft TTL override for this value
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        with phase("cache", namespace=self.name):
+            return await self._get_or_load(key, loader, ttl_seconds)
+
+    async def _get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl_seconds: Optional[float],
+    ) -> Any:
+        prewarm = _prewarm.get()
+        if prewarm is not None:
+            return await self._prewarm(key, loader, ttl_seconds, prewarm)
+
+        lookups = _trace.get()
+        entry = self.cache.lookup(self.name, key)
+        if entry is None:
+            try:
+                entry = await self.flight.do(key, lambda: self._fill(key, loader, ttl_seconds))
+            except Exception as e:
+                # Stale-if-error: an expired entry beats an error while upstream is down
+                entry = self.cache.lookup_stale(self.name, key)
+                if entry is None:
+                    if lookups is not None:
+                        lookups.append(CacheLookup(self.name, key, "miss", None))
+                    raise
+                logger.warning("Serving expired %s/%s after a failed load: %s", self.name, key, e)
+                if lookups is not None:
+                    lookups.append(CacheLookup(self.name, key, "stale", entry))
+                return entry.value
+            except BaseException:
+                if lookups is not None:
+                    lookups.append(CacheLookup(self.name, key, "miss", None))
+                raise
+            status = "miss" if entry.origin == "upstream" else entry.origin
+        else:
+            status = "hit" if entry.is_fresh else "stale"
+
+        if not entry.is_fresh:
+            self._schedule_refresh(key, loader, ttl_seconds)
+
+        if lookups is not None:
+            lookups.append(CacheLookup(self.name, key, status, entry))
+        return entry.value
+
+    async def get_or_load_many(
+        self,
+        keys: Sequence[str],
+        loader: Callable[[List[str]], Awaitable[List[Any]]],
+        ttl_seconds: Optional[float] = None,
+        chunk_size: int = 100,
+    ) -> List[Union[Any, Exception]]:
+        """
+        Get many values at once, loading only the keys that miss
+
+        Cached keys (fresh or stale) are served like get_or_load, keys already
+        being loaded elsewhere are joined, lower tiers are checked next, and the
+        rest are loaded in chunks of chunk_size with the chunks running
+        concurrently.
+
+        Args:
+            keys: Cache keys, duplicates allowed
+            loader: Coroutine function taking a list of keys and returning
+                their values in the same order
+            ttl_seconds: Soft TTL override for these values
+            chunk_size: Most keys passed to one loader call
+
+        Returns:
+            One value per input key, in input order; keys whose chunk failed
+            get the exception instead
+        """
+        with phase("cache", namespace=self.name):
+            return await self._get_or_load_many(keys, loader, ttl_seconds, chunk_size)
+
+    async def _get_or_load_many(
+        self,
+        keys: Sequence[str],
+        loader: Callable[[List[str]], Awaitable[List[Any]]],
+        ttl_seconds: Optional[float],
+        chunk_size: int,
+    ) -> List[Union[Any, Exception]]:
+        lookups = _trace.get()
+        results: Dict[str, Union[Any, Exception]] = {}
+        missing: List[str] = []
+
+        def single(key: str) -> Callable[[], Awaitable[Any]]:
+            async def load_one() -> Any:
+                return (await loader([key]))[0]
+            return load_one
+
+        for key in dict.fromkeys(keys):
+            entry = self.cache.lookup(self.name, key)
+            if entry is None:
+                missing.append(key)
+                continue
+            if not entry.is_fresh:
+                self._schedule_refresh(key, single(key), ttl_seconds)
+            results[key] = entry.value
+            if lookups is not None:
+                lookups.append(CacheLookup(self.name, key, "hit" if entry.is_fresh else "stale", entry))
+
+        async def join(key: str) -> Union[CacheEntry, Exception]:
+            try:
+                return await self.flight.do(key, lambda: self._fill(key, single(key), ttl_seconds))
+            except Exception as e:
+                return e
+
+        joined = [key for key in missing if self.flight.is_in_flight(key)]
+        pending = [key for key in missing if key not in joined]
+        tier_entries = await asyncio.gather(*(self._read_tiers(key) for key in pending))
+        to_fetch = [key for key, entry in zip(pending, tier_entries) if entry is None]
+
+        chunks = [to_fetch[i:i + chunk_size] for i in range(0, len(to_fetch), chunk_size)]
+        outcomes = await asyncio.gather(
+            *(join(key) for key in joined),
+            *(self._load_chunk(chunk, loader, ttl_seconds) for chunk in chunks),
+        )
+
+        loaded: Dict[str, Union[CacheEntry, Exception]] = dict(zip(joined, outcomes[:len(joined)]))
+        loaded.update((key, entry) for key, entry in zip(pending, tier_entries) if entry is not None)
+        for chunk_result in outcomes[len(joined):]:
+            loaded.update(chunk_result)
+
+        for key, outcome in loaded.items():
+            if isinstance(outcome, Exception):
+                entry = self.cache.lookup_stale(self.name, key)
+                if entry is not None:
+                    results[key] = entry.value
+                    status = "stale"
+                else:
+                    results[key] = outcome
+                    status = "miss"
+            else:
+                results[key] = outcome.value
+                status, entry = ("miss" if outcome.origin == "upstream" else outcome.origin), outcome
+            if lookups is not None:
+                lookups.append(CacheLookup(self.name, key, status, entry))
+
+        return [results[key] for key in keys]
+
+    async def _load_chunk(
+        self,
+        keys: List[str],
+        loader: Callable[[List[str]], Awaitable[List[Any]]],
+        ttl_seconds: Optional[float],
+    ) -> Dict[str, Union[CacheEntry, Exception]]:
+        try:
+            with phase("model", namespace=self.name):
+                values = await loader(keys)
+            if len(values) != len(keys):
+                raise ValueError(f"Expected {len(keys)} results from upstream, got {len(values)}")
+        except Exception as e:
+            if len(keys) > 1 and is_client_error(e):
+                # One rejected point fails the whole request; ask for each alone so only it fails
+                singles = await asyncio.gather(*(self._load_chunk([key], loader, ttl_seconds) for key in keys))
+                return {key: outcome for single in singles for key, outcome in single.items()}
+            return {key: e for key in keys}
+
+        entries: Dict[str, Union[CacheEntry, Exception]] = {}
+        for key, value in zip(keys, values):
+            entries[key] = self.set(key, value, ttl_seconds)
+            await self._write_tiers(key, value, self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        return entries
+
+    async def _fill(self, key: str, loader: Callable[[], Awaitable[Any]], ttl_seconds: Optional[float]) -> CacheEntry:
+        entry = await self._read_tiers(key)
+        if entry is not None:
+            return entry
+        return await self._load(key, loader, ttl_seconds)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl_seconds: Optional[float]) -> CacheEntry:
+        with phase("model", namespace=self.name):
+            value = await loader()
+        entry = self.set(key, value, ttl_seconds)
+        await self._write_tiers(key, value, self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        return entry
+
+    def _tier_key(self, key: str) -> str:
+        return f"{settings.cache_key_prefix}{self.name}:{key}"
+
+    async def _read_tiers(self, key: str) -> Optional[CacheEntry]:
+        """Copy an entry from the nearest lower tier holding it into the in-process cache"""
+        for depth, store in enumerate(self._tiers):
+            try:
+                raw = await store.get(self._tier_key(key))
+                if raw is None:
+                    continue
+                value, stored_at, fresh_until, expires_at = decode_entry(raw)
+            except Exception as e:
+                logger.warning("%s cache read of %s/%s failed: %s", store.name, self.name, key, e)
+                continue
+
+            now = time.time()
+            if expires_at <= now:
+                continue
+            if store is self.cache.disk:
+                self.cache._stats[self.name].disk_hits += 1
+            else:
+                self.cache._stats[self.name].shared_hits += 1
+            # Backfill the nearer tiers that missed
+            for upper in self._tiers[:depth]:
+                try:
+                    await upper.set(self._tier_key(key), raw, expires_at - now)
+                except Exception as e:
+                    logger.warning("%s cache write of %s/%s failed: %s", upper.name, self.name, key, e)
+            entry = self._store_decoded(key, value, stored_at, fresh_until, expires_at)
+            entry.origin = "disk" if store is self.cache.disk else "shared"
+            return entry
+        return None
+
+    def _store_decoded(
+        self, key: str, value: Any, stored_at: float, fresh_until: float, expires_at: float
+    ) -> CacheEntry:
+        now = time.time()
+        return self.cache.set(
+            self.name, key, value,
+            ttl_seconds=fresh_until - now,
+            stale_seconds=expires_at - fresh_until,
+            stored_at=stored_at,
+        )
+
+    async def _write_tiers(self, key: str, value: Any, ttl_seconds: float):
+        if not self._tiers:
+            return
+        now = time.time()
+        fresh_until = now + ttl_seconds
+        expires_at = fresh_until + self.stale_seconds
+        try:
+            raw = encode_entry(value, now, fresh_until, expires_at)
+        except Exception as e:
+            logger.warning("Cannot encode %s/%s for the lower cache tiers: %s", self.name, key, e)
+            return
+        for store in self._tiers:
+            try:
+                await store.set(self._tier_key(key), raw, expires_at - now)
+            except Exception as e:
+                logger.warning("%s cache write of %s/%s failed: %s", store.name, self.name, key, e)
+
+    async def _prewarm(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl_seconds: Optional[float],
+        prewarm: PrewarmContext,
+    ) -> Any:
+        entry = self.cache.peek(self.name, key)
+        if entry is None or entry.fresh_until - time.monotonic() < prewarm.lead_seconds:
+            # Another worker may already have refreshed the shared entry
+            tier_entry = await self._read_tiers(key)
+            if tier_entry is not None and tier_entry.fresh_until - time.monotonic() >= prewarm.lead_seconds:
+                return tier_entry.value
+            entry = await self.flight.do(key, lambda: self._load(key, loader, ttl_seconds))
+            self.cache._stats[self.name].prewarms += 1
+            prewarm.loads += 1
+        return entry.value
+
+    def _schedule_refresh(self, key: str, loader: Callable[[], Awaitable[Any]], ttl_seconds: Optional[float]):
+        if key in self._refresh_tasks or self.flight.is_in_flight(key):
+            return
+        # Started in an empty context: the refresh outlives the request that noticed the stale entry,
+        # so it must not record into that request's timing, cache trace or prewarm budget
+        task = Context().run(asyncio.create_task, self._refresh(key, loader, ttl_seconds))
+        self._refresh_tasks[key] = task
+        task.add_done_callback(lambda _: self._refresh_tasks.pop(key, None))
+
+    async def _refresh(self, key: str, loader: Callable[[], Awaitable[Any]], ttl_seconds: Optional[float]):
+        stats = self.cache._stats[self.name]
+        stats.refreshes += 1
+        try:
+            # Another worker may already have refreshed the shared entry
+            entry = await self._read_tiers(key)
+            if entry is None or not entry.is_fresh:
+                await self.flight.do(key, lambda: self._load(key, loader, ttl_seconds))
+        except Exception as e:
+            stats.refresh_failures += 1
+            logger.warning("Background refresh of %s/%s failed: %s", self.name, key, e)
+
+
+# Global cache shared by all services
+cache = Cache(
+    max_entries=settings.cache_max_entries,
+    max_bytes=settings.cache_max_bytes,
+    backend=create_backend(),
+    disk=create_disk_backend(),
+)
@@ -0,0 +1,436 @@
+"""
+Cache Backends
+Second-level cache stores shared by every uvicorn worker on a node (SQLite WAL) or across nodes (Redis),
+plus a persistent on-disk store for long-lived datasets
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit
+from pydantic import BaseModel
+from app import models
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# VALUE ENCODING
+# ============================================================================
+
+def encode_entry(value: Any, stored_at: float, fresh_until: float, expires_at: float) -> bytes:
+    """
+    Encode a cache value and its wall-clock deadlines for a shared backend
+
+    Pydantic responses are stored with their model name so they can be rebuilt
+    on the way out; everything else must be JSON-serializable.
+    """
+    envelope: Dict[str, Any] = {"s": stored_at, "f": fresh_until, "e": expires_at}
+    if isinstance(value, BaseModel):
+        envelope["m"] = type(value).__name__
+        envelope["d"] = value.model_dump(mode="json")
+    else:
+        envelope["d"] = value
+    return json.dumps(envelope, separators=(",", ":")).encode()
+
+
+def decode_entry(raw: bytes) -> Tuple[Any, float, float, float]:
+    """Decode a shared-backend entry into (value, stored_at, fresh_until, expires_at)"""
+    envelope = json.loads(raw)
+    value = envelope["d"]
+    model_name = envelope.get("m")
+    if model_name:
+        value = getattr(models, model_name).model_validate(value)
+    return value, envelope["s"], envelope["f"], envelope["e"]
+
+
+# ============================================================================
+# BACKEND INTERFACE
+# ============================================================================
+
+class CacheBackend(ABC):
+    """Key/value store with per-key expiry used as a second-level cache"""
+
+    name = "backend"
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """Get raw bytes for a key, or None if absent or expired"""
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl_seconds: float):
+        """Store raw bytes for a key with an expiry"""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """Drop a key"""
+
+    async def purge_expired(self) -> int:
+        """Remove expired keys if the store does not do so itself"""
+        return 0
+
+    async def close(self):
+        """Release connections"""
+
+
+# ============================================================================
+# SQLITE (WAL) BACKEND - shared by all worker processes on one node
+# ============================================================================
+
+class SQLiteCacheBackend(CacheBackend):
+    """Cache table in a SQLite database in WAL mode, safe for concurrent worker processes"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_schema(conn)
+            self._conn = conn
+        return self._conn
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, value: bytes, ttl_seconds: float):
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl_seconds),
+            )
+
+    def _delete(self, key: str):
+        with self._lock:
+            self._connect().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def _purge(self) -> int:
+        with self._lock:
+            return self._connect().execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: bytes, ttl_seconds: float):
+        await asyncio.to_thread(self._set, key, value, ttl_seconds)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._delete, key)
+
+    async def purge_expired(self) -> int:
+        return await asyncio.to_thread(self._purge)
+
+    async def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# ============================================================================
+# PERSISTENT DISK STORE - survives restarts, compressed and size-bounded
+# ============================================================================
+
+class DiskCacheBackend(SQLiteCacheBackend):
+    """
+    Persistent SQLite store for long-lived namespaces (archive, projections, DEM)
+
+    Values are zlib-compressed and the file is kept under a byte budget by
+    evicting the least recently read entries. The byte total lives in a
+    metadata row updated in the same transaction as every insert and delete,
+    so all worker processes sharing the file agree on it without scanning
+    the table.
+    """
+
+    name = "disk"
+
+    def __init__(self, path: str, max_bytes: int):
+        super().__init__(path)
+        self.max_bytes = max_bytes
+        self._bytes = 0  # total as of this process's last write or purge
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS disk_cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL, "
+            "size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS disk_cache_accessed ON disk_cache (accessed_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS disk_cache_expires ON disk_cache (expires_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS disk_cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        with self._transaction(conn):
+            # Seeded once per file; from then on every write keeps it current
+            conn.execute(
+                "INSERT OR IGNORE INTO disk_cache_meta (name, value) "
+                "SELECT 'bytes', COALESCE(SUM(size), 0) FROM disk_cache"
+            )
+            self._bytes = self._stored_bytes(conn)
+
+    @staticmethod
+    @contextmanager
+    def _transaction(conn: sqlite3.Connection):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _stored_bytes(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT value FROM disk_cache_meta WHERE name = 'bytes'").fetchone()[0]
+
+    def _add_bytes(self, conn: sqlite3.Connection, delta: int):
+        if delta:
+            conn.execute("UPDATE disk_cache_meta SET value = value + ? WHERE name = 'bytes'", (delta,))
+        self._bytes = self._stored_bytes(conn)
+
+    def _get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value FROM disk_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE disk_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return zlib.decompress(row[0])
+
+    def _set(self, key: str, value: bytes, ttl_seconds: float):
+        blob = zlib.compress(value, 6)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            # One write transaction for the insert, the running total and any eviction,
+            # so concurrent workers never evict against a stale total
+            with self._transaction(conn):
+                old = conn.execute("SELECT size FROM disk_cache WHERE key = ?", (key,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO disk_cache (key, value, expires_at, size, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, blob, now + ttl_seconds, len(blob), now),
+                )
+                self._add_bytes(conn, len(blob) - (old[0] if old else 0))
+                if self._bytes > self.max_bytes:
+                    self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop least recently read entries until the store is back under budget"""
+        excess = self._bytes - int(self.max_bytes * 0.9)
+        victims = []
+        freed = 0
+        # Walks the accessed_at index and stops as soon as enough is freed
+        for key, size in conn.execute("SELECT key, size FROM disk_cache ORDER BY accessed_at"):
+            if freed >= excess:
+                break
+            victims.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM disk_cache WHERE key = ?", victims)
+        self._add_bytes(conn, -freed)
+        logger.info("Disk cache evicted %d entries to stay under %d bytes", len(victims), self.max_bytes)
+
+    def _delete(self, key: str):
+        with self._lock:
+            conn = self._connect()
+            with self._transaction(conn):
+                row = conn.execute("SELECT size FROM disk_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    conn.execute("DELETE FROM disk_cache WHERE key = ?", (key,))
+                    self._add_bytes(conn, -row[0])
+
+    def _purge(self) -> int:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            with self._transaction(conn):
+                freed = conn.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM disk_cache WHERE expires_at <= ?", (now,)
+                ).fetchone()[0]
+                removed = conn.execute("DELETE FROM disk_cache WHERE expires_at <= ?", (now,)).rowcount
+                self._add_bytes(conn, -freed)
+            return removed
+
+    def usage(self) -> Dict[str, Any]:
+        """
+        Size of the store as of this process's last write or purge
+
+        Never touches the database, so it is safe to call from the event loop;
+        other workers' writes show up after the next periodic purge.
+        """
+        return {"path": self.path, "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+# ============================================================================
+# REDIS BACKEND - minimal RESP2 client, no extra dependency
+# ============================================================================
+
+class RedisProtocolError(Exception):
+    """Raised when the server replies with an error or an unexpected frame"""
+
+
+class _RedisConnection:
+    """Single RESP2 connection issuing one command at a time"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    async def command(self, *args: Any) -> Any:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+        self.writer.write(b"".join(parts))
+        await self.writer.drain()
+        return await self._read_reply()
+
+    async def _read_reply(self) -> Any:
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RedisProtocolError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await self.reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            if count < 0:
+                return None
+            return [await self._read_reply() for _ in range(count)]
+        raise RedisProtocolError(f"Unexpected reply: {line!r}")
+
+    def close(self):
+        self.writer.close()
+
+
+class RedisCacheBackend(CacheBackend):
+    """Redis-protocol store (works with Redis, Valkey, KeyDB or a local stand-in)"""
+
+    name = "redis"
+
+    def __init__(self, url: str, pool_size: int = 4):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.password = parts.password
+        self.db = int(parts.path.lstrip("/") or 0)
+        self.pool_size = pool_size
+        self._idle: List[_RedisConnection] = []
+        self._slots = asyncio.Semaphore(pool_size)
+
+    async def _open(self) -> _RedisConnection:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout=settings.api_timeout_seconds
+        )
+        conn = _RedisConnection(reader, writer)
+        if self.password:
+            await conn.command("AUTH", self.password)
+        if self.db:
+            await conn.command("SELECT", self.db)
+        return conn
+
+    async def _execute(self, *args: Any) -> Any:
+        async with self._slots:
+            reused = bool(self._idle)
+            conn = self._idle.pop() if reused else await self._open()
+            try:
+                reply = await conn.command(*args)
+            except RedisProtocolError:
+                # An error reply leaves the connection usable
+                self._idle.append(conn)
+                raise
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                conn.close()
+                if not reused:
+                    raise
+                # A pooled connection went stale (server restart, idle timeout): retry once on a new one
+                logger.info("Redis connection lost (%s), reconnecting", e)
+                conn = await self._open()
+                try:
+                    reply = await conn.command(*args)
+                except BaseException:
+                    conn.close()
+                    raise
+            except BaseException:
+                conn.close()
+                raise
+            self._idle.append(conn)
+            return reply
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._execute("GET", key)
+
+    async def set(self, key: str, value: bytes, ttl_seconds: float):
+        await self._execute("SET", key, value, "PX", max(1, int(ttl_seconds * 1000)))
+
+    async def delete(self, key: str):
+        await self._execute("DEL", key)
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop().close()
+
+
+def create_backend() -> Optional[CacheBackend]:
+    """Build the shared cache backend selected by settings.cache_backend"""
+    kind = settings.cache_backend.lower()
+    if kind == "memory":
+        return None
+    if kind == "sqlite":
+        path = settings.cache_sqlite_path or os.path.join(
+            "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+            "adiyogi-weather-cache.sqlite3",
+        )
+        return SQLiteCacheBackend(path)
+    if kind == "redis":
+        return RedisCacheBackend(settings.cache_redis_url)
+    raise ValueError(f"Unknown cache backend: {settings.cache_backend}")
+
+
+def create_disk_backend() -> Optional[DiskCacheBackend]:
+    """Build the persistent store used by settings.cache_disk_namespaces"""
+    if not settings.cache_disk_path:
+        return None
+    # Relative paths resolve against backend/, not the directory uvicorn was started from
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), settings.cache_disk_path)
+    return DiskCacheBackend(path, settings.cache_disk_max_bytes)
@@ -0,0 +1,124 @@
+"""
+Response Compression
+Content-coding negotiation and encoders (gzip always; brotli and zstd when their packages are installed)
+"""
+
+import gzip
+import importlib
+import importlib.util
+import logging
+import zlib
+from typing import Callable, Dict, List, Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _build_encoders() -> Dict[str, Callable[[bytes], bytes]]:
+    encoders: Dict[str, Callable[[bytes], bytes]] = {
+        "gzip": lambda data: gzip.compress(data, compresslevel=settings.compression_gzip_level, mtime=0),
+    }
+    if importlib.util.find_spec("brotli") is not None:
+        brotli = importlib.import_module("brotli")
+        encoders["br"] = lambda data: brotli.compress(data, quality=settings.compression_brotli_quality)
+    if importlib.util.find_spec("zstandard") is not None:
+        zstandard = importlib.import_module("zstandard")
+        compressor = zstandard.ZstdCompressor(level=settings.compression_zstd_level)
+        encoders["zstd"] = compressor.compress
+    return encoders
+
+
+ENCODERS = _build_encoders()
+
+
+class StreamEncoder:
+    """Incremental content coding for streamed bodies; every chunk is flushed so the client can decode it on arrival"""
+
+    def __init__(self, process: Callable[[bytes], bytes], finish: Callable[[], bytes]):
+        self._process = process
+        self._finish = finish
+
+    def compress(self, data: bytes) -> bytes:
+        return self._process(data)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def _gzip_stream() -> StreamEncoder:
+    compressor = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return StreamEncoder(lambda data: compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush)
+
+
+def _build_stream_encoders() -> Dict[str, Callable[[], StreamEncoder]]:
+    encoders: Dict[str, Callable[[], StreamEncoder]] = {"gzip": _gzip_stream}
+    if "br" in ENCODERS:
+        brotli = importlib.import_module("brotli")
+
+        def brotli_stream() -> StreamEncoder:
+            compressor = brotli.Compressor(quality=settings.compression_brotli_quality)
+            return StreamEncoder(lambda data: compressor.process(data) + compressor.flush(), compressor.finish)
+
+        encoders["br"] = brotli_stream
+    if "zstd" in ENCODERS:
+        zstandard = importlib.import_module("zstandard")
+
+        def zstd_stream() -> StreamEncoder:
+            compressor = zstandard.ZstdCompressor(level=settings.compression_zstd_level).compressobj()
+            return StreamEncoder(
+                lambda data: compressor.compress(data) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+                compressor.flush,
+            )
+
+        encoders["zstd"] = zstd_stream
+    return encoders
+
+
+STREAM_ENCODERS = _build_stream_encoders()
+
+
+def available_encodings() -> List[str]:
+    """Configured encodings that can actually be produced, in preference order"""
+    return [name for name in settings.compression_encodings if name in ENCODERS]
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the preferred available encoding the client accepts
+
+    Args:
+        accept_encoding: Accept-Encoding request header
+
+    Returns:
+        Encoding name, or None to send the body uncompressed
+    """
+    if not accept_encoding:
+        return None
+
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    for name in available_encodings():
+        quality = accepted.get(name, accepted.get("*", 0.0))
+        if quality > 0:
+            return name
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Encode a body with the given content coding"""
+    return ENCODERS[encoding](data)
+
+
+def stream_encoder(encoding: str) -> StreamEncoder:
+    """A fresh incremental encoder for one streamed body"""
+    return STREAM_ENCODERS[encoding]()
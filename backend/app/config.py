@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
@@ -17,6 +17,149 @@ class Settings(BaseSettings):
     api_timeout_seconds: int = 10
     cache_ttl_seconds: int = 300  # 5 minutes
     
+    # Cache Settings (one bounded cache shared by every service)
+    cache_max_entries: int = 10000
+    cache_max_bytes: int = 256 * 1024 * 1024  # estimated from serialized size
+    cache_sweep_interval_seconds: int = 60
+    cache_backend: str = "memory"  # memory, sqlite (shared by workers on a node) or redis
+    cache_sqlite_path: str = ""  # defaults to /dev/shm/adiyogi-weather-cache.sqlite3
+    cache_redis_url: str = "redis://localhost:6379/0"
+    cache_key_prefix: str = "adiyogi:"
+    cache_disk_path: str = "data/cache.sqlite3"  # persistent store, relative to backend/; empty disables it
+    cache_disk_max_bytes: int = 1024 * 1024 * 1024
+    cache_disk_namespaces: List[str] = ["historical", "climate", "elevation"]
+    cache_ttl_air_quality_seconds: int = 1800  # 30 minutes
+    cache_ttl_marine_seconds: int = 3600  # 1 hour
+    cache_ttl_solar_seconds: int = 3600  # 1 hour
+    cache_ttl_historical_seconds: int = 86400  # 24 hours
+    cache_ttl_historical_archive_seconds: int = 2592000  # 30 days, ranges ERA5 has finalized
+    cache_ttl_historical_recent_seconds: int = 3600  # 1 hour, ranges touching the last few days
+    cache_ttl_climate_seconds: int = 604800  # 7 days, climate data changes slowly
+    cache_ttl_flood_seconds: int = 21600  # 6 hours, flood data updates every 6 hours
+    cache_ttl_elevation_seconds: int = 2592000  # 30 days, elevation data doesn't change
+    # Stale-while-revalidate window past each namespace's TTL: the stale value is
+    # served immediately while one background task refreshes it
+    cache_stale_seconds: Dict[str, int] = {
+        "weather": 300,
+        "air_quality": 1800,
+        "marine": 3600,
+        "solar": 3600,
+        "historical": 86400,
+        "climate": 604800,
+        "flood": 21600,
+        "elevation": 2592000,
+    }
+    cache_stale_if_error_seconds: int = 3600  # expired entries kept this long to answer failed loads
+    historical_recent_days: int = 7  # days before the archive is considered final
+    historical_max_parallel_blocks: int = 6  # concurrent yearly block fetches per request
+    historical_block_timeout_seconds: float = 15.0  # a slower (or failed) block is refetched as two halves
+    historical_partial_results: bool = True  # null-fill blocks that still fail instead of failing the request
+    
+    # HTTP caching (Cache-Control / ETag / conditional GET)
+    http_cache_enabled: bool = True
+    http_cache_max_records: int = 10000  # URLs whose responses are remembered
+    http_cache_max_bytes: int = 64 * 1024 * 1024  # stored bodies, including pre-compressed copies
+    http_cache_max_body_bytes: int = 8 * 1024 * 1024  # larger bodies are passed through untouched
+    encoded_cache_max_entries: int = 10000  # pre-encoded JSON bodies kept for forecast/current/geocoding hits
+    
+    # Response compression (negotiated via Accept-Encoding)
+    compression_enabled: bool = True
+    compression_min_bytes: int = 1024
+    compression_encodings: List[str] = ["zstd", "br", "gzip"]  # preference order; br/zstd need their packages
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 5
+    compression_zstd_level: int = 3
+    
+    # Metrics (Prometheus text format at /metrics)
+    metrics_enabled: bool = True
+    metrics_max_routes: int = 1000  # method/path pairs whose label handles are kept
+    metrics_loop_lag_interval_seconds: float = 0.5  # 0 disables the event-loop lag probe
+    
+    # Request timing (Server-Timing header) and tracing spans (OTLP/JSON)
+    server_timing_enabled: bool = True
+    tracing_exporter: str = "none"  # "none", "file" or "otlp"
+    tracing_sample_rate: float = 0.1  # fraction of requests traced when no traceparent is sent
+    tracing_file_path: str = "data/traces.jsonl"
+    tracing_otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    tracing_service_name: str = "adiyogi-weather-api"
+    tracing_export_interval_seconds: float = 5.0
+    tracing_max_buffered_spans: int = 10000  # spans beyond this are dropped until the next export
+    
+    # Upstream resilience (retries and per-host circuit breakers)
+    upstream_retry_attempts: int = 3  # total attempts per request, including the first
+    upstream_retry_backoff_seconds: float = 0.25  # base of the full-jitter exponential backoff
+    upstream_retry_backoff_max_seconds: float = 4.0
+    upstream_retry_after_max_seconds: float = 10.0  # longer Retry-After requests fail instead of waiting
+    upstream_breaker_failure_threshold: int = 5  # consecutive failed requests (after retries) that open a host's breaker
+    upstream_breaker_reset_seconds: float = 30.0  # time open before a half-open probe
+    upstream_base_url_overrides: Dict[str, str] = {}  # host -> base URL, e.g. a local fake upstream
+    
+    # Upstream admission (per-host concurrency caps, rate limits and wait queue)
+    upstream_admission_enabled: bool = True
+    upstream_host_concurrency_limits: Dict[str, int] = {  # default: the host's connection limit
+        "nominatim.openstreetmap.org": 1,
+    }
+    # Host or parent domain -> [[requests, per_seconds], ...]; a domain's buckets are shared by its hosts
+    upstream_rate_limits: Dict[str, List[List[float]]] = {
+        "nominatim.openstreetmap.org": [[1, 1]],  # usage policy: at most 1 request/s
+        "open-meteo.com": [[600, 60], [5000, 3600], [10000, 86400]],  # free-tier quotas
+    }
+    # Token buckets live in each worker process, so every quota is split between this many workers
+    upstream_rate_limit_workers: int = 0  # 0: WEB_CONCURRENCY (uvicorn's default worker count), else 1
+    upstream_queue_max_waiters: int = 100  # per host; further requests are refused
+    upstream_queue_timeout_seconds: float = 5.0  # longest wait for admission
+    
+    # Popularity-driven prewarming of hot locations
+    prewarm_enabled: bool = True
+    prewarm_sketch_capacity: int = 2000  # locations tracked by the heavy-hitters sketch
+    prewarm_top_k: int = 200  # hottest locations kept warm
+    prewarm_min_requests: int = 3  # guaranteed request count before a location is prewarmed
+    prewarm_interval_seconds: float = 20.0
+    prewarm_lead_seconds: float = 60.0  # reload entries with less freshness left than this
+    prewarm_concurrency: int = 4
+    prewarm_max_per_cycle: int = 200  # upstream loads per cycle
+    prewarm_min_headroom: float = 0.5  # skip a host when less of its rate/concurrency budget is free
+    prewarm_decay_interval_seconds: float = 3600.0  # halve popularity counts this often
+    
+    # Dashboard
+    dashboard_section_timeout_seconds: float = 8.0
+    dashboard_section_timeouts: Dict[str, float] = {  # shorter per-section caps; the load still fills the cache
+        "location": 0.5,  # Nominatim admits 1 request/s, so a busy dashboard would queue behind it
+    }
+    
+    # Multi-location batches
+    batch_chunk_size: int = 100  # points per upstream request
+    batch_max_points: int = 5000
+    elevation_batch_chunk_size: int = 100  # Open-Meteo elevation API limit per request
+    
+    # Micro-batching of concurrent single-point fetches (opt-in)
+    microbatch_enabled: bool = False
+    microbatch_window_ms: float = 5.0  # how long to collect points before fetching
+    microbatch_max_batch_size: int = 50  # flush early once this many points are waiting
+    
+    # Grid snapping for cache keys, in degrees (~ upstream model resolution)
+    grid_resolution_degrees: Dict[str, float] = {
+        "forecast": 0.1,  # ~11 km
+        "solar": 0.1,  # ~11 km, same models as forecast
+        "air_quality": 0.1,  # ~11 km (CAMS Europe 0.1°, global 0.4°)
+        "marine": 0.05,  # ~5 km
+        "historical": 0.1,  # ~11 km (ERA5-Land)
+        "climate": 0.1,  # ~10 km
+        "flood": 0.05,  # ~5 km (GloFAS)
+        "elevation": 1 / 1200,  # ~90 m (3 arc-second DEM)
+        "reverse_geocode": 0.01,  # ~1 km, city-level lookup
+    }
+    
+    # Upstream Connection Pool (shared by all services)
+    upstream_max_connections_per_host: int = 20
+    upstream_max_keepalive_per_host: int = 10
+    upstream_keepalive_expiry_seconds: float = 30.0
+    upstream_pool_timeout_seconds: float = 5.0
+    upstream_http2: bool = False  # requires the 'h2' package
+    upstream_host_connection_limits: Dict[str, int] = {
+        "nominatim.openstreetmap.org": 2,  # rate limited to 1 request/s by upstream_rate_limits
+    }
+    
     # Data Source API URLs
     openmeteo_forecast_url: str = "https://api.open-meteo.com/v1/forecast"
     openmeteo_geocoding_url: str = "https://geocoding-api.open-meteo.com/v1/search"
@@ -0,0 +1,73 @@
+"""
+Dashboard Fan-Out
+Runs several endpoint sections concurrently with per-section timeouts, partial results and cache status
+"""
+
+import asyncio
+import time
+from typing import Dict, Any, Awaitable, Callable, Optional
+from fastapi import HTTPException
+from app.cache import current_trace, mark_uncacheable, mark_volatile, start_trace, summarize_trace
+
+
+async def _run_section(loader: Callable[[], Awaitable[Any]], timeout: float) -> Dict[str, Any]:
+    """Run one section in its own task so its cache trace stays separate"""
+    lookups = start_trace()
+    started = time.perf_counter()
+    try:
+        data = await asyncio.wait_for(loader(), timeout=timeout)
+        status = {"status": "ok"}
+    except asyncio.TimeoutError:
+        data = None
+        status = {"status": "timeout", "error": f"Section timed out after {timeout:g}s"}
+    except HTTPException as e:
+        data = None
+        status = {"status": "error", "error": str(e.detail)}
+    except Exception as e:
+        data = None
+        status = {"status": "error", "error": str(e)}
+
+    status["cache"] = summarize_trace(lookups)
+    status["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return {"data": data, "meta": status, "lookups": lookups}
+
+
+async def run_sections(
+    loaders: Dict[str, Callable[[], Awaitable[Any]]],
+    timeout: float,
+    section_timeouts: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    """
+    Fetch every section concurrently
+
+    A section that fails or exceeds its timeout is reported in "meta" with a
+    null payload; the other sections are still returned. Upstream fetches cut
+    off by a timeout keep running in the background and still fill the cache.
+
+    Args:
+        loaders: Section name to zero-argument coroutine function
+        timeout: Per-section timeout in seconds
+        section_timeouts: Shorter timeouts for particular sections (the lower of the two applies)
+
+    Returns:
+        {"sections": {name: payload}, "meta": {name: {status, cache, duration_ms[, error]}}}
+    """
+    names = list(loaders)
+    parent_trace = current_trace()
+    section_timeouts = section_timeouts or {}
+    results = await asyncio.gather(*(
+        _run_section(loaders[name], min(timeout, section_timeouts.get(name, timeout))) for name in names
+    ))
+
+    # Surface the sections' cache lookups to the request-level trace
+    if parent_trace is not None:
+        for result in results:
+            parent_trace.extend(result["lookups"])
+    if any(result["meta"]["status"] != "ok" for result in results):
+        mark_uncacheable()
+    # "meta" reports this request's timings and cache status; a replayed body would repeat stale ones
+    mark_volatile()
+    return {
+        "sections": {name: result["data"] for name, result in zip(names, results)},
+        "meta": {name: result["meta"] for name, result in zip(names, results)},
+    }
@@ -0,0 +1,246 @@
+"""
+JSON Encoding
+Fast JSON bytes for route responses, bypassing FastAPI's response_model re-validation,
+and NDJSON streaming of long time series
+"""
+
+import importlib.util
+import json
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, AsyncGenerator, AsyncIterator, Hashable, List, Optional, Tuple
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from app.config import settings
+from app.timing import phase
+
+if importlib.util.find_spec("orjson") is not None:
+    import orjson
+else:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def encode_json(value: Any) -> bytes:
+    """
+    Encode a response payload to JSON bytes
+
+    Pydantic models use their compiled serializer; other payloads use orjson
+    when it is installed and the standard library otherwise.
+    """
+    with phase("encode"):
+        if isinstance(value, BaseModel):
+            return value.model_dump_json().encode()
+        if orjson is not None:
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class JSONBytesResponse(Response):
+    """
+    JSON response rendered straight from a model or dict
+
+    Returning it from a route skips response_model validation and
+    jsonable_encoder while the route keeps its response_model for the
+    OpenAPI schema.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return encode_json(content)
+
+
+class TimedJSONResponse(JSONResponse):
+    """Default response class, timing the final JSON encoding as the "encode" phase"""
+
+    def render(self, content: Any) -> bytes:
+        with phase("encode"):
+            return super().render(content)
+
+
+class EncodedBodyCache:
+    """
+    Encoded JSON bodies remembered per cached value
+
+    A body is reused while the value it was rendered from is still the one
+    the service cache returns (identity check), so a refreshed entry is
+    re-encoded on its next hit and nothing needs explicit invalidation.
+    Bodies are keyed like the service cache, so every caller in a grid cell
+    shares one; echoed coordinates are spliced in per request.
+    """
+
+    def __init__(self, name: str, max_entries: Optional[int] = None):
+        self.name = name
+        self.max_entries = max_entries or settings.encoded_cache_max_entries
+        self._bodies: "OrderedDict[Hashable, Tuple[Any, bytes]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        _registry.append(self)
+
+    def render(self, key: Hashable, value: Any) -> bytes:
+        """
+        JSON bytes for a cached value
+
+        Args:
+            key: The service cache key the value was read under
+            value: The value returned by the service cache
+
+        Returns:
+            Encoded response body
+        """
+        body = self._lookup(key, value)
+        if body is None:
+            body = self._store(key, value, encode_json(value))
+        return body
+
+    def render_located(self, key: Hashable, value: BaseModel, latitude: float, longitude: float) -> bytes:
+        """
+        JSON bytes for a cached model whose leading "location" echoes the caller's coordinates
+
+        Only the fields after the location are stored, so this matches
+        encode_json() of the echoed model while encoding just the small
+        location object per request.
+
+        Args:
+            key: The service cache key the value was read under
+            value: The value returned by the service cache
+            latitude: Latitude to echo
+            longitude: Longitude to echo
+
+        Returns:
+            Encoded response body
+        """
+        rest = self._lookup(key, value)
+        if rest is None:
+            with phase("encode"):
+                rest = value.model_dump_json(exclude={"location"}).encode()
+            self._store(key, value, rest)
+        location = encode_json(value.location.model_copy(update={"latitude": latitude, "longitude": longitude}))
+        return b'{"location":' + location + b"," + rest[1:]
+
+    def _lookup(self, key: Hashable, value: Any) -> Optional[bytes]:
+        cached = self._bodies.get(key)
+        if cached is None or cached[0] is not value:
+            self.misses += 1
+            return None
+        self._bodies.move_to_end(key)
+        self.hits += 1
+        return cached[1]
+
+    def _store(self, key: Hashable, value: Any, body: bytes) -> bytes:
+        self._bodies[key] = (value, body)
+        self._bodies.move_to_end(key)
+        while len(self._bodies) > self.max_entries:
+            self._bodies.popitem(last=False)
+        return body
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._bodies),
+            "bytes": sum(len(body) for _, body in self._bodies.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_registry: List[EncodedBodyCache] = []
+
+
+def encoded_cache_stats() -> Dict[str, Any]:
+    """Usage of every encoded-body cache, keyed by name"""
+    return {
+        "encoder": "orjson" if orjson is not None else "json",
+        "caches": {body_cache.name: body_cache.stats() for body_cache in _registry},
+    }
+
+
+# ============================================================================
+# NDJSON STREAMING
+# ============================================================================
+
+def _dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def _encode_block(series: Dict[str, List[Any]], section: str, rows: bool) -> bytes:
+    with phase("encode"):
+        if not rows:
+            return _dumps({section: series}) + b"\n"
+        names = list(series)
+        lines = [_dumps(dict(zip(names, row))) for row in zip(*series.values())]
+        return b"\n".join(lines) + b"\n" if lines else b""
+
+
+async def ndjson_response(
+    blocks: AsyncGenerator[Dict[str, Any], None],
+    section: str,
+    rows: bool = True,
+) -> StreamingResponse:
+    """
+    Stream consecutive time-series blocks as newline-delimited JSON
+
+    The first line is {"meta": {...}}: the first block without its series
+    section (coordinates, timezone, units). Each block then becomes one line
+    per time step (rows, e.g. {"time": "...", "temperature_2m": 1.5}) or a
+    single {section: {column arrays}} line. Blocks are pulled only as the
+    client reads, so a slow client slows the producer instead of buffering.
+
+    The first block is awaited before responding, so its failure still maps
+    to an HTTP error; a later failure ends the stream with an
+    {"error": "..."} line. A {"missing_range": ...} item is passed through as
+    its own line and the stream continues.
+
+    Args:
+        blocks: Upstream-shaped responses in chronological order
+        section: Series section to stream ("hourly" or "daily")
+        rows: One line per time step instead of one per block
+    """
+    # The meta line comes from the first loaded block, so hold back gaps before it
+    gaps: List[Dict[str, Any]] = []
+    try:
+        first = await blocks.__anext__()
+        while "missing_range" in first:
+            gaps.append(first)
+            first = await blocks.__anext__()
+    except StopAsyncIteration:
+        first = {}
+    except BaseException:
+        await blocks.aclose()
+        raise
+    return StreamingResponse(_ndjson_lines(first, gaps, blocks, section, rows), media_type=NDJSON_MEDIA_TYPE)
+
+
+async def _ndjson_lines(
+    first: Dict[str, Any],
+    gaps: List[Dict[str, Any]],
+    blocks: AsyncGenerator[Dict[str, Any], None],
+    section: str,
+    rows: bool,
+) -> AsyncIterator[bytes]:
+    try:
+        yield _dumps({"meta": {key: value for key, value in first.items() if key != section}}) + b"\n"
+        for gap in gaps:
+            yield _dumps(gap) + b"\n"
+        block: Optional[Dict[str, Any]] = first
+        while block is not None:
+            if "missing_range" in block:
+                yield _dumps(block) + b"\n"
+            elif block.get(section):
+                yield _encode_block(block[section], section, rows)
+            try:
+                block = await blocks.__anext__()
+            except StopAsyncIteration:
+                block = None
+    except Exception as e:
+        logger.warning("%s stream ended early: %s", section, e)
+        yield _dumps({"error": str(e)}) + b"\n"
+    finally:
+        await blocks.aclose()
@@ -0,0 +1,40 @@
+"""
+Grid Snapping
+Quantizes coordinates to each dataset's upstream model grid so nearby requests share cache entries
+"""
+
+from typing import Dict, Any, Tuple
+from app.config import settings
+
+
+def snap(dataset: str, latitude: float, longitude: float) -> Tuple[float, float]:
+    """
+    Snap a coordinate to the grid resolution configured for a dataset
+
+    Args:
+        dataset: Key into settings.grid_resolution_degrees (e.g. "forecast", "marine")
+        latitude: Caller latitude
+        longitude: Caller longitude
+
+    Returns:
+        (latitude, longitude) rounded to the nearest grid point, or unchanged
+        if the dataset has no configured resolution
+    """
+    step = settings.grid_resolution_degrees.get(dataset)
+    if not step:
+        return latitude, longitude
+
+    grid_lat = min(90.0, max(-90.0, round(round(latitude / step) * step, 6)))
+    grid_lon = round(round(longitude / step) * step, 6)
+    if grid_lon > 180.0:
+        grid_lon = round(grid_lon - 360.0, 6)
+    elif grid_lon < -180.0:
+        grid_lon = round(grid_lon + 360.0, 6)
+    return grid_lat, grid_lon
+
+
+def echo_coordinates(data: Dict[str, Any], latitude: float, longitude: float) -> Dict[str, Any]:
+    """Shallow copy of a cached upstream payload that carries the caller's coordinates"""
+    if not isinstance(data, dict):
+        return data
+    return {**data, "latitude": latitude, "longitude": longitude}
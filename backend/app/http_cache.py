@@ -0,0 +1,333 @@
+"""
+HTTP Caching
+ASGI middleware adding Cache-Control, ETag and Last-Modified to GET responses built from cached data,
+answering conditional requests with 304 Not Modified, and serving stored (pre-compressed) bodies
+while the entries behind them are unchanged
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from email.utils import formatdate
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+from app.cache import Cache, CacheLookup, cache, start_trace
+from app.compression import compress, negotiate, stream_encoder
+from app.timing import phase
+
+Dependency = Tuple[str, str, float]  # (namespace, key, stored_at)
+
+
+@dataclass
+class ResponseRecord:
+    """The last response served for a URL and the cache entries it was built from"""
+
+    etag: str
+    dependencies: List[Dependency]
+    headers: List[Tuple[bytes, bytes]] = field(default_factory=list)
+    body: Optional[bytes] = None  # None when the body was not kept (too large, streamed or volatile)
+    compressible: bool = False  # sent with Vary: Accept-Encoding
+    encoded: Dict[str, bytes] = field(default_factory=dict)  # pre-compressed bodies by content coding
+
+    @property
+    def size(self) -> int:
+        return len(self.body or b"") + sum(len(data) for data in self.encoded.values())
+
+
+def _dependencies(lookups: List[CacheLookup]) -> Optional[List[Dependency]]:
+    """Entry versions a response was built from, or None if it is not cacheable"""
+    if not lookups or any(lookup.entry is None for lookup in lookups):
+        return None
+    versions = {(lookup.namespace, lookup.key): lookup.entry.stored_at for lookup in lookups}
+    return sorted((namespace, key, stored_at) for (namespace, key), stored_at in versions.items())
+
+
+def _etag(url: str, dependencies: List[Dependency]) -> str:
+    digest = hashlib.sha1(url.encode())
+    for namespace, key, stored_at in dependencies:
+        digest.update(f"|{namespace}:{key}:{stored_at!r}".encode())
+    # Weak: the same representation may be sent with different content encodings
+    return f'W/"{digest.hexdigest()[:32]}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:]
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+class HTTPCacheMiddleware:
+    """
+    Derive HTTP validators and freshness from the cache entries behind each GET response
+
+    Every get_or_load made while handling a request is traced. A 200 response
+    built only from cache entries gets an ETag over those entry versions,
+    Last-Modified from the newest entry, and max-age / stale-while-revalidate
+    from the soonest-expiring entry's remaining soft and hard TTLs.
+
+    The body is kept next to those validators, along with each content coding
+    it has been compressed into. While every entry behind it is fresh and
+    unchanged, a matching If-None-Match is answered with 304 and other
+    requests get the stored (pre-compressed) bytes, both without running the
+    endpoint. Responses that are not served from a record are compressed per
+    Accept-Encoding when large enough. Streaming responses (no Content-Length)
+    are never buffered: each chunk is compressed and forwarded as it arrives.
+    HEAD requests get the same headers with an empty body, and bodies marked
+    volatile (see mark_volatile) only get validators, never replays.
+    """
+
+    def __init__(self, app, cache: Cache = cache):
+        self.app = app
+        self.cache = cache
+        self._records: "OrderedDict[str, ResponseRecord]" = OrderedDict()
+        self._bytes = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        url = scope["path"] + ("?" + scope["query_string"].decode("latin-1") if scope["query_string"] else "")
+        head = scope["method"] == "HEAD"
+        if_none_match = _header(scope, b"if-none-match") if settings.http_cache_enabled else None
+        encoding = negotiate(_header(scope, b"accept-encoding")) if settings.compression_enabled else None
+
+        record = self._records.get(url) if settings.http_cache_enabled else None
+        if record is not None:
+            headers = self._validator_headers(record.dependencies, record.etag, require_fresh=True)
+            if headers is not None:
+                if if_none_match and _etag_matches(if_none_match, record.etag):
+                    self._touch(record.dependencies)
+                    await _send_not_modified(send, headers, record)
+                    return
+                if record.body is not None:
+                    self._records.move_to_end(url)
+                    self._touch(record.dependencies)
+                    await self._send_record(send, record, headers, encoding, head=head)
+                    return
+
+        lookups = start_trace()
+        start_message = None
+        chunks: List[bytes] = []
+        streaming = False
+        encoder = None
+
+        async def send_wrapper(message):
+            nonlocal start_message, streaming, encoder
+            if message["type"] == "http.response.start":
+                if _has_header(message, b"content-length"):
+                    start_message = message
+                    return
+                # No length: a streaming response, forwarded (and compressed) chunk by chunk as it is produced
+                streaming = True
+                headers = list(message.get("headers", []))
+                if encoding and message["status"] == 200 and _compressible_type(headers):
+                    encoder = stream_encoder(encoding)
+                    headers = _merge_headers(headers, {"content-encoding": encoding, "vary": "Accept-Encoding"})
+                await send({**message, "headers": headers})
+                return
+            if encoder is not None and message["type"] == "http.response.body":
+                with phase("compress", encoding=encoding):
+                    body = encoder.compress(message.get("body", b""))
+                    if not message.get("more_body", False):
+                        body += encoder.finish()
+                message = {**message, "body": body}
+            if message["type"] != "http.response.body" or streaming:
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                if sum(len(chunk) for chunk in chunks) <= settings.http_cache_max_body_bytes:
+                    return
+                # Too large to buffer, or a streaming response: pass through untouched
+                streaming = True
+                await send(start_message)
+                await send({"type": "http.response.body", "body": b"".join(chunks), "more_body": True})
+                return
+
+            await self._finish(send, url, start_message, b"".join(chunks), lookups, if_none_match, encoding, head)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _finish(
+        self,
+        send,
+        url: str,
+        start_message,
+        body: bytes,
+        lookups: List[CacheLookup],
+        if_none_match: Optional[str],
+        encoding: Optional[str],
+        head: bool,
+    ):
+        """Send a fully buffered response, adding validators and compression where possible"""
+        status = start_message["status"]
+        headers = list(start_message.get("headers", []))
+
+        volatile = any(lookup.status == "volatile" for lookup in lookups)
+        lookups = [lookup for lookup in lookups if lookup.status != "volatile"]
+        dependencies = _dependencies(lookups) if status == 200 and settings.http_cache_enabled else None
+        if dependencies is not None:
+            etag = _etag(url, dependencies)
+            validators = self._validator_headers(dependencies, etag)
+            if validators is not None:
+                entity_headers = _entity_headers(headers)
+                record = ResponseRecord(etag, dependencies, entity_headers, compressible=_compressible(entity_headers, body))
+                if len(body) <= settings.http_cache_max_body_bytes and not volatile:
+                    record.body = body
+                self._remember(url, record)
+                if if_none_match and _etag_matches(if_none_match, etag):
+                    await _send_not_modified(send, validators, record)
+                    return
+                await self._send_record(send, record, validators, encoding, body, head)
+                return
+
+        if encoding and _compressible(headers, body):
+            with phase("compress", encoding=encoding):
+                body = compress(body, encoding)
+            headers = _merge_headers(headers, {"content-encoding": encoding, "vary": "Accept-Encoding"})
+            headers = _merge_headers(headers, {"content-length": str(len(body))})
+        await send({**start_message, "headers": headers})
+        await send({"type": "http.response.body", "body": b"" if head else body})
+
+    async def _send_record(
+        self,
+        send,
+        record: ResponseRecord,
+        validators: Dict[str, str],
+        encoding: Optional[str],
+        body: Optional[bytes] = None,
+        head: bool = False,
+    ):
+        """Send a stored response, compressing it once per content coding"""
+        body = record.body if body is None else body
+        extra = dict(validators)
+        compressible = record.compressible
+        if encoding and compressible:
+            encoded = record.encoded.get(encoding)
+            if encoded is None:
+                with phase("compress", encoding=encoding):
+                    encoded = compress(body, encoding)
+                if record.body is not None:
+                    record.encoded[encoding] = encoded
+                    self._bytes += len(encoded)
+                    self._trim()
+            body = encoded
+            extra["content-encoding"] = encoding
+        if compressible:
+            extra["vary"] = "Accept-Encoding"
+        extra["content-length"] = str(len(body))
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": _merge_headers(record.headers, extra),
+        })
+        # HEAD: Content-Length still describes the body a GET would get
+        await send({"type": "http.response.body", "body": b"" if head else body})
+
+    def _touch(self, dependencies: List[Dependency]):
+        """Count a replayed response as a hit on its entries and keep them from LRU eviction"""
+        for namespace, key, _ in dependencies:
+            self.cache.lookup(namespace, key)
+
+    def _validator_headers(
+        self,
+        dependencies: List[Dependency],
+        etag: str,
+        require_fresh: bool = False,
+    ) -> Optional[Dict[str, str]]:
+        """Headers for a response built from these entry versions, or None if any has changed"""
+        now = time.monotonic()
+        max_age = None
+        stale_for = None
+        last_modified = 0.0
+        for namespace, key, stored_at in dependencies:
+            entry = self.cache.peek(namespace, key)
+            if entry is None or entry.stored_at != stored_at:
+                return None
+            if require_fresh and not entry.is_fresh:
+                return None
+            fresh_for = max(0.0, entry.fresh_until - now)
+            stale_window = entry.expires_at - max(entry.fresh_until, now)
+            max_age = fresh_for if max_age is None else min(max_age, fresh_for)
+            stale_for = stale_window if stale_for is None else min(stale_for, stale_window)
+            last_modified = max(last_modified, stored_at)
+
+        cache_control = f"public, max-age={int(max_age)}"
+        if stale_for and stale_for >= 1:
+            cache_control += f", stale-while-revalidate={int(stale_for)}"
+        return {
+            "cache-control": cache_control,
+            "etag": etag,
+            "last-modified": formatdate(last_modified, usegmt=True),
+        }
+
+    def _remember(self, url: str, record: ResponseRecord):
+        previous = self._records.pop(url, None)
+        if previous is not None:
+            self._bytes -= previous.size
+        self._records[url] = record
+        self._bytes += record.size
+        self._trim()
+
+    def _trim(self):
+        while self._records and (
+            len(self._records) > settings.http_cache_max_records
+            or self._bytes > settings.http_cache_max_bytes
+        ):
+            _, evicted = self._records.popitem(last=False)
+            self._bytes -= evicted.size
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _merge_headers(headers: List[Tuple[bytes, bytes]], extra: Dict[str, str]) -> List[Tuple[bytes, bytes]]:
+    names = {name.encode() for name in extra}
+    merged = [(key, value) for key, value in headers if key.lower() not in names]
+    merged.extend((name.encode(), value.encode("latin-1")) for name, value in extra.items())
+    return merged
+
+
+def _entity_headers(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    """Response headers worth replaying from a stored record"""
+    skip = {b"content-length", b"content-encoding", b"etag", b"last-modified", b"cache-control", b"vary"}
+    return [(key, value) for key, value in headers if key.lower() not in skip]
+
+
+def _has_header(message, name: bytes) -> bool:
+    return any(key.lower() == name for key, _ in message.get("headers", []))
+
+
+def _compressible(headers: List[Tuple[bytes, bytes]], body: bytes) -> bool:
+    return len(body) >= settings.compression_min_bytes and _compressible_type(headers)
+
+
+def _compressible_type(headers: List[Tuple[bytes, bytes]]) -> bool:
+    content_type = ""
+    for key, value in headers:
+        if key.lower() == b"content-encoding":
+            return False
+        if key.lower() == b"content-type":
+            content_type = value.decode("latin-1").lower()
+    return content_type.startswith(("application/json", "text/", "application/x-ndjson"))
+
+
+async def _send_not_modified(send, headers: Dict[str, str], record: ResponseRecord):
+    # A 304 carries the same Vary as the 200 it stands in for
+    if record.compressible:
+        headers = {**headers, "vary": "Accept-Encoding"}
+    await send({
+        "type": "http.response.start",
+        "status": 304,
+        "headers": [(name.encode(), value.encode("latin-1")) for name, value in headers.items()],
+    })
+    await send({"type": "http.response.body", "body": b""})
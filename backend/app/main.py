@@ -1,9 +1,24 @@
 # Weather API - Main Application (Reload Triggered 2)
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
+import math
+import re
+from datetime import date
 from app.config import settings
+from app.upstream import upstream_client
+from app.admission import admission_controller
+from app.resilience import UpstreamUnavailableError
+from app.cache import cache
+from app.singleflight import singleflight_stats
+from app.dashboard import run_sections
+from app.http_cache import HTTPCacheMiddleware
+from app.microbatch import microbatch_stats
+from app.encoding import JSONBytesResponse, TimedJSONResponse, encoded_cache_stats, ndjson_response
+from app.timing import TimingMiddleware, exporter as span_exporter
+from app.prewarm import PopularityMiddleware, PrewarmScheduler, PrewarmTarget, popularity
+from app.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, loop_lag_monitor, registry
 from app.services.weather_service import weather_service
 from app.services.air_quality_service import AirQualityService
 from app.services.marine_service import MarineService
@@ -16,7 +31,9 @@ from app.models import (
     LocationSearchResponse,
     CurrentWeatherResponse,
     ForecastResponse,
+    ReverseGeocodeResponse,
     ErrorResponse,
+    Coordinate,
 )
 
 # Initialize services
@@ -28,21 +45,37 @@ climate_service = ClimateService()
 flood_service = FloodService()
 elevation_service = ElevationService()
 
+# Entries kept warm for the most requested locations (the dashboard's default variants)
+prewarm_scheduler = PrewarmScheduler(popularity, {
+    "forecast": PrewarmTarget(
+        settings.openmeteo_forecast_url,
+        lambda lat, lon: weather_service.get_forecast(lat, lon, 7, "metric"),
+    ),
+    "current": PrewarmTarget(
+        settings.openmeteo_forecast_url,
+        lambda lat, lon: weather_service.get_current_weather(lat, lon, "metric"),
+    ),
+    "air_quality": PrewarmTarget(air_quality_service.BASE_URL, air_quality_service.get_current_air_quality),
+    "solar": PrewarmTarget(solar_service.BASE_URL, solar_service.get_current_solar_data),
+})
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown events"""
     # Startup
+    await upstream_client.start()
+    cache.start_sweeper()
+    loop_lag_monitor.start()
+    span_exporter.start()
+    prewarm_scheduler.start()
     yield
     # Shutdown
-    await weather_service.close()
-    await air_quality_service.close()
-    await marine_service.close()
-    await historical_service.close()
-    await solar_service.close()
-    await climate_service.close()
-    await flood_service.close()
-    await elevation_service.close()
+    await prewarm_scheduler.stop()
+    await span_exporter.stop()
+    await loop_lag_monitor.stop()
+    await cache.close()
+    await upstream_client.close()
 
 
 # Initialize FastAPI app
@@ -51,8 +84,18 @@ app = FastAPI(
     description="High-precision weather, climate, and environmental data API with Air Quality, Marine, Historical & Solar Data",
     version="2.0.0",
     lifespan=lifespan,
+    default_response_class=TimedJSONResponse,
 )
 
+# HTTP validators and conditional GETs for responses built from cached data
+app.add_middleware(HTTPCacheMiddleware)
+
+# Server-Timing phase breakdown and sampled tracing spans
+app.add_middleware(TimingMiddleware)
+
+# Location popularity for prewarming (outside the HTTP cache so its hits count)
+app.add_middleware(PopularityMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -62,6 +105,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency and status metrics (outermost, so stored and 304 responses are measured too)
+app.add_middleware(MetricsMiddleware)
+
 
 # Exception handlers
 @app.exception_handler(HTTPException)
@@ -70,6 +116,7 @@ async def http_exception_handler(request, exc):
     return JSONResponse(
         status_code=exc.status_code,
         content=ErrorResponse(message=exc.detail).model_dump(),
+        headers=exc.headers,
     )
 
 
@@ -110,6 +157,92 @@ async def health_check():
     return {"status": "healthy"}
 
 
+def _http_error(e: Exception) -> HTTPException:
+    """Map a service failure to an HTTP error: 503 (with Retry-After) when upstream is unavailable, else 500"""
+    if isinstance(e, UpstreamUnavailableError):
+        headers = {"Retry-After": str(math.ceil(e.retry_after))} if e.retry_after else None
+        return HTTPException(status_code=503, detail=str(e), headers=headers)
+    return HTTPException(status_code=500, detail=str(e))
+
+
+_ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def _date_range(start_date: str, end_date: str) -> tuple[str, str]:
+    """Validate a YYYY-MM-DD date range"""
+    try:
+        if not (_ISO_DATE.fullmatch(start_date) and _ISO_DATE.fullmatch(end_date)):
+            raise ValueError
+        start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be valid calendar dates in YYYY-MM-DD format")
+    if start > end:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+    return start_date, end_date
+
+
+def _batch_points(coordinates: list[Coordinate]) -> list[dict]:
+    """Validate the size of a multi-location request body"""
+    if len(coordinates) > settings.batch_max_points:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many locations: {len(coordinates)} (max {settings.batch_max_points})"
+        )
+    return [coord.model_dump() for coord in coordinates]
+
+
+# ============================================================================
+# ADMIN / DIAGNOSTICS ENDPOINTS
+# ============================================================================
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics: request and upstream latency, cache statistics, in-flight requests and event-loop lag"""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/admin/tracing")
+async def get_tracing_stats():
+    """Span exporter settings and exported / dropped span counts"""
+    return span_exporter.stats()
+
+
+@app.get("/admin/prewarm")
+async def get_prewarm_stats():
+    """Hot set of the most requested locations and prewarm scheduler counters"""
+    return prewarm_scheduler.stats()
+
+
+@app.get("/admin/upstream")
+async def get_upstream_stats():
+    """Per-host upstream pool usage, circuit breaker state and admission queues"""
+    return {
+        "hosts": upstream_client.pool_stats(),
+        "breakers": upstream_client.breaker_stats(),
+        "admission": admission_controller.stats(),
+    }
+
+
+@app.get("/admin/coalescing")
+async def get_coalescing_stats():
+    """Single-flight counters: upstream executions vs. requests collapsed onto them"""
+    return {"services": singleflight_stats()}
+
+
+@app.get("/admin/cache")
+async def get_cache_stats():
+    """Cache usage with per-namespace hit, miss and eviction statistics"""
+    return {**cache.stats(), "encoded": encoded_cache_stats()}
+
+
+@app.get("/admin/microbatch")
+async def get_microbatch_stats():
+    """Micro-batching settings and achieved batch sizes per batcher"""
+    return microbatch_stats()
+
+
 # ============================================================================
 # WEATHER API ENDPOINTS
 # ============================================================================
@@ -125,13 +258,12 @@ async def search_location(
     Returns a list of matching locations with coordinates and timezone information.
     """
     try:
-        result = await weather_service.search_location(query, count)
-        return result
+        return JSONBytesResponse(await weather_service.search_location_json(query, count))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
 
 
-@app.get("/api/geocoding/reverse")
+@app.get("/api/geocoding/reverse", response_model=ReverseGeocodeResponse)
 async def reverse_geocode(
     lat: float = Query(..., ge=-90, le=90, description="Latitude"),
     lon: float = Query(..., ge=-180, le=180, description="Longitude"),
@@ -140,17 +272,16 @@ async def reverse_geocode(
     Get location name for specific coordinates
     """
     try:
-        result = await weather_service.reverse_geocode(lat, lon)
-        return result
+        return JSONBytesResponse(await weather_service.reverse_geocode_json(lat, lon))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
 
 
 @app.get("/api/weather/current", response_model=CurrentWeatherResponse)
 async def get_current_weather(
     lat: float = Query(..., ge=-90, le=90, description="Latitude"),
     lon: float = Query(..., ge=-180, le=180, description="Longitude"),
-    units: str = Query("metric", regex="^(metric|imperial)$", description="Unit system"),
+    units: str = Query("metric", pattern="^(metric|imperial)$", description="Unit system"),
 ):
     """
     Get current weather conditions for specified coordinates
@@ -158,10 +289,9 @@ async def get_current_weather(
     Returns current temperature, weather conditions, wind, humidity, and more.
     """
     try:
-        result = await weather_service.get_current_weather(lat, lon, units)
-        return result
+        return JSONBytesResponse(await weather_service.get_current_weather_json(lat, lon, units))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
 
 
 @app.get("/api/weather/forecast", response_model=ForecastResponse)
@@ -169,7 +299,7 @@ async def get_forecast(
     lat: float = Query(..., ge=-90, le=90, description="Latitude"),
     lon: float = Query(..., ge=-180, le=180, description="Longitude"),
     days: int = Query(7, ge=1, le=16, description="Number of forecast days"),
-    units: str = Query("metric", regex="^(metric|imperial)$", description="Unit system"),
+    units: str = Query("metric", pattern="^(metric|imperial)$", description="Unit system"),
 ):
     """
     Get hourly and daily weather forecast for specified coordinates
@@ -177,10 +307,29 @@ async def get_forecast(
     Returns up to 16 days of forecast data including hourly and daily summaries.
     """
     try:
-        result = await weather_service.get_forecast(lat, lon, days, units)
-        return result
+        return JSONBytesResponse(await weather_service.get_forecast_json(lat, lon, days, units))
+    except Exception as e:
+        raise _http_error(e)
+
+
+@app.post("/api/weather/forecast/batch")
+async def get_forecast_batch(
+    coordinates: list[Coordinate],
+    days: int = Query(7, ge=1, le=16, description="Number of forecast days"),
+    units: str = Query("metric", pattern="^(metric|imperial)$", description="Unit system"),
+):
+    """
+    Get forecasts for many locations
+    
+    Returns one forecast per location in input order; locations that could
+    not be fetched carry an "error" instead.
+    """
+    points = _batch_points(coordinates)
+    try:
+        results = await weather_service.get_forecast_batch(points, days, units)
+        return {"count": len(results), "results": results}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
 
 
 # ============================================================================
@@ -199,22 +348,35 @@ async def get_current_air_quality(
     """
     try:
         data = await air_quality_service.get_current_air_quality(lat, lon)
-        
-        # Add category information if AQI is available
-        if "current" in data:
-            current = data["current"]
-            if "european_aqi" in current and current["european_aqi"] is not None:
-                data["european_aqi_category"] = air_quality_service.get_aqi_category(
-                    current["european_aqi"], "european"
-                )
-            if "us_aqi" in current and current["us_aqi"] is not None:
-                data["us_aqi_category"] = air_quality_service.get_aqi_category(
-                    current["us_aqi"], "us"
-                )
-        
-        return data
+        return _add_aqi_categories(data)
+    except Exception as e:
+        raise _http_error(e)
+
+
+@app.post("/api/air-quality/current/batch")
+async def get_current_air_quality_batch(coordinates: list[Coordinate]):
+    """Get current air quality for many locations, in input order"""
+    points = _batch_points(coordinates)
+    try:
+        results = await air_quality_service.get_current_air_quality_batch(points)
+        return {"count": len(results), "results": [_add_aqi_categories(data) for data in results]}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+
+def _add_aqi_categories(data: dict) -> dict:
+    """Add category information if AQI is available"""
+    if "current" in data:
+        current = data["current"]
+        if "european_aqi" in current and current["european_aqi"] is not None:
+            data["european_aqi_category"] = air_quality_service.get_aqi_category(
+                current["european_aqi"], "european"
+            )
+        if "us_aqi" in current and current["us_aqi"] is not None:
+            data["us_aqi_category"] = air_quality_service.get_aqi_category(
+                current["us_aqi"], "us"
+            )
+    return data
 
 
 @app.get("/api/air-quality/forecast")
@@ -232,7 +394,21 @@ async def get_air_quality_forecast(
         result = await air_quality_service.get_air_quality_forecast(lat, lon, days)
         return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+
+@app.post("/api/air-quality/forecast/batch")
+async def get_air_quality_forecast_batch(
+    coordinates: list[Coordinate],
+    days: int = Query(5, ge=1, le=5, description="Number of forecast days"),
+):
+    """Get air quality forecasts for many locations, in input order"""
+    points = _batch_points(coordinates)
+    try:
+        results = await air_quality_service.get_air_quality_forecast_batch(points, days)
+        return {"count": len(results), "results": results}
+    except Exception as e:
+        raise _http_error(e)
 
 
 # ============================================================================
@@ -251,16 +427,29 @@ async def get_current_marine_conditions(
     """
     try:
         data = await marine_service.get_current_marine_conditions(lat, lon)
-        
-        # Add wave condition description
-        if "current" in data and "wave_height" in data["current"]:
-            wave_height = data["current"]["wave_height"]
-            if wave_height is not None:
-                data["wave_conditions"] = marine_service.get_wave_conditions_description(wave_height)
-        
-        return data
+        return _add_wave_conditions(data)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+
+@app.post("/api/marine/current/batch")
+async def get_current_marine_conditions_batch(coordinates: list[Coordinate]):
+    """Get current marine conditions for many locations, in input order"""
+    points = _batch_points(coordinates)
+    try:
+        results = await marine_service.get_current_marine_conditions_batch(points)
+        return {"count": len(results), "results": [_add_wave_conditions(data) for data in results]}
+    except Exception as e:
+        raise _http_error(e)
+
+
+def _add_wave_conditions(data: dict) -> dict:
+    """Add wave condition description"""
+    if "current" in data and "wave_height" in data["current"]:
+        wave_height = data["current"]["wave_height"]
+        if wave_height is not None:
+            data["wave_conditions"] = marine_service.get_wave_conditions_description(wave_height)
+    return data
 
 
 @app.get("/api/marine/forecast")
@@ -278,7 +467,21 @@ async def get_marine_forecast(
         result = await marine_service.get_marine_forecast(lat, lon, days)
         return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+
+@app.post("/api/marine/forecast/batch")
+async def get_marine_forecast_batch(
+    coordinates: list[Coordinate],
+    days: int = Query(7, ge=1, le=7, description="Number of forecast days"),
+):
+    """Get marine forecasts for many locations, in input order"""
+    points = _batch_points(coordinates)
+    try:
+        results = await marine_service.get_marine_forecast_batch(points, days)
+        return {"count": len(results), "results": results}
+    except Exception as e:
+        raise _http_error(e)
 
 
 # ============================================================================
@@ -297,11 +500,12 @@ async def get_historical_weather(
     
     Returns daily historical data including temperature, precipitation, wind, and more.
     """
+    start_date, end_date = _date_range(start_date, end_date)
     try:
         result = await historical_service.get_historical_weather(lat, lon, start_date, end_date)
         return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
 
 
 @app.get("/api/historical/hourly")
@@ -310,17 +514,33 @@ async def get_historical_hourly(
     lon: float = Query(..., ge=-180, le=180, description="Longitude"),
     start_date: str = Query(..., description="Start date (YYYY-MM-DD)"),
     end_date: str = Query(..., description="End date (YYYY-MM-DD)"),
+    format: str = Query(
+        "json",
+        pattern="^(json|ndjson|ndjson-blocks)$",
+        description="json (one document), ndjson (streamed, one line per hour) or ndjson-blocks (streamed, one line of column arrays per year)",
+    ),
 ):
     """
     Get hourly historical weather data
     
     Returns hourly data for temperature, humidity, precipitation, wind, and cloud cover.
+    The ndjson formats stream the range year by year as it is fetched, after a
+    first {"meta": ...} line; long ranges start arriving immediately and use
+    bounded memory. A year that cannot be loaded becomes a
+    {"missing_range": ...} line (the JSON format lists it in "missing_ranges").
     """
+    start_date, end_date = _date_range(start_date, end_date)
     try:
+        if format != "json":
+            return await ndjson_response(
+                historical_service.stream_historical_hourly(lat, lon, start_date, end_date),
+                "hourly",
+                rows=format == "ndjson",
+            )
         result = await historical_service.get_historical_hourly(lat, lon, start_date, end_date)
         return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
 
 
 @app.get("/api/historical/stats")
@@ -335,6 +555,7 @@ async def get_historical_stats(
     
     Returns monthly statistics including min/max/mean temperatures and precipitation totals.
     """
+    start_date, end_date = _date_range(start_date, end_date)
     try:
         # Get daily data
         daily_data = await historical_service.get_historical_weather(lat, lon, start_date, end_date)
@@ -342,15 +563,18 @@ async def get_historical_stats(
         # Aggregate by month
         monthly_stats = historical_service.aggregate_by_month(daily_data)
         
-        return {
+        result = {
             "latitude": daily_data.get("latitude"),
             "longitude": daily_data.get("longitude"),
             "start_date": start_date,
             "end_date": end_date,
             "monthly_statistics": monthly_stats
         }
+        if "missing_ranges" in daily_data:
+            result["missing_ranges"] = daily_data["missing_ranges"]
+        return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
 
 
 # ============================================================================
@@ -369,16 +593,29 @@ async def get_current_solar_data(
     """
     try:
         data = await solar_service.get_current_solar_data(lat, lon)
-        
-        # Add solar potential if radiation is available
-        if "current" in data and "shortwave_radiation" in data["current"]:
-            radiation = data["current"]["shortwave_radiation"]
-            if radiation is not None:
-                data["solar_potential"] = solar_service.calculate_solar_potential(radiation)
-        
-        return data
+        return _add_solar_potential(data)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+
+@app.post("/api/solar/current/batch")
+async def get_current_solar_data_batch(coordinates: list[Coordinate]):
+    """Get current solar radiation data for many locations, in input order"""
+    points = _batch_points(coordinates)
+    try:
+        results = await solar_service.get_current_solar_data_batch(points)
+        return {"count": len(results), "results": [_add_solar_potential(data) for data in results]}
+    except Exception as e:
+        raise _http_error(e)
+
+
+def _add_solar_potential(data: dict) -> dict:
+    """Add solar potential if radiation is available"""
+    if "current" in data and "shortwave_radiation" in data["current"]:
+        radiation = data["current"]["shortwave_radiation"]
+        if radiation is not None:
+            data["solar_potential"] = solar_service.calculate_solar_potential(radiation)
+    return data
 
 
 @app.get("/api/solar/forecast")
@@ -401,7 +638,24 @@ async def get_solar_forecast(
         
         return data
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+
+@app.post("/api/solar/forecast/batch")
+async def get_solar_forecast_batch(
+    coordinates: list[Coordinate],
+    days: int = Query(7, ge=1, le=16, description="Number of forecast days"),
+):
+    """Get solar radiation forecasts for many locations, in input order"""
+    points = _batch_points(coordinates)
+    try:
+        results = await solar_service.get_solar_forecast_batch(points, days)
+        for data in results:
+            if "error" not in data:
+                data["best_solar_hours"] = solar_service.get_best_solar_hours(data)
+        return {"count": len(results), "results": results}
+    except Exception as e:
+        raise _http_error(e)
 
 
 # ============================================================================
@@ -429,7 +683,7 @@ async def get_climate_projections(
         
         return data
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
 
 
 @app.get("/api/climate/scenarios")
@@ -437,14 +691,22 @@ async def get_emission_scenarios(
     lat: float = Query(..., ge=-90, le=90, description="Latitude"),
     lon: float = Query(..., ge=-180, le=180, description="Longitude"),
     start_date: str = Query(..., description="Start date (YYYY-MM-DD)"),
-    end_date: str = Query(..., description="End date (YYYY-MM-DD)")
+    end_date: str = Query(..., description="End date (YYYY-MM-DD)"),
+    scenarios: str = Query(None, description="Comma-separated scenarios (ssp126, ssp245, ssp370, ssp585)")
 ):
     """Get climate projections for different emission scenarios"""
+    scenario_list = [name.strip() for name in scenarios.split(",")] if scenarios else None
+    unknown = [name for name in scenario_list or [] if name not in climate_service.SCENARIOS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown emission scenario(s): {', '.join(unknown)}")
+    
     try:
-        data = await climate_service.get_emission_scenarios(lat, lon, start_date, end_date)
+        data = await climate_service.get_emission_scenarios(
+            lat, lon, start_date, end_date, scenario_list
+        )
         return data
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
 
 
 # ============================================================================
@@ -467,7 +729,7 @@ async def get_flood_forecast(
         
         return data
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
 
 
 @app.get("/api/flood/historical")
@@ -487,7 +749,7 @@ async def get_historical_discharge(
         
         return data
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
 
 
 # ============================================================================
@@ -504,25 +766,74 @@ async def get_elevation(
         data = await elevation_service.get_elevation(lat, lon)
         return data
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
 
 
 @app.post("/api/elevation/batch")
-async def get_elevation_batch(coordinates: list[dict]):
+async def get_elevation_batch(coordinates: list[Coordinate]):
     """Get elevation for multiple points"""
+    points = _batch_points(coordinates)
     try:
-        data = await elevation_service.get_elevation_batch(coordinates)
+        data = await elevation_service.get_elevation_batch(points)
         
         # Add profile statistics
         if "elevation" in data:
             data["profile"] = elevation_service.get_elevation_profile(
                 data["elevation"],
-                coordinates
+                points
             )
         
         return data
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+
+# ============================================================================
+# DASHBOARD API ENDPOINTS
+# ============================================================================
+
+# Each section reuses the matching endpoint (or, for routes returning pre-encoded
+# bytes, the service call behind it) so the documents are identical
+DASHBOARD_SECTIONS = {
+    "current": lambda lat, lon: weather_service.get_current_weather(lat, lon, "metric"),
+    "forecast": lambda lat, lon: weather_service.get_forecast(lat, lon, 7, "metric"),
+    "air_quality": lambda lat, lon: get_current_air_quality(lat, lon),
+    "air_quality_forecast": lambda lat, lon: get_air_quality_forecast(lat, lon, 5),
+    "marine": lambda lat, lon: get_current_marine_conditions(lat, lon),
+    "marine_forecast": lambda lat, lon: get_marine_forecast(lat, lon, 7),
+    "solar": lambda lat, lon: get_current_solar_data(lat, lon),
+    "solar_forecast": lambda lat, lon: get_solar_forecast(lat, lon, 7),
+    "flood": lambda lat, lon: get_flood_forecast(lat, lon, 7),
+    "elevation": lambda lat, lon: get_elevation(lat, lon),
+    "location": lambda lat, lon: weather_service.reverse_geocode(lat, lon),
+}
+
+
+@app.get("/api/dashboard")
+async def get_dashboard(
+    lat: float = Query(..., ge=-90, le=90, description="Latitude"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitude"),
+    sections: str = Query(None, description=f"Comma-separated sections (default: all of {', '.join(DASHBOARD_SECTIONS)})"),
+    timeout: float = Query(None, gt=0, le=30, description="Per-section timeout in seconds"),
+):
+    """
+    Get every section of a location view in one request
+    
+    Sections are fetched concurrently. A section that fails or times out is
+    returned as null with its error in "meta"; "meta" also reports each
+    section's cache status (hit, stale, shared, disk, miss or none).
+    """
+    names = [name.strip() for name in sections.split(",")] if sections else list(DASHBOARD_SECTIONS)
+    unknown = [name for name in names if name not in DASHBOARD_SECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown dashboard section(s): {', '.join(unknown)}")
+    
+    result = await run_sections(
+        {name: (lambda loader=DASHBOARD_SECTIONS[name]: loader(lat, lon)) for name in names},
+        timeout or settings.dashboard_section_timeout_seconds,
+        settings.dashboard_section_timeouts,
+    )
+    return {"latitude": lat, "longitude": lon, **result}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,455 @@
+"""
+Metrics
+Prometheus text-format metrics: request and upstream latency, cache statistics, in-flight requests and event-loop lag
+"""
+
+import asyncio
+import bisect
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+from app.config import settings
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow upstream calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Sample = Tuple[str, Dict[str, str], float]  # (suffix, labels, value)
+
+# Everything below runs on the event loop thread, so plain attribute updates are
+# race-free and no locks are taken. Hot paths bind a child once with labels()
+# and keep the handle, leaving a float addition (plus a bisect for histograms)
+# per observation.
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric:
+    """A metric family whose children are created once per label set and reused"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+
+    def labels(self, *values: str, **labels: str):
+        """Child for a label set; bind it once and keep the handle on hot paths"""
+        key = tuple(str(value) for value in values) or tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            child = self._new_child()
+            self._children[key] = child
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> Iterable[Sample]:
+        for values, child in self._children.items():
+            yield from self._child_samples(dict(zip(self.labelnames, values)), child)
+
+    def _child_samples(self, labels: Dict[str, str], child) -> Iterable[Sample]:
+        yield "", labels, child.value
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(f"{name}_total", documentation, labelnames)
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _child_samples(self, labels, child):
+        cumulative = 0
+        for bound, count in zip(self.buckets, child.counts):
+            cumulative += count
+            yield "_bucket", {**labels, "le": _format_value(bound)}, cumulative
+        yield "_bucket", {**labels, "le": "+Inf"}, child.count
+        yield "_sum", labels, child.sum
+        yield "_count", labels, child.count
+
+
+class Collected(Metric):
+    """Metric family whose samples are read from existing counters at scrape time"""
+
+    def __init__(self, name: str, documentation: str, type: str, collect: Callable[[], Iterable[Sample]]):
+        super().__init__(name, documentation)
+        self.type = type
+        self._collect = collect
+
+    def samples(self) -> Iterable[Sample]:
+        return self._collect()
+
+
+class Snapshot:
+    """Value read once per render and shared by every collector that uses it"""
+
+    def __init__(self, registry: "Registry", read: Callable[[], Any]):
+        self._registry = registry
+        self._read = read
+        self._generation = -1
+        self._value: Any = None
+
+    def __call__(self) -> Any:
+        if self._generation != self._registry.generation:
+            self._value = self._read()
+            self._generation = self._registry.generation
+        return self._value
+
+
+class Registry:
+    """Named metric families rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self.generation = 0  # bumped per render so snapshots are re-read
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collected(self, name: str, documentation: str, type: str, collect: Callable[[], Iterable[Sample]]) -> Collected:
+        return self.register(Collected(name, documentation, type, collect))
+
+    def snapshot(self, read: Callable[[], Any]) -> Snapshot:
+        return Snapshot(self, read)
+
+    def render(self) -> str:
+        self.generation += 1
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ============================================================================
+# REQUEST METRICS
+# ============================================================================
+
+REQUEST_LATENCY = registry.histogram(
+    "adiyogi_http_request_duration_seconds", "Time to serve a request, by route template", ("method", "route")
+)
+REQUESTS = registry.counter(
+    "adiyogi_http_requests", "Requests served, by route template and status", ("method", "route", "status")
+)
+
+
+class _RouteHandles:
+    """Pre-bound children for one method and path"""
+
+    __slots__ = ("latency", "route", "method", "statuses")
+
+    def __init__(self, method: str, route: str):
+        self.method = method
+        self.route = route
+        self.latency = REQUEST_LATENCY.labels(method, route)
+        self.statuses: Dict[int, _CounterChild] = {}
+
+    def count(self, status: int):
+        child = self.statuses.get(status)
+        if child is None:
+            child = self.statuses[status] = REQUESTS.labels(self.method, self.route, str(status))
+        child.inc()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by route template
+
+    Routes are resolved once per method and path and their label handles kept,
+    so a request costs two clock reads, a dict lookup and two increments. It
+    sits outside the HTTP cache so responses answered from stored records are
+    measured too. Unknown paths share a single "unmatched" label per method;
+    the most recent ones are remembered separately (and evicted oldest first)
+    so repeated 404s skip the route scan without crowding out real routes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._handles: Dict[Tuple[str, str], _RouteHandles] = {}
+        self._unmatched: Dict[str, _RouteHandles] = {}
+        self._unmatched_paths: "OrderedDict[Tuple[str, str], _RouteHandles]" = OrderedDict()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.metrics_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        key = (scope["method"], scope["path"])
+        handles = self._handles.get(key) or self._unmatched_paths.get(key)
+        if handles is None:
+            handles = self._bind(scope)
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            handles.latency.observe(time.perf_counter() - started)
+            handles.count(status)
+
+    def _bind(self, scope) -> _RouteHandles:
+        method, key = scope["method"], (scope["method"], scope["path"])
+        route = _route_template(scope)
+        if route is None:
+            handles = self._unmatched.get(method)
+            if handles is None:
+                handles = self._unmatched[method] = _RouteHandles(method, "unmatched")
+            self._unmatched_paths[key] = handles
+            if len(self._unmatched_paths) > settings.metrics_max_routes:
+                self._unmatched_paths.popitem(last=False)
+            return handles
+        handles = _RouteHandles(method, route)
+        if len(self._handles) < settings.metrics_max_routes:
+            self._handles[key] = handles
+        return handles
+
+
+def _route_template(scope) -> Optional[str]:
+    from starlette.routing import Match
+
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", None)
+    return None
+
+
+# ============================================================================
+# UPSTREAM METRICS
+# ============================================================================
+
+UPSTREAM_LATENCY = registry.histogram(
+    "adiyogi_upstream_request_duration_seconds", "Time until upstream response headers arrive, by host", ("host",)
+)
+UPSTREAM_RESPONSES = registry.counter(
+    "adiyogi_upstream_responses", "Upstream responses by host and HTTP status", ("host", "status")
+)
+UPSTREAM_ERRORS = registry.counter(
+    "adiyogi_upstream_errors", "Upstream requests that failed without a response, by host and error", ("host", "error")
+)
+
+
+class UpstreamHandles:
+    """Pre-bound upstream children for one host"""
+
+    __slots__ = ("host", "latency", "statuses")
+
+    def __init__(self, host: str):
+        self.host = host
+        self.latency = UPSTREAM_LATENCY.labels(host)
+        self.statuses: Dict[int, _CounterChild] = {}
+
+    def response(self, status: int, elapsed: float):
+        self.latency.observe(elapsed)
+        child = self.statuses.get(status)
+        if child is None:
+            child = self.statuses[status] = UPSTREAM_RESPONSES.labels(self.host, str(status))
+        child.inc()
+
+    def error(self, error: BaseException, elapsed: float):
+        self.latency.observe(elapsed)
+        UPSTREAM_ERRORS.labels(self.host, type(error).__name__).inc()
+
+
+def _upstream_in_flight() -> Iterable[Sample]:
+    from app.upstream import upstream_client
+
+    for host, stats in upstream_client.pool_stats().items():
+        yield "", {"host": host}, stats["in_flight"]
+
+
+registry.collected(
+    "adiyogi_upstream_in_flight", "Upstream requests currently awaiting or streaming a response", "gauge", _upstream_in_flight
+)
+
+
+# ============================================================================
+# CACHE METRICS
+# ============================================================================
+
+def _read_cache_stats() -> Dict[str, Dict[str, Any]]:
+    from app.cache import cache
+
+    return cache.namespace_stats()
+
+
+# Eleven families below read the same counters; take them once per scrape
+_cache_stats = registry.snapshot(_read_cache_stats)
+
+
+def _cache_stat(field: str) -> Callable[[], Iterable[Sample]]:
+    def collect() -> Iterable[Sample]:
+        for namespace, stats in _cache_stats().items():
+            yield "", {"namespace": namespace}, stats[field]
+    return collect
+
+
+for _field, _help in (
+    ("hits", "Fresh in-process cache hits"),
+    ("stale_hits", "Stale entries served while a refresh runs"),
+    ("shared_hits", "Misses answered by the shared cache backend"),
+    ("disk_hits", "Misses answered by the persistent disk cache"),
+    ("misses", "In-process cache misses, including those then answered by the shared or disk cache"),
+    ("prewarms", "Entries reloaded ahead of expiry by the prewarm scheduler"),
+    ("stale_if_error_hits", "Failed loads answered with an expired entry"),
+    ("evictions", "Entries evicted to stay within the cache budget"),
+    ("expirations", "Entries removed after their TTL"),
+):
+    registry.collected(f"adiyogi_cache_{_field}_total", f"{_help}, by service namespace", "counter", _cache_stat(_field))
+
+registry.collected("adiyogi_cache_entries", "Entries held in the in-process cache, by service namespace", "gauge", _cache_stat("entries"))
+registry.collected("adiyogi_cache_bytes", "Estimated bytes held in the in-process cache, by service namespace", "gauge", _cache_stat("bytes"))
+
+
+FALLBACKS = registry.counter(
+    "adiyogi_fallbacks", "Requests answered with a degraded fallback after an upstream failure", ("operation",)
+)
+
+
+# ============================================================================
+# EVENT LOOP LAG
+# ============================================================================
+
+LOOP_LAG = registry.gauge("adiyogi_event_loop_lag_seconds", "Most recent delay between a timer's due time and its callback")
+LOOP_LAG_HISTOGRAM = registry.histogram(
+    "adiyogi_event_loop_lag_observed_seconds", "Distribution of event-loop timer delays"
+)
+
+
+class LoopLagMonitor:
+    """Background task measuring how late the event loop runs a periodic sleep"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._gauge = LOOP_LAG.labels()
+        self._histogram = LOOP_LAG_HISTOGRAM.labels()
+
+    def start(self):
+        if self._task is None and settings.metrics_enabled and settings.metrics_loop_lag_interval_seconds > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        interval = settings.metrics_loop_lag_interval_seconds
+        while True:
+            expected = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.perf_counter() - expected)
+            self._gauge.set(lag)
+            self._histogram.observe(lag)
+
+
+loop_lag_monitor = LoopLagMonitor()
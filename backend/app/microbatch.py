@@ -0,0 +1,118 @@
+"""
+Micro-Batching
+Collects concurrent single-point upstream fetches for a few milliseconds and issues one multi-coordinate request
+"""
+
+import asyncio
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Set
+from app.config import settings
+from app.batch import Point
+from app.resilience import is_client_error
+
+
+class MicroBatcher:
+    """Aggregates single-point fetches sharing the same variable set into multi-point requests"""
+
+    def __init__(self, name: str, fetch_many: Callable[[List[Point]], Awaitable[List[Any]]]):
+        self.name = name
+        self.fetch_many = fetch_many
+        self._pending: Dict[Point, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()  # running batches, referenced until done
+        self.requests = 0
+        self.batches = 0
+        self.points = 0
+        self.max_batch = 0
+        self.batch_sizes: Dict[int, int] = {}
+        _registry.append(self)
+
+    async def submit(self, point: Point) -> Any:
+        """
+        Fetch one point, sharing an upstream request with other points submitted in the same window
+
+        Args:
+            point: Grid-snapped (latitude, longitude)
+
+        Returns:
+            The upstream result for this point
+        """
+        if not settings.microbatch_enabled:
+            return (await self.fetch_many([point]))[0]
+
+        self.requests += 1
+        future = self._pending.get(point)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[point] = future
+
+        if len(self._pending) >= settings.microbatch_max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                settings.microbatch_window_ms / 1000, self._flush
+            )
+
+        # Shield so one caller being cancelled does not fail the shared future
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        self.batches += 1
+        self.points += len(batch)
+        self.max_batch = max(self.max_batch, len(batch))
+        self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[Point, asyncio.Future]):
+        points = list(batch)
+        try:
+            results = await self.fetch_many(points)
+            # Results are matched to points by position, so a short list cannot be trusted for any point
+            if len(results) != len(points):
+                raise ValueError(f"Expected {len(points)} results from upstream, got {len(results)}")
+        except Exception as e:
+            if len(points) > 1 and is_client_error(e):
+                # One rejected point fails the whole request; ask for each alone so only it fails
+                await asyncio.gather(*(self._run({point: future}) for point, future in batch.items()))
+                return
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    # Mark retrieved in case every waiter went away
+                    future.exception()
+            return
+
+        for point, result in zip(points, results):
+            if not batch[point].done():
+                batch[point].set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Achieved batch sizes for this batcher"""
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": round(self.points / self.batches, 2) if self.batches else 0,
+            "max_batch_size": self.max_batch,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+        }
+
+
+_registry: List[MicroBatcher] = []
+
+
+def microbatch_stats() -> Dict[str, Any]:
+    """Batch-size statistics for every micro-batcher, keyed by name"""
+    return {
+        "enabled": settings.microbatch_enabled,
+        "window_ms": settings.microbatch_window_ms,
+        "max_batch_size": settings.microbatch_max_batch_size,
+        "batchers": {batcher.name: batcher.stats() for batcher in _registry},
+    }
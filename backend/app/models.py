@@ -141,6 +141,13 @@ class ForecastResponse(BaseModel):
     units: WeatherUnits
 
 
+# Batch Models
+class Coordinate(BaseModel):
+    """A single point in a multi-location request"""
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+
+
 class ErrorResponse(BaseModel):
     """Error response model"""
     error: bool = True
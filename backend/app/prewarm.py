@@ -0,0 +1,258 @@
+"""
+Cache Prewarming
+Tracks the most requested locations with a Space-Saving sketch and refreshes their
+cache entries shortly before they expire, within the upstream rate budget
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Any, Awaitable, Callable, Hashable, List, Optional, Tuple
+from urllib.parse import parse_qs
+import httpx
+from app.config import settings
+from app.grid import snap
+from app.cache import start_prewarm
+from app.admission import admission_controller
+from app.resilience import UpstreamUnavailableError
+
+logger = logging.getLogger(__name__)
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitters sketch (Metwally et al.)
+
+    Counts at most capacity items. A new item arriving when the sketch is full
+    takes over the slot of the least-counted item and inherits its count as
+    an overestimate (kept in "error"), so any item more frequent than
+    total / capacity is guaranteed to be tracked. The minimum is found through
+    a lazily updated heap, keeping add() at O(log capacity) amortized.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.total = 0.0
+        self._slots: Dict[Hashable, List[float]] = {}  # item -> [count, error]
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def add(self, item: Hashable, weight: float = 1.0):
+        self.total += weight
+        slot = self._slots.get(item)
+        if slot is not None:
+            slot[0] += weight
+        elif len(self._slots) < self.capacity:
+            slot = self._slots[item] = [weight, 0.0]
+        else:
+            victim, floor = self._pop_min()
+            del self._slots[victim]
+            slot = self._slots[item] = [floor + weight, floor]
+
+        heapq.heappush(self._heap, (slot[0], next(self._sequence), item))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild()
+
+    def _pop_min(self) -> Tuple[Hashable, float]:
+        while True:
+            count, _, item = heapq.heappop(self._heap)
+            slot = self._slots.get(item)
+            if slot is not None and slot[0] == count:
+                return item, count
+
+    def _rebuild(self):
+        self._heap = [(slot[0], next(self._sequence), item) for item, slot in self._slots.items()]
+        heapq.heapify(self._heap)
+
+    def decay(self, factor: float = 0.5):
+        """Scale every count down so popularity follows recent traffic"""
+        self.total *= factor
+        for slot in self._slots.values():
+            slot[0] *= factor
+            slot[1] *= factor
+        self._rebuild()
+
+    def top(self, k: int) -> List[Tuple[Hashable, float, float]]:
+        """The k most frequent items as (item, count, error), most frequent first"""
+        ranked = heapq.nlargest(k, self._slots.items(), key=lambda item_slot: item_slot[1][0])
+        return [(item, slot[0], slot[1]) for item, slot in ranked]
+
+
+# Request frequency per grid-snapped location, shared by the middleware and the scheduler
+popularity = SpaceSaving(settings.prewarm_sketch_capacity)
+
+
+class PopularityMiddleware:
+    """Counts GET /api/* requests carrying lat/lon per forecast grid cell, including ones answered from the HTTP cache"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] == "http"
+            and settings.prewarm_enabled
+            and scope["method"] == "GET"
+            and scope["query_string"]
+            and scope["path"].startswith("/api/")
+        ):
+            location = _location(scope["query_string"])
+            if location is not None:
+                popularity.add(location)
+        await self.app(scope, receive, send)
+
+
+def _location(query_string: bytes) -> Optional[Tuple[float, float]]:
+    query = parse_qs(query_string.decode("latin-1"))
+    try:
+        lat = float(query["lat"][0])
+        lon = float(query["lon"][0])
+    except (KeyError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return snap("forecast", lat, lon)
+
+
+@dataclass
+class PrewarmTarget:
+    """One cached dataset kept warm for hot locations"""
+
+    url: str  # upstream URL, to check the host's rate budget
+    load: Callable[[float, float], Awaitable[Any]]  # the service call that reads (and fills) the entry
+
+    @property
+    def host(self) -> str:
+        return httpx.URL(self.url).host
+
+
+class PrewarmScheduler:
+    """
+    Background task keeping the hottest locations' entries fresh
+
+    Every prewarm_interval_seconds it takes the top prewarm_top_k locations
+    (with at least prewarm_min_requests requests) and calls each target's
+    service method in prewarm mode: entries with less than
+    prewarm_lead_seconds of freshness left are reloaded, the rest are left
+    alone. A host is skipped for the rest of a cycle once its admission
+    headroom drops below prewarm_min_headroom or it reports being unavailable,
+    so prewarming never competes with user requests for the rate budget.
+    """
+
+    def __init__(self, sketch: SpaceSaving, targets: Dict[str, PrewarmTarget]):
+        self.sketch = sketch
+        self.targets = targets
+        self._task: Optional[asyncio.Task] = None
+        self.cycles = 0
+        self.refreshed = 0
+        self.skipped = 0
+        self.failures = 0
+        self.last_cycle: Dict[str, Any] = {}
+
+    def start(self):
+        if self._task is None and settings.prewarm_enabled:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        last_decay = time.monotonic()
+        while True:
+            await asyncio.sleep(settings.prewarm_interval_seconds)
+            if time.monotonic() - last_decay >= settings.prewarm_decay_interval_seconds:
+                self.sketch.decay()
+                last_decay = time.monotonic()
+            try:
+                await self.run_cycle()
+            except Exception as e:
+                logger.warning("Prewarm cycle failed: %s", e)
+
+    def hot_locations(self) -> List[Tuple[Tuple[float, float], float, float]]:
+        return [
+            (location, count, error)
+            for location, count, error in self.sketch.top(settings.prewarm_top_k)
+            if count - error >= settings.prewarm_min_requests
+        ]
+
+    async def run_cycle(self) -> Dict[str, Any]:
+        """Refresh expiring entries of the hot set once"""
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(settings.prewarm_concurrency)
+        exhausted: set = set()
+        cycle = {"locations": 0, "refreshed": 0, "skipped": 0, "failures": 0}
+        budget = settings.prewarm_max_per_cycle
+
+        async def warm(target: PrewarmTarget, lat: float, lon: float):
+            nonlocal budget
+            async with semaphore:
+                host = target.host
+                if host in exhausted or budget <= 0:
+                    cycle["skipped"] += 1
+                    return
+                if admission_controller.headroom(host) < settings.prewarm_min_headroom:
+                    exhausted.add(host)
+                    cycle["skipped"] += 1
+                    return
+
+                context = start_prewarm(settings.prewarm_lead_seconds)
+                try:
+                    await target.load(lat, lon)
+                except UpstreamUnavailableError:
+                    exhausted.add(host)
+                    cycle["failures"] += 1
+                except Exception as e:
+                    cycle["failures"] += 1
+                    logger.debug("Prewarming %s for %s,%s failed: %s", host, lat, lon, e)
+                budget -= context.loads
+                cycle["refreshed"] += context.loads
+
+        hot = self.hot_locations()
+        cycle["locations"] = len(hot)
+        await asyncio.gather(*(
+            asyncio.create_task(warm(target, lat, lon))
+            for (lat, lon), _, _ in hot
+            for target in self.targets.values()
+        ))
+
+        self.cycles += 1
+        self.refreshed += cycle["refreshed"]
+        self.skipped += cycle["skipped"]
+        self.failures += cycle["failures"]
+        cycle["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        cycle["exhausted_hosts"] = sorted(exhausted)
+        self.last_cycle = cycle
+        return cycle
+
+    def stats(self) -> Dict[str, Any]:
+        """Scheduler counters and the current hot set"""
+        return {
+            "enabled": settings.prewarm_enabled,
+            "targets": list(self.targets),
+            "cycles": self.cycles,
+            "refreshed": self.refreshed,
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "last_cycle": self.last_cycle,
+            "sketch": {
+                "capacity": self.sketch.capacity,
+                "tracked": len(self.sketch),
+                "total_requests": round(self.sketch.total, 1),
+            },
+            "hot": [
+                {"lat": lat, "lon": lon, "requests": round(count, 1), "overestimate": round(error, 1)}
+                for (lat, lon), count, error in self.hot_locations()
+            ],
+        }
@@ -0,0 +1,210 @@
+"""
+Upstream Resilience
+Bounded retries with jittered exponential backoff, Retry-After handling and per-host circuit breakers
+"""
+
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Awaitable, Callable, Optional
+import httpx
+from app.config import settings
+from app.metrics import registry
+from app.timing import phase
+
+# Statuses worth retrying: rate limiting and transient server-side failures
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+UPSTREAM_RETRIES = registry.counter(
+    "adiyogi_upstream_retries", "Upstream attempts repeated after a transient failure, by host and reason", ("host", "reason")
+)
+UPSTREAM_SHORT_CIRCUITS = registry.counter(
+    "adiyogi_upstream_short_circuits", "Upstream requests failed fast by an open circuit breaker, by host", ("host",)
+)
+
+
+class UpstreamUnavailableError(Exception):
+    """An upstream host could not serve a request after retries, or its circuit breaker is open"""
+
+    def __init__(self, host: str, reason: str, retry_after: Optional[float] = None):
+        super().__init__(f"Upstream {host} unavailable: {reason}")
+        self.host = host
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def is_client_error(error: BaseException) -> bool:
+    """Whether upstream rejected the request itself (a non-retryable 4xx), directly or as the error's cause"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            return status < 500 and status not in RETRYABLE_STATUSES
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one upstream host
+
+    Closed: requests flow. After upstream_breaker_failure_threshold consecutive
+    failed requests (each counted once, after its retries are exhausted) it
+    opens and every request fails fast for
+    upstream_breaker_reset_seconds (longer if the host asked for it with
+    Retry-After). Then it is half-open: one probe request is let through
+    (without retries), and its outcome closes the breaker or opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, host: str):
+        self.host = host
+        self.state = self.CLOSED
+        self.failures = 0
+        self.open_until = 0.0
+        self.trips = 0
+        self.short_circuits = 0
+        self._probing = False
+        self._short_circuit_counter = UPSTREAM_SHORT_CIRCUITS.labels(host)
+        self._retry_counters: Dict[str, Any] = {}
+
+    def before_request(self):
+        """Admit a request, or raise UpstreamUnavailableError while the breaker is open"""
+        if self.state == self.OPEN:
+            remaining = self.open_until - time.monotonic()
+            if remaining > 0:
+                self._reject(remaining)
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                self._reject(None)
+            self._probing = True
+
+    def record_success(self):
+        self.failures = 0
+        self.state = self.CLOSED
+        self._probing = False
+
+    def record_failure(self, retry_after: Optional[float] = None):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= settings.upstream_breaker_failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self.open_until = time.monotonic() + max(settings.upstream_breaker_reset_seconds, retry_after or 0)
+
+    def release(self):
+        """Forget an attempt that ended without an outcome (e.g. the caller was cancelled)"""
+        self._probing = False
+
+    def count_retry(self, reason: str):
+        counter = self._retry_counters.get(reason)
+        if counter is None:
+            counter = self._retry_counters[reason] = UPSTREAM_RETRIES.labels(self.host, reason)
+        counter.inc()
+
+    def _reject(self, retry_after: Optional[float]):
+        self.short_circuits += 1
+        self._short_circuit_counter.inc()
+        raise UpstreamUnavailableError(self.host, "circuit breaker open", retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "open_for_seconds": round(max(0.0, self.open_until - time.monotonic()), 1) if self.state == self.OPEN else 0,
+            "trips": self.trips,
+            "short_circuits": self.short_circuits,
+        }
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number attempt + 1"""
+    ceiling = min(settings.upstream_retry_backoff_max_seconds, settings.upstream_retry_backoff_seconds * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date"""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+async def call_with_retries(
+    breaker: CircuitBreaker,
+    send: Callable[[], Awaitable[httpx.Response]],
+) -> httpx.Response:
+    """
+    Issue an idempotent request with bounded retries behind a circuit breaker
+
+    Transport errors (timeouts, refused or reset connections) and retryable
+    statuses are retried up to upstream_retry_attempts in total with
+    full-jitter exponential backoff; a 429 or 503 carrying Retry-After waits
+    as asked, unless that exceeds upstream_retry_after_max_seconds. Other
+    responses, including 4xx, are returned to the caller unchanged.
+    
+    The breaker counts requests, not attempts: one failure is recorded when
+    a request gives up, and any success closes it. A half-open probe gets a
+    single attempt.
+
+    Args:
+        breaker: Circuit breaker of the target host
+        send: Zero-argument coroutine function issuing one attempt
+
+    Returns:
+        The first non-retryable response
+
+    Raises:
+        UpstreamUnavailableError: Retries are exhausted, the host asked for a
+            longer pause than we are willing to wait, or the breaker is open
+    """
+    attempts = max(1, settings.upstream_retry_attempts)
+    for attempt in range(attempts):
+        breaker.before_request()
+        probing = breaker.state == CircuitBreaker.HALF_OPEN
+        retry_after = None
+        try:
+            response = await send()
+        except httpx.TransportError as e:
+            reason = type(e).__name__
+            if attempt + 1 >= attempts or probing:
+                breaker.record_failure()
+                raise UpstreamUnavailableError(breaker.host, f"{reason}: {e}") from e
+        except BaseException:
+            breaker.release()
+            raise
+        else:
+            if response.status_code not in RETRYABLE_STATUSES:
+                breaker.record_success()
+                return response
+
+            reason = str(response.status_code)
+            if response.status_code in (429, 503):
+                retry_after = retry_after_seconds(response)
+            await response.aclose()
+            if (
+                attempt + 1 >= attempts
+                or probing
+                or (retry_after or 0) > settings.upstream_retry_after_max_seconds
+            ):
+                breaker.record_failure(retry_after)
+                raise UpstreamUnavailableError(breaker.host, f"HTTP {response.status_code}", retry_after)
+
+        breaker.count_retry(reason)
+        with phase("backoff"):
+            await asyncio.sleep(retry_after if retry_after is not None else backoff_delay(attempt))
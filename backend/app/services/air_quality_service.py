@@ -1,9 +1,13 @@
 """Air Quality Service - Fetches AQI and pollutant data from Open-Meteo Air Quality API"""
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 import httpx
-from datetime import datetime, timedelta
 from app.config import settings
+from app.upstream import upstream_client
+from app.cache import cache
+from app.grid import snap, echo_coordinates
+from app.batch import Point, join_coordinates, split_locations, load_points
+from app.microbatch import MicroBatcher
 
 class AirQualityService:
     """Service for fetching air quality data from Open-Meteo Air Quality API"""
@@ -11,25 +15,14 @@ class AirQualityService:
     BASE_URL = "https://air-quality-api.open-meteo.com/v1/air-quality"
     
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=settings.api_timeout_seconds)
-        self._cache: Dict[str, tuple[datetime, Any]] = {}
-    
-    async def close(self):
-        """Close the HTTP client"""
-        await self.client.aclose()
+        self.client = upstream_client
+        self._cache = cache.namespace("air_quality", settings.cache_ttl_air_quality_seconds)
+        self._current_batcher = MicroBatcher("air_quality_current", self._fetch_current_air_quality_many)
     
     def _get_cache_key(self, lat: float, lon: float, endpoint: str) -> str:
         """Generate cache key for air quality data"""
         return f"aqi_{endpoint}_{lat}_{lon}"
     
-    def _is_cache_valid(self, cache_key: str) -> bool:
-        """Check if cached data is still valid (30 minutes TTL for AQI)"""
-        if cache_key not in self._cache:
-            return False
-        
-        cached_time, _ = self._cache[cache_key]
-        return datetime.now() - cached_time < timedelta(minutes=30)
-    
     async def get_current_air_quality(
         self,
         latitude: float,
@@ -45,15 +38,30 @@ class AirQualityService:
         Returns:
             Dictionary containing current air quality data
         """
-        cache_key = self._get_cache_key(latitude, longitude, "current")
+        grid_lat, grid_lon = snap("air_quality", latitude, longitude)
+        cache_key = self._get_cache_key(grid_lat, grid_lon, "current")
         
-        if self._is_cache_valid(cache_key):
-            _, cached_data = self._cache[cache_key]
-            return cached_data
+        data = await self._cache.get_or_load(cache_key, lambda: self._fetch_current_air_quality(grid_lat, grid_lon))
         
+        return echo_coordinates(data, latitude, longitude)
+    
+    async def _fetch_current_air_quality(
+        self,
+        latitude: float,
+        longitude: float
+    ) -> Dict[str, Any]:
+        """Fetch current air quality from upstream"""
+        return await self._current_batcher.submit((latitude, longitude))
+    
+    async def _fetch_current_air_quality_many(
+        self,
+        points: List[Point]
+    ) -> List[Dict[str, Any]]:
+        """Fetch current air quality for several grid points in one upstream request"""
+        latitudes, longitudes = join_coordinates(points)
         params = {
-            "latitude": latitude,
-            "longitude": longitude,
+            "latitude": latitudes,
+            "longitude": longitudes,
             "current": [
                 "pm10",
                 "pm2_5",
@@ -73,16 +81,32 @@ class AirQualityService:
         try:
             response = await self.client.get(self.BASE_URL, params=params)
             response.raise_for_status()
-            data = response.json()
-            
-            # Cache the result
-            self._cache[cache_key] = (datetime.now(), data)
-            
-            return data
+            return split_locations(response.json())
             
         except httpx.HTTPError as e:
             raise Exception(f"Failed to fetch air quality data: {str(e)}")
     
+    async def get_current_air_quality_batch(
+        self,
+        coordinates: List[Dict[str, float]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Get current air quality for many locations
+        
+        Args:
+            coordinates: List of {"lat": float, "lon": float} dictionaries
+            
+        Returns:
+            One result per location, in input order
+        """
+        return await load_points(
+            self._cache,
+            "air_quality",
+            coordinates,
+            lambda lat, lon: self._get_cache_key(lat, lon, "current"),
+            self._fetch_current_air_quality_many
+        )
+    
     async def get_air_quality_forecast(
         self,
         latitude: float,
@@ -100,15 +124,55 @@ class AirQualityService:
         Returns:
             Dictionary containing hourly air quality forecast
         """
-        cache_key = self._get_cache_key(latitude, longitude, f"forecast_{days}")
+        grid_lat, grid_lon = snap("air_quality", latitude, longitude)
+        cache_key = self._get_cache_key(grid_lat, grid_lon, f"forecast_{days}")
+        
+        data = await self._cache.get_or_load(cache_key, lambda: self._fetch_air_quality_forecast(grid_lat, grid_lon, days))
         
-        if self._is_cache_valid(cache_key):
-            _, cached_data = self._cache[cache_key]
-            return cached_data
+        return echo_coordinates(data, latitude, longitude)
+    
+    async def get_air_quality_forecast_batch(
+        self,
+        coordinates: List[Dict[str, float]],
+        days: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        Get air quality forecasts for many locations
         
+        Args:
+            coordinates: List of {"lat": float, "lon": float} dictionaries
+            days: Number of forecast days
+            
+        Returns:
+            One result per location, in input order
+        """
+        return await load_points(
+            self._cache,
+            "air_quality",
+            coordinates,
+            lambda lat, lon: self._get_cache_key(lat, lon, f"forecast_{days}"),
+            lambda points: self._fetch_air_quality_forecast_many(points, days)
+        )
+    
+    async def _fetch_air_quality_forecast(
+        self,
+        latitude: float,
+        longitude: float,
+        days: int
+    ) -> Dict[str, Any]:
+        """Fetch the air quality forecast from upstream"""
+        return (await self._fetch_air_quality_forecast_many([(latitude, longitude)], days))[0]
+    
+    async def _fetch_air_quality_forecast_many(
+        self,
+        points: List[Point],
+        days: int
+    ) -> List[Dict[str, Any]]:
+        """Fetch the air quality forecast for several grid points in one upstream request"""
+        latitudes, longitudes = join_coordinates(points)
         params = {
-            "latitude": latitude,
-            "longitude": longitude,
+            "latitude": latitudes,
+            "longitude": longitudes,
             "hourly": [
                 "pm10",
                 "pm2_5",
@@ -129,12 +193,7 @@ class AirQualityService:
         try:
             response = await self.client.get(self.BASE_URL, params=params)
             response.raise_for_status()
-            data = response.json()
-            
-            # Cache the result
-            self._cache[cache_key] = (datetime.now(), data)
-            
-            return data
+            return split_locations(response.json())
             
         except httpx.HTTPError as e:
             raise Exception(f"Failed to fetch air quality forecast: {str(e)}")
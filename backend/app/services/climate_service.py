@@ -3,10 +3,12 @@ Climate API Service
 Provides long-range climate projections using CMIP6 models from Open-Meteo
 """
 
+import asyncio
 from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
-import httpx
 from app.config import settings
+from app.upstream import upstream_client
+from app.cache import cache
+from app.grid import snap, echo_coordinates
 
 
 class ClimateService:
@@ -14,31 +16,21 @@ class ClimateService:
     
     BASE_URL = "https://climate-api.open-meteo.com/v1/climate"
     
-    def __init__(self):
-        self.client = httpx.AsyncClient(timeout=settings.api_timeout_seconds)
-        self._cache: Dict[str, tuple[datetime, Any]] = {}
-        self.cache_ttl = timedelta(days=7)  # Climate data changes slowly
+    SCENARIOS = {
+        "ssp126": "SSP1-2.6",  # Low emissions
+        "ssp245": "SSP2-4.5",  # Medium emissions
+        "ssp370": "SSP3-7.0",  # High emissions
+        "ssp585": "SSP5-8.5"   # Very high emissions
+    }
     
-    async def close(self):
-        """Close the HTTP client"""
-        await self.client.aclose()
+    def __init__(self):
+        self.client = upstream_client
+        self._cache = cache.namespace("climate", settings.cache_ttl_climate_seconds)
     
     def _get_cache_key(self, *args) -> str:
         """Generate cache key from arguments"""
         return "|".join(str(arg) for arg in args)
     
-    def _get_cached(self, key: str) -> Optional[Any]:
-        """Get cached data if still valid"""
-        if key in self._cache:
-            timestamp, data = self._cache[key]
-            if datetime.now() - timestamp < self.cache_ttl:
-                return data
-        return None
-    
-    def _set_cache(self, key: str, data: Any):
-        """Store data in cache"""
-        self._cache[key] = (datetime.now(), data)
-    
     async def get_climate_projections(
         self,
         latitude: float,
@@ -60,15 +52,28 @@ class ClimateService:
         Returns:
             Climate projection data with temperature and precipitation
         """
+        grid_lat, grid_lon = snap("climate", latitude, longitude)
         cache_key = self._get_cache_key(
-            "projections", latitude, longitude, start_date, end_date, 
+            "projections", grid_lat, grid_lon, start_date, end_date, 
             tuple(models) if models else None
         )
         
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
+        data = await self._cache.get_or_load(
+            cache_key,
+            lambda: self._fetch_climate_projections(grid_lat, grid_lon, start_date, end_date, models)
+        )
         
+        return echo_coordinates(data, latitude, longitude)
+    
+    async def _fetch_climate_projections(
+        self,
+        latitude: float,
+        longitude: float,
+        start_date: str,
+        end_date: str,
+        models: Optional[list[str]]
+    ) -> Dict[str, Any]:
+        """Fetch climate projections from upstream"""
         # Default models if none specified
         if not models:
             models = ["EC_Earth3P_HR"]
@@ -93,7 +98,6 @@ class ClimateService:
         response.raise_for_status()
         data = response.json()
         
-        self._set_cache(cache_key, data)
         return data
     
     async def get_emission_scenarios(
@@ -101,65 +105,82 @@ class ClimateService:
         latitude: float,
         longitude: float,
         start_date: str,
-        end_date: str
+        end_date: str,
+        scenarios: Optional[list[str]] = None
     ) -> Dict[str, Any]:
         """
         Get climate projections for different emission scenarios
         
+        Scenarios are fetched concurrently and cached individually, so a
+        scenario already requested on its own is reused here. A failing
+        scenario is reported under its name without failing the others.
+        
         Args:
             latitude: Latitude coordinate
             longitude: Longitude coordinate
             start_date: Start date (YYYY-MM-DD)
             end_date: End date (YYYY-MM-DD)
+            scenarios: Scenario keys such as "ssp245" (default: all four)
         
         Returns:
             Climate data for SSP1-2.6, SSP2-4.5, SSP3-7.0, SSP5-8.5 scenarios
         """
-        cache_key = self._get_cache_key(
-            "scenarios", latitude, longitude, start_date, end_date
-        )
+        scenario_keys = scenarios or list(self.SCENARIOS)
+        unknown = [key for key in scenario_keys if key not in self.SCENARIOS]
+        if unknown:
+            raise ValueError(f"Unknown emission scenario(s): {', '.join(unknown)}")
         
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
+        grid_lat, grid_lon = snap("climate", latitude, longitude)
         
-        # Fetch data for multiple emission scenarios
-        scenarios = {
-            "ssp126": "SSP1-2.6",  # Low emissions
-            "ssp245": "SSP2-4.5",  # Medium emissions
-            "ssp370": "SSP3-7.0",  # High emissions
-            "ssp585": "SSP5-8.5"   # Very high emissions
-        }
-        
-        results = {}
-        
-        for scenario_key, scenario_name in scenarios.items():
-            params = {
-                "latitude": latitude,
-                "longitude": longitude,
-                "start_date": start_date,
-                "end_date": end_date,
-                "models": "EC_Earth3P_HR",
-                "daily": [
-                    "temperature_2m_mean",
-                    "precipitation_sum"
-                ]
-            }
-            
+        async def load_scenario(scenario_key: str) -> Dict[str, Any]:
+            cache_key = self._get_cache_key(
+                "scenario", grid_lat, grid_lon, start_date, end_date, scenario_key
+            )
             try:
-                response = await self.client.get(self.BASE_URL, params=params)
-                response.raise_for_status()
-                results[scenario_name] = response.json()
+                data = await self._cache.get_or_load(
+                    cache_key,
+                    lambda: self._fetch_emission_scenario(grid_lat, grid_lon, start_date, end_date, scenario_key)
+                )
             except Exception as e:
-                results[scenario_name] = {"error": str(e)}
+                return {"error": str(e)}
+            return echo_coordinates(data, latitude, longitude)
         
-        data = {
+        results = await asyncio.gather(*(load_scenario(key) for key in scenario_keys))
+        
+        return {
             "latitude": latitude,
             "longitude": longitude,
-            "scenarios": results
+            "scenarios": {
+                self.SCENARIOS[key]: result for key, result in zip(scenario_keys, results)
+            }
         }
+    
+    async def _fetch_emission_scenario(
+        self,
+        latitude: float,
+        longitude: float,
+        start_date: str,
+        end_date: str,
+        scenario_key: str
+    ) -> Dict[str, Any]:
+        """Fetch a single emission scenario from upstream"""
+        params = {
+            "latitude": latitude,
+            "longitude": longitude,
+            "start_date": start_date,
+            "end_date": end_date,
+            "models": "EC_Earth3P_HR",
+            "scenario": scenario_key,
+            "daily": [
+                "temperature_2m_mean",
+                "precipitation_sum"
+            ]
+        }
+        
+        response = await self.client.get(self.BASE_URL, params=params)
+        response.raise_for_status()
+        data = response.json()
         
-        self._set_cache(cache_key, data)
         return data
     
     def get_climate_change_summary(self, projection_data: Dict[str, Any]) -> Dict[str, Any]:
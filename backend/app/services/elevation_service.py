@@ -3,10 +3,12 @@ Elevation API Service
 Provides accurate elevation data for any location from Open-Meteo
 """
 
-from typing import Dict, Any, Optional, List
-from datetime import datetime, timedelta
-import httpx
+from typing import Dict, Any, List
 from app.config import settings
+from app.upstream import upstream_client
+from app.cache import cache
+from app.grid import snap
+from app.batch import Point, join_coordinates
 
 
 class ElevationService:
@@ -15,30 +17,13 @@ class ElevationService:
     BASE_URL = "https://api.open-meteo.com/v1/elevation"
     
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=settings.api_timeout_seconds)
-        self._cache: Dict[str, tuple[datetime, Any]] = {}
-        self.cache_ttl = timedelta(days=30)  # Elevation data doesn't change
-    
-    async def close(self):
-        """Close the HTTP client"""
-        await self.client.aclose()
+        self.client = upstream_client
+        self._cache = cache.namespace("elevation", settings.cache_ttl_elevation_seconds)
     
     def _get_cache_key(self, *args) -> str:
         """Generate cache key from arguments"""
         return "|".join(str(arg) for arg in args)
     
-    def _get_cached(self, key: str) -> Optional[Any]:
-        """Get cached data if still valid"""
-        if key in self._cache:
-            timestamp, data = self._cache[key]
-            if datetime.now() - timestamp < self.cache_ttl:
-                return data
-        return None
-    
-    def _set_cache(self, key: str, data: Any):
-        """Store data in cache"""
-        self._cache[key] = (datetime.now(), data)
-    
     async def get_elevation(
         self,
         latitude: float,
@@ -54,30 +39,48 @@ class ElevationService:
         Returns:
             Elevation data in meters above sea level
         """
-        cache_key = self._get_cache_key("single", latitude, longitude)
-        
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
+        grid_lat, grid_lon = snap("elevation", latitude, longitude)
+        cache_key = self._get_cache_key("single", grid_lat, grid_lon)
         
+        return await self._cache.get_or_load(
+            cache_key,
+            lambda: self._fetch_elevation(grid_lat, grid_lon)
+        )
+    
+    async def _fetch_elevation(
+        self,
+        latitude: float,
+        longitude: float
+    ) -> Dict[str, Any]:
+        """Fetch a single elevation from upstream"""
+        return (await self._fetch_elevation_many([(latitude, longitude)]))[0]
+    
+    async def _fetch_elevation_many(
+        self,
+        points: List[Point]
+    ) -> List[Dict[str, Any]]:
+        """Fetch elevations for up to one upstream request's worth of points"""
+        latitudes, longitudes = join_coordinates(points)
         params = {
-            "latitude": latitude,
-            "longitude": longitude
+            "latitude": latitudes,
+            "longitude": longitudes
         }
         
         response = await self.client.get(self.BASE_URL, params=params)
         response.raise_for_status()
         data = response.json()
         
-        # Add terrain classification
-        if "elevation" in data:
-            elevation = data["elevation"][0] if isinstance(data["elevation"], list) else data["elevation"]
-            data["terrain_type"] = self.classify_terrain(elevation)
-            data["elevation_meters"] = elevation
-            data["elevation_feet"] = round(elevation * 3.28084, 2)
-        
-        self._set_cache(cache_key, data)
-        return data
+        # One single-point payload (with terrain classification) per point
+        return [self._point_payload(elevation) for elevation in data.get("elevation", [])]
+    
+    def _point_payload(self, elevation: float) -> Dict[str, Any]:
+        """Single-point response in the shape returned by get_elevation"""
+        return {
+            "elevation": [elevation],
+            "terrain_type": self.classify_terrain(elevation),
+            "elevation_meters": elevation,
+            "elevation_feet": round(elevation * 3.28084, 2)
+        }
     
     async def get_elevation_batch(
         self,
@@ -86,43 +89,40 @@ class ElevationService:
         """
         Get elevation for multiple points
         
+        Points are answered from the same per-point cache as get_elevation;
+        duplicate points are fetched once and misses are fetched concurrently
+        in chunks of settings.elevation_batch_chunk_size.
+        
         Args:
             coordinates: List of {"lat": float, "lon": float} dictionaries
         
         Returns:
-            Elevation data for all points
+            Elevation data for all points, in input order
         """
-        # Build comma-separated lists
-        latitudes = ",".join(str(coord["lat"]) for coord in coordinates)
-        longitudes = ",".join(str(coord["lon"]) for coord in coordinates)
-        
-        cache_key = self._get_cache_key("batch", latitudes, longitudes)
-        
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
-        
-        params = {
-            "latitude": latitudes,
-            "longitude": longitudes
+        keys = []
+        grid_points: Dict[str, Point] = {}
+        for coord in coordinates:
+            grid_point = snap("elevation", coord["lat"], coord["lon"])
+            key = self._get_cache_key("single", *grid_point)
+            grid_points[key] = grid_point
+            keys.append(key)
+        
+        results = await self._cache.get_or_load_many(
+            keys,
+            lambda batch: self._fetch_elevation_many([grid_points[key] for key in batch]),
+            chunk_size=settings.elevation_batch_chunk_size
+        )
+        
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        
+        elevations = [result["elevation_meters"] for result in results]
+        return {
+            "elevation": elevations,
+            "terrain_types": [result["terrain_type"] for result in results],
+            "elevation_feet": [result["elevation_feet"] for result in results]
         }
-        
-        response = await self.client.get(self.BASE_URL, params=params)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Add terrain classification for each point
-        if "elevation" in data:
-            elevations = data["elevation"]
-            data["terrain_types"] = [
-                self.classify_terrain(elev) for elev in elevations
-            ]
-            data["elevation_feet"] = [
-                round(elev * 3.28084, 2) for elev in elevations
-            ]
-        
-        self._set_cache(cache_key, data)
-        return data
     
     def classify_terrain(self, elevation: float) -> Dict[str, str]:
         """
@@ -3,10 +3,11 @@ Flood API Service
 Provides river discharge forecasts and flood risk data from Open-Meteo
 """
 
-from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
-import httpx
+from typing import Dict, Any
 from app.config import settings
+from app.upstream import upstream_client
+from app.cache import cache
+from app.grid import snap, echo_coordinates
 
 
 class FloodService:
@@ -15,30 +16,13 @@ class FloodService:
     BASE_URL = "https://flood-api.open-meteo.com/v1/flood"
     
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=settings.api_timeout_seconds)
-        self._cache: Dict[str, tuple[datetime, Any]] = {}
-        self.cache_ttl = timedelta(hours=6)  # Flood data updates every 6 hours
-    
-    async def close(self):
-        """Close the HTTP client"""
-        await self.client.aclose()
+        self.client = upstream_client
+        self._cache = cache.namespace("flood", settings.cache_ttl_flood_seconds)
     
     def _get_cache_key(self, *args) -> str:
         """Generate cache key from arguments"""
         return "|".join(str(arg) for arg in args)
     
-    def _get_cached(self, key: str) -> Optional[Any]:
-        """Get cached data if still valid"""
-        if key in self._cache:
-            timestamp, data = self._cache[key]
-            if datetime.now() - timestamp < self.cache_ttl:
-                return data
-        return None
-    
-    def _set_cache(self, key: str, data: Any):
-        """Store data in cache"""
-        self._cache[key] = (datetime.now(), data)
-    
     async def get_river_discharge_forecast(
         self,
         latitude: float,
@@ -56,12 +40,23 @@ class FloodService:
         Returns:
             River discharge forecast data
         """
-        cache_key = self._get_cache_key("discharge", latitude, longitude, days)
+        grid_lat, grid_lon = snap("flood", latitude, longitude)
+        cache_key = self._get_cache_key("discharge", grid_lat, grid_lon, days)
         
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
+        data = await self._cache.get_or_load(
+            cache_key,
+            lambda: self._fetch_river_discharge_forecast(grid_lat, grid_lon, days)
+        )
         
+        return echo_coordinates(data, latitude, longitude)
+    
+    async def _fetch_river_discharge_forecast(
+        self,
+        latitude: float,
+        longitude: float,
+        days: int
+    ) -> Dict[str, Any]:
+        """Fetch the river discharge forecast from upstream"""
         params = {
             "latitude": latitude,
             "longitude": longitude,
@@ -85,7 +80,6 @@ class FloodService:
         if "daily" in data and "river_discharge" in data["daily"]:
             data["flood_risk"] = self.assess_flood_risk(data["daily"]["river_discharge"])
         
-        self._set_cache(cache_key, data)
         return data
     
     async def get_historical_discharge(
@@ -107,14 +101,26 @@ class FloodService:
         Returns:
             Historical river discharge data
         """
+        grid_lat, grid_lon = snap("flood", latitude, longitude)
         cache_key = self._get_cache_key(
-            "historical", latitude, longitude, start_date, end_date
+            "historical", grid_lat, grid_lon, start_date, end_date
         )
         
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
+        data = await self._cache.get_or_load(
+            cache_key,
+            lambda: self._fetch_historical_discharge(grid_lat, grid_lon, start_date, end_date)
+        )
         
+        return echo_coordinates(data, latitude, longitude)
+    
+    async def _fetch_historical_discharge(
+        self,
+        latitude: float,
+        longitude: float,
+        start_date: str,
+        end_date: str
+    ) -> Dict[str, Any]:
+        """Fetch historical river discharge from upstream"""
         params = {
             "latitude": latitude,
             "longitude": longitude,
@@ -129,7 +135,6 @@ class FloodService:
         response.raise_for_status()
         data = response.json()
         
-        self._set_cache(cache_key, data)
         return data
     
     def assess_flood_risk(self, discharge_values: list[float]) -> Dict[str, Any]:
@@ -1,9 +1,18 @@
 """Historical Weather Service - Fetches historical data from Open-Meteo Archive API"""
 
-from typing import Dict, Any, List
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, Deque, List, Tuple
 import httpx
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from app.config import settings
+from app.upstream import upstream_client
+from app.cache import cache, mark_uncacheable
+from app.grid import snap, echo_coordinates
+from app.resilience import UpstreamUnavailableError, is_client_error
+
+logger = logging.getLogger(__name__)
 
 class HistoricalWeatherService:
     """Service for fetching historical weather data from Open-Meteo Archive API"""
@@ -11,24 +20,269 @@ class HistoricalWeatherService:
     BASE_URL = "https://archive-api.open-meteo.com/v1/archive"
     
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=settings.api_timeout_seconds)
-        self._cache: Dict[str, tuple[datetime, Any]] = {}
-    
-    async def close(self):
-        """Close the HTTP client"""
-        await self.client.aclose()
+        self.client = upstream_client
+        self._cache = cache.namespace("historical", settings.cache_ttl_historical_seconds)
     
     def _get_cache_key(self, lat: float, lon: float, start: str, end: str) -> str:
         """Generate cache key for historical data"""
         return f"historical_{lat}_{lon}_{start}_{end}"
     
-    def _is_cache_valid(self, cache_key: str) -> bool:
-        """Check if cached data is still valid (24 hours TTL for historical data)"""
-        if cache_key not in self._cache:
-            return False
+    def _ttl_for_range(self, end: date) -> int:
+        """Archive data is final after a few days, so only recent ranges need a short TTL"""
+        age_days = (date.today() - end).days
+        if age_days > settings.historical_recent_days:
+            return settings.cache_ttl_historical_archive_seconds
+        return settings.cache_ttl_historical_recent_seconds
+    
+    def _calendar_blocks(self, start: date, end: date) -> List[Tuple[date, date]]:
+        """
+        Split a date range into calendar-year blocks
         
-        cached_time, _ = self._cache[cache_key]
-        return datetime.now() - cached_time < timedelta(hours=24)
+        Finished years are always fetched whole so any range touching them
+        reuses the same cached block; the year containing today is fetched
+        up to the requested end date. Daily and hourly data use the same
+        blocks, so a 30-year range costs 30 upstream requests either way.
+        """
+        if start > end:
+            raise ValueError("start_date must not be after end_date")
+        
+        today = date.today()
+        blocks = []
+        for year in range(start.year, end.year + 1):
+            block_end = date(year, 12, 31)
+            if block_end >= today and block_end >= end:
+                block_end = end
+            blocks.append((date(year, 1, 1), block_end))
+        return blocks
+    
+    async def _load_blocks(
+        self,
+        kind: str,
+        latitude: float,
+        longitude: float,
+        start_date: str,
+        end_date: str,
+        fetch: Callable[[float, float, str, str], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Load a range block by block through the cache and stitch the result
+        
+        Only missing blocks are fetched, concurrently up to
+        settings.historical_max_parallel_blocks. With
+        settings.historical_partial_results, blocks that still fail after
+        their retries are null-filled and listed in "missing_ranges" (the
+        request only fails when every block does).
+        
+        Args:
+            kind: Time series section, "daily" or "hourly"
+            latitude: Grid-snapped latitude
+            longitude: Grid-snapped longitude
+            start_date: Start date in YYYY-MM-DD format
+            end_date: End date in YYYY-MM-DD format
+            fetch: Upstream fetcher for one block
+            
+        Returns:
+            Upstream-shaped response covering start_date..end_date
+        """
+        start = date.fromisoformat(start_date)
+        end = date.fromisoformat(end_date)
+        # The trim in _stitch_blocks compares strings, so use the canonical form
+        start_date, end_date = start.isoformat(), end.isoformat()
+        load_block = self._block_loader(kind, latitude, longitude, fetch)
+        ranges = self._calendar_blocks(start, end)
+        
+        if not settings.historical_partial_results:
+            blocks = await asyncio.gather(*(load_block(block_start, block_end) for block_start, block_end in ranges))
+            return self._stitch_blocks(blocks, kind, start_date, end_date)
+        
+        results = await asyncio.gather(
+            *(load_block(block_start, block_end) for block_start, block_end in ranges),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result
+        loaded = [result for result in results if not isinstance(result, Exception)]
+        if not loaded:
+            raise results[0]
+        if len(loaded) == len(results):
+            return self._stitch_blocks(results, kind, start_date, end_date)
+        
+        # Keep the series continuous: failed blocks become null-filled gaps
+        missing = []
+        blocks = []
+        for (block_start, block_end), result in zip(ranges, results):
+            if isinstance(result, Exception):
+                logger.warning(
+                    "Historical %s block %s..%s failed: %s", kind, block_start, block_end, result
+                )
+                missing.append({
+                    "start_date": max(block_start, start).isoformat(),
+                    "end_date": min(block_end, end).isoformat(),
+                    "error": str(result),
+                })
+                result = self._gap_block(kind, loaded[0], block_start, block_end)
+            blocks.append(result)
+        
+        # Incomplete, so not worth an ETag or a stored body
+        mark_uncacheable()
+        data = self._stitch_blocks(blocks, kind, start_date, end_date)
+        data["missing_ranges"] = missing
+        return data
+    
+    def _gap_block(
+        self,
+        kind: str,
+        template: Dict[str, Any],
+        block_start: date,
+        block_end: date
+    ) -> Dict[str, Any]:
+        """Null-filled stand-in for a block that could not be loaded, shaped like the template block"""
+        days = [(block_start + timedelta(days=i)).isoformat() for i in range((block_end - block_start).days + 1)]
+        times = days if kind == "daily" else [f"{day}T{hour:02d}:00" for day in days for hour in range(24)]
+        names = [name for name in template.get(kind, {}) if name != "time"]
+        gap = {key: value for key, value in template.items() if key != kind}
+        gap[kind] = {"time": times, **{name: [None] * len(times) for name in names}}
+        return gap
+    
+    async def _stream_blocks(
+        self,
+        kind: str,
+        latitude: float,
+        longitude: float,
+        start_date: str,
+        end_date: str,
+        fetch: Callable[[float, float, str, str], Awaitable[Dict[str, Any]]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Load a range block by block through the cache, yielding each block as soon as it is ready
+        
+        At most settings.historical_max_parallel_blocks blocks are loaded ahead
+        of the consumer, and a new one is only started when the consumer takes
+        the oldest, so memory stays bounded by that window (and a slow reader
+        slows the fetching down) however long the range is.
+        
+        Args:
+            kind: Time series section, "daily" or "hourly"
+            latitude: Grid-snapped latitude
+            longitude: Grid-snapped longitude
+            start_date: Start date in YYYY-MM-DD format
+            end_date: End date in YYYY-MM-DD format
+            fetch: Upstream fetcher for one block
+            
+        Yields:
+            Upstream-shaped responses in chronological order, each trimmed to
+            start_date..end_date. With settings.historical_partial_results, a
+            block that still fails is yielded as {"missing_range": {...}}
+            instead (as in _load_blocks, the stream only fails when every
+            block does).
+        """
+        start = date.fromisoformat(start_date)
+        end = date.fromisoformat(end_date)
+        # The trim in _stitch_blocks compares strings, so use the canonical form
+        start_date, end_date = start.isoformat(), end.isoformat()
+        load_block = self._block_loader(kind, latitude, longitude, fetch)
+        upcoming = iter(self._calendar_blocks(start, end))
+        window = max(1, settings.historical_max_parallel_blocks)
+        pending: Deque[Tuple[date, date, asyncio.Task]] = deque()
+        failures: List[Exception] = []
+        loaded = False
+        
+        try:
+            while True:
+                for block_start, block_end in upcoming:
+                    pending.append((block_start, block_end, asyncio.ensure_future(load_block(block_start, block_end))))
+                    if len(pending) >= window:
+                        break
+                if not pending:
+                    break
+                block_start, block_end, task = pending.popleft()
+                try:
+                    block = await task
+                except Exception as e:
+                    if not settings.historical_partial_results:
+                        raise
+                    logger.warning("Historical %s block %s..%s failed: %s", kind, block_start, block_end, e)
+                    failures.append(e)
+                    yield {"missing_range": {
+                        "start_date": max(block_start, start).isoformat(),
+                        "end_date": min(block_end, end).isoformat(),
+                        "error": str(e),
+                    }}
+                    continue
+                loaded = True
+                yield self._stitch_blocks([block], kind, start_date, end_date)
+        finally:
+            # The consumer stopped early (client gone, failed block): drop the read-ahead
+            for _, _, task in pending:
+                task.cancel()
+        if failures and not loaded:
+            raise failures[0]
+    
+    def _block_loader(
+        self,
+        kind: str,
+        latitude: float,
+        longitude: float,
+        fetch: Callable[[float, float, str, str], Awaitable[Dict[str, Any]]]
+    ) -> Callable[[date, date], Awaitable[Dict[str, Any]]]:
+        """Cached loader of one block, at most settings.historical_max_parallel_blocks fetching at once"""
+        semaphore = asyncio.Semaphore(settings.historical_max_parallel_blocks)
+        prefix = "" if kind == "daily" else f"{kind}_"
+        
+        async def load_block(block_start: date, block_end: date) -> Dict[str, Any]:
+            block_key = prefix + self._get_cache_key(
+                latitude, longitude, block_start.isoformat(), block_end.isoformat()
+            )
+            async with semaphore:
+                return await self._cache.get_or_load(
+                    block_key,
+                    lambda: self._fetch_block(kind, latitude, longitude, block_start, block_end, fetch),
+                    ttl_seconds=self._ttl_for_range(block_end)
+                )
+        
+        return load_block
+    
+    async def _fetch_block(
+        self,
+        kind: str,
+        latitude: float,
+        longitude: float,
+        block_start: date,
+        block_end: date,
+        fetch: Callable[[float, float, str, str], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Fetch one block, retrying it on its own as two concurrent halves when it fails
+        
+        A block that errors, or takes longer than
+        settings.historical_block_timeout_seconds (including the upstream
+        client's own retries), is requested again as two smaller ranges. They
+        are stitched back together, so the cached block is always whole. A
+        rejected request or an unavailable host (open circuit breaker,
+        exhausted rate limit) is not asked again.
+        """
+        timeout = settings.historical_block_timeout_seconds
+        try:
+            return await asyncio.wait_for(
+                fetch(latitude, longitude, block_start.isoformat(), block_end.isoformat()), timeout
+            )
+        except UpstreamUnavailableError:
+            raise
+        except Exception as e:
+            # Upstream rejected the request itself (4xx); asking again in parts would not help
+            if block_end <= block_start or is_client_error(e):
+                raise
+            logger.warning("Historical %s block %s..%s failed (%r), retrying in halves", kind, block_start, block_end, e)
+        
+        middle = block_start + (block_end - block_start) // 2
+        halves = await asyncio.gather(
+            asyncio.wait_for(fetch(latitude, longitude, block_start.isoformat(), middle.isoformat()), timeout),
+            asyncio.wait_for(
+                fetch(latitude, longitude, (middle + timedelta(days=1)).isoformat(), block_end.isoformat()), timeout
+            )
+        )
+        return self._stitch_blocks(list(halves), kind, block_start.isoformat(), block_end.isoformat())
     
     async def get_historical_weather(
         self,
@@ -49,12 +303,55 @@ class HistoricalWeatherService:
         Returns:
             Dictionary containing daily historical weather data
         """
-        cache_key = self._get_cache_key(latitude, longitude, start_date, end_date)
+        grid_lat, grid_lon = snap("historical", latitude, longitude)
+        
+        # Each calendar year is cached separately and only missing years are fetched
+        data = await self._load_blocks(
+            "daily", grid_lat, grid_lon, start_date, end_date, self._fetch_historical_weather
+        )
+        
+        return echo_coordinates(data, latitude, longitude)
+    
+    def _stitch_blocks(
+        self,
+        blocks: List[Dict[str, Any]],
+        section: str,
+        start_date: str,
+        end_date: str
+    ) -> Dict[str, Any]:
+        """
+        Concatenate consecutive upstream blocks and trim them to the requested range
         
-        if self._is_cache_valid(cache_key):
-            _, cached_data = self._cache[cache_key]
-            return cached_data
+        Args:
+            blocks: Upstream responses in chronological order
+            section: Time series section to merge ("daily" or "hourly")
+            start_date: First requested date (YYYY-MM-DD)
+            end_date: Last requested date (YYYY-MM-DD)
+            
+        Returns:
+            A single response in the upstream shape covering start_date..end_date
+        """
+        merged = {k: v for k, v in blocks[0].items() if k != section}
+        series: Dict[str, List[Any]] = {}
+        for block in blocks:
+            for name, values in block.get(section, {}).items():
+                series.setdefault(name, []).extend(values)
         
+        times = series.get("time", [])
+        # Timestamps are ISO strings, so the date prefix compares lexically
+        first = next((i for i, t in enumerate(times) if t[:10] >= start_date), len(times))
+        last = next((i for i in range(len(times) - 1, -1, -1) if times[i][:10] <= end_date), -1)
+        merged[section] = {name: values[first:last + 1] for name, values in series.items()}
+        return merged
+    
+    async def _fetch_historical_weather(
+        self,
+        latitude: float,
+        longitude: float,
+        start_date: str,
+        end_date: str
+    ) -> Dict[str, Any]:
+        """Fetch daily historical data from upstream"""
         params = {
             "latitude": latitude,
             "longitude": longitude,
@@ -84,13 +381,10 @@ class HistoricalWeatherService:
             response.raise_for_status()
             data = response.json()
             
-            # Cache the result
-            self._cache[cache_key] = (datetime.now(), data)
-            
             return data
             
         except httpx.HTTPError as e:
-            raise Exception(f"Failed to fetch historical weather data: {str(e)}")
+            raise Exception(f"Failed to fetch historical weather data: {str(e)}") from e
     
     async def get_historical_hourly(
         self,
@@ -111,6 +405,53 @@ class HistoricalWeatherService:
         Returns:
             Dictionary containing hourly historical weather data
         """
+        grid_lat, grid_lon = snap("historical", latitude, longitude)
+        
+        # Cached per calendar year, like the daily path
+        data = await self._load_blocks(
+            "hourly", grid_lat, grid_lon, start_date, end_date, self._fetch_historical_hourly
+        )
+        
+        return echo_coordinates(data, latitude, longitude)
+    
+    async def stream_historical_hourly(
+        self,
+        latitude: float,
+        longitude: float,
+        start_date: str,
+        end_date: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Get hourly historical weather data one calendar year at a time
+        
+        Uses the same cached yearly blocks as get_historical_hourly, but
+        yields them in order as they arrive instead of building the whole
+        range in memory.
+        
+        Args:
+            latitude: Location latitude
+            longitude: Location longitude
+            start_date: Start date in YYYY-MM-DD format
+            end_date: End date in YYYY-MM-DD format
+            
+        Yields:
+            Dictionaries shaped like get_historical_hourly's result, each holding one year of the range
+        """
+        grid_lat, grid_lon = snap("historical", latitude, longitude)
+        
+        async for block in self._stream_blocks(
+            "hourly", grid_lat, grid_lon, start_date, end_date, self._fetch_historical_hourly
+        ):
+            yield echo_coordinates(block, latitude, longitude)
+    
+    async def _fetch_historical_hourly(
+        self,
+        latitude: float,
+        longitude: float,
+        start_date: str,
+        end_date: str
+    ) -> Dict[str, Any]:
+        """Fetch hourly historical data from upstream"""
         params = {
             "latitude": latitude,
             "longitude": longitude,
@@ -137,7 +478,7 @@ class HistoricalWeatherService:
             return data
             
         except httpx.HTTPError as e:
-            raise Exception(f"Failed to fetch hourly historical data: {str(e)}")
+            raise Exception(f"Failed to fetch hourly historical data: {str(e)}") from e
     
     def calculate_statistics(self, data: List[float]) -> Dict[str, float]:
         """
@@ -191,11 +532,12 @@ class HistoricalWeatherService:
                     "precipitation": []
                 }
             
-            if "temperature_2m_max" in daily:
+            # Missing values (null) are skipped
+            if daily.get("temperature_2m_max") and daily["temperature_2m_max"][i] is not None:
                 monthly_data[month_key]["temps_max"].append(daily["temperature_2m_max"][i])
-            if "temperature_2m_min" in daily:
+            if daily.get("temperature_2m_min") and daily["temperature_2m_min"][i] is not None:
                 monthly_data[month_key]["temps_min"].append(daily["temperature_2m_min"][i])
-            if "precipitation_sum" in daily:
+            if daily.get("precipitation_sum") and daily["precipitation_sum"][i] is not None:
                 monthly_data[month_key]["precipitation"].append(daily["precipitation_sum"][i])
         
         # Calculate statistics for each month
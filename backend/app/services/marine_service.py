@@ -1,9 +1,13 @@
 """Marine Weather Service - Fetches ocean/marine data from Open-Meteo Marine API"""
 
-from typing import Dict, Any
+from typing import Dict, Any, List
 import httpx
-from datetime import datetime, timedelta
 from app.config import settings
+from app.upstream import upstream_client
+from app.cache import cache
+from app.grid import snap, echo_coordinates
+from app.batch import Point, join_coordinates, split_locations, load_points
+from app.microbatch import MicroBatcher
 
 class MarineService:
     """Service for fetching marine weather data from Open-Meteo Marine API"""
@@ -11,25 +15,14 @@ class MarineService:
     BASE_URL = "https://marine-api.open-meteo.com/v1/marine"
     
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=settings.api_timeout_seconds)
-        self._cache: Dict[str, tuple[datetime, Any]] = {}
-    
-    async def close(self):
-        """Close the HTTP client"""
-        await self.client.aclose()
+        self.client = upstream_client
+        self._cache = cache.namespace("marine", settings.cache_ttl_marine_seconds)
+        self._current_batcher = MicroBatcher("marine_current", self._fetch_current_marine_conditions_many)
     
     def _get_cache_key(self, lat: float, lon: float, endpoint: str) -> str:
         """Generate cache key for marine data"""
         return f"marine_{endpoint}_{lat}_{lon}"
     
-    def _is_cache_valid(self, cache_key: str) -> bool:
-        """Check if cached data is still valid (1 hour TTL for marine data)"""
-        if cache_key not in self._cache:
-            return False
-        
-        cached_time, _ = self._cache[cache_key]
-        return datetime.now() - cached_time < timedelta(hours=1)
-    
     async def get_current_marine_conditions(
         self,
         latitude: float,
@@ -45,15 +38,30 @@ class MarineService:
         Returns:
             Dictionary containing current marine data
         """
-        cache_key = self._get_cache_key(latitude, longitude, "current")
+        grid_lat, grid_lon = snap("marine", latitude, longitude)
+        cache_key = self._get_cache_key(grid_lat, grid_lon, "current")
         
-        if self._is_cache_valid(cache_key):
-            _, cached_data = self._cache[cache_key]
-            return cached_data
+        data = await self._cache.get_or_load(cache_key, lambda: self._fetch_current_marine_conditions(grid_lat, grid_lon))
         
+        return echo_coordinates(data, latitude, longitude)
+    
+    async def _fetch_current_marine_conditions(
+        self,
+        latitude: float,
+        longitude: float
+    ) -> Dict[str, Any]:
+        """Fetch current marine conditions from upstream"""
+        return await self._current_batcher.submit((latitude, longitude))
+    
+    async def _fetch_current_marine_conditions_many(
+        self,
+        points: List[Point]
+    ) -> List[Dict[str, Any]]:
+        """Fetch current marine conditions for several grid points in one upstream request"""
+        latitudes, longitudes = join_coordinates(points)
         params = {
-            "latitude": latitude,
-            "longitude": longitude,
+            "latitude": latitudes,
+            "longitude": longitudes,
             "current": [
                 "wave_height",
                 "wave_direction",
@@ -71,16 +79,32 @@ class MarineService:
         try:
             response = await self.client.get(self.BASE_URL, params=params)
             response.raise_for_status()
-            data = response.json()
-            
-            # Cache the result
-            self._cache[cache_key] = (datetime.now(), data)
-            
-            return data
+            return split_locations(response.json())
             
         except httpx.HTTPError as e:
             raise Exception(f"Failed to fetch marine conditions: {str(e)}")
     
+    async def get_current_marine_conditions_batch(
+        self,
+        coordinates: List[Dict[str, float]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Get current marine conditions for many locations
+        
+        Args:
+            coordinates: List of {"lat": float, "lon": float} dictionaries
+            
+        Returns:
+            One result per location, in input order
+        """
+        return await load_points(
+            self._cache,
+            "marine",
+            coordinates,
+            lambda lat, lon: self._get_cache_key(lat, lon, "current"),
+            self._fetch_current_marine_conditions_many
+        )
+    
     async def get_marine_forecast(
         self,
         latitude: float,
@@ -98,15 +122,55 @@ class MarineService:
         Returns:
             Dictionary containing hourly and daily marine forecast
         """
-        cache_key = self._get_cache_key(latitude, longitude, f"forecast_{days}")
+        grid_lat, grid_lon = snap("marine", latitude, longitude)
+        cache_key = self._get_cache_key(grid_lat, grid_lon, f"forecast_{days}")
+        
+        data = await self._cache.get_or_load(cache_key, lambda: self._fetch_marine_forecast(grid_lat, grid_lon, days))
         
-        if self._is_cache_valid(cache_key):
-            _, cached_data = self._cache[cache_key]
-            return cached_data
+        return echo_coordinates(data, latitude, longitude)
+    
+    async def get_marine_forecast_batch(
+        self,
+        coordinates: List[Dict[str, float]],
+        days: int = 7
+    ) -> List[Dict[str, Any]]:
+        """
+        Get marine forecasts for many locations
         
+        Args:
+            coordinates: List of {"lat": float, "lon": float} dictionaries
+            days: Number of forecast days
+            
+        Returns:
+            One result per location, in input order
+        """
+        return await load_points(
+            self._cache,
+            "marine",
+            coordinates,
+            lambda lat, lon: self._get_cache_key(lat, lon, f"forecast_{days}"),
+            lambda points: self._fetch_marine_forecast_many(points, days)
+        )
+    
+    async def _fetch_marine_forecast(
+        self,
+        latitude: float,
+        longitude: float,
+        days: int
+    ) -> Dict[str, Any]:
+        """Fetch the marine forecast from upstream"""
+        return (await self._fetch_marine_forecast_many([(latitude, longitude)], days))[0]
+    
+    async def _fetch_marine_forecast_many(
+        self,
+        points: List[Point],
+        days: int
+    ) -> List[Dict[str, Any]]:
+        """Fetch the marine forecast for several grid points in one upstream request"""
+        latitudes, longitudes = join_coordinates(points)
         params = {
-            "latitude": latitude,
-            "longitude": longitude,
+            "latitude": latitudes,
+            "longitude": longitudes,
             "hourly": [
                 "wave_height",
                 "wave_direction",
@@ -134,12 +198,7 @@ class MarineService:
         try:
             response = await self.client.get(self.BASE_URL, params=params)
             response.raise_for_status()
-            data = response.json()
-            
-            # Cache the result
-            self._cache[cache_key] = (datetime.now(), data)
-            
-            return data
+            return split_locations(response.json())
             
         except httpx.HTTPError as e:
             raise Exception(f"Failed to fetch marine forecast: {str(e)}")
@@ -2,8 +2,11 @@
 
 from typing import Dict, Any, List
 import httpx
-from datetime import datetime, timedelta
 from app.config import settings
+from app.upstream import upstream_client
+from app.cache import cache
+from app.grid import snap, echo_coordinates
+from app.batch import Point, join_coordinates, split_locations, load_points
 
 class SolarService:
     """Service for fetching solar radiation data from Open-Meteo API"""
@@ -11,25 +14,13 @@ class SolarService:
     BASE_URL = "https://api.open-meteo.com/v1/forecast"
     
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=settings.api_timeout_seconds)
-        self._cache: Dict[str, tuple[datetime, Any]] = {}
-    
-    async def close(self):
-        """Close the HTTP client"""
-        await self.client.aclose()
+        self.client = upstream_client
+        self._cache = cache.namespace("solar", settings.cache_ttl_solar_seconds)
     
     def _get_cache_key(self, lat: float, lon: float, endpoint: str) -> str:
         """Generate cache key for solar data"""
         return f"solar_{endpoint}_{lat}_{lon}"
     
-    def _is_cache_valid(self, cache_key: str) -> bool:
-        """Check if cached data is still valid (1 hour TTL)"""
-        if cache_key not in self._cache:
-            return False
-        
-        cached_time, _ = self._cache[cache_key]
-        return datetime.now() - cached_time < timedelta(hours=1)
-    
     async def get_current_solar_data(
         self,
         latitude: float,
@@ -45,15 +36,30 @@ class SolarService:
         Returns:
             Dictionary containing current solar data
         """
-        cache_key = self._get_cache_key(latitude, longitude, "current")
+        grid_lat, grid_lon = snap("solar", latitude, longitude)
+        cache_key = self._get_cache_key(grid_lat, grid_lon, "current")
         
-        if self._is_cache_valid(cache_key):
-            _, cached_data = self._cache[cache_key]
-            return cached_data
+        data = await self._cache.get_or_load(cache_key, lambda: self._fetch_current_solar_data(grid_lat, grid_lon))
         
+        return echo_coordinates(data, latitude, longitude)
+    
+    async def _fetch_current_solar_data(
+        self,
+        latitude: float,
+        longitude: float
+    ) -> Dict[str, Any]:
+        """Fetch current solar data from upstream"""
+        return (await self._fetch_current_solar_data_many([(latitude, longitude)]))[0]
+    
+    async def _fetch_current_solar_data_many(
+        self,
+        points: List[Point]
+    ) -> List[Dict[str, Any]]:
+        """Fetch current solar data for several grid points in one upstream request"""
+        latitudes, longitudes = join_coordinates(points)
         params = {
-            "latitude": latitude,
-            "longitude": longitude,
+            "latitude": latitudes,
+            "longitude": longitudes,
             "current": [
                 "shortwave_radiation",
                 "direct_radiation",
@@ -72,16 +78,32 @@ class SolarService:
         try:
             response = await self.client.get(self.BASE_URL, params=params)
             response.raise_for_status()
-            data = response.json()
-            
-            # Cache the result
-            self._cache[cache_key] = (datetime.now(), data)
-            
-            return data
+            return split_locations(response.json())
             
         except httpx.HTTPError as e:
             raise Exception(f"Failed to fetch solar data: {str(e)}")
     
+    async def get_current_solar_data_batch(
+        self,
+        coordinates: List[Dict[str, float]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Get current solar data for many locations
+        
+        Args:
+            coordinates: List of {"lat": float, "lon": float} dictionaries
+            
+        Returns:
+            One result per location, in input order
+        """
+        return await load_points(
+            self._cache,
+            "solar",
+            coordinates,
+            lambda lat, lon: self._get_cache_key(lat, lon, "current"),
+            self._fetch_current_solar_data_many
+        )
+    
     async def get_solar_forecast(
         self,
         latitude: float,
@@ -99,15 +121,55 @@ class SolarService:
         Returns:
             Dictionary containing hourly and daily solar forecast
         """
-        cache_key = self._get_cache_key(latitude, longitude, f"forecast_{days}")
+        grid_lat, grid_lon = snap("solar", latitude, longitude)
+        cache_key = self._get_cache_key(grid_lat, grid_lon, f"forecast_{days}")
         
-        if self._is_cache_valid(cache_key):
-            _, cached_data = self._cache[cache_key]
-            return cached_data
+        data = await self._cache.get_or_load(cache_key, lambda: self._fetch_solar_forecast(grid_lat, grid_lon, days))
         
+        return echo_coordinates(data, latitude, longitude)
+    
+    async def get_solar_forecast_batch(
+        self,
+        coordinates: List[Dict[str, float]],
+        days: int = 7
+    ) -> List[Dict[str, Any]]:
+        """
+        Get solar forecasts for many locations
+        
+        Args:
+            coordinates: List of {"lat": float, "lon": float} dictionaries
+            days: Number of forecast days
+            
+        Returns:
+            One result per location, in input order
+        """
+        return await load_points(
+            self._cache,
+            "solar",
+            coordinates,
+            lambda lat, lon: self._get_cache_key(lat, lon, f"forecast_{days}"),
+            lambda points: self._fetch_solar_forecast_many(points, days)
+        )
+    
+    async def _fetch_solar_forecast(
+        self,
+        latitude: float,
+        longitude: float,
+        days: int
+    ) -> Dict[str, Any]:
+        """Fetch the solar forecast from upstream"""
+        return (await self._fetch_solar_forecast_many([(latitude, longitude)], days))[0]
+    
+    async def _fetch_solar_forecast_many(
+        self,
+        points: List[Point],
+        days: int
+    ) -> List[Dict[str, Any]]:
+        """Fetch the solar forecast for several grid points in one upstream request"""
+        latitudes, longitudes = join_coordinates(points)
         params = {
-            "latitude": latitude,
-            "longitude": longitude,
+            "latitude": latitudes,
+            "longitude": longitudes,
             "hourly": [
                 "shortwave_radiation",
                 "direct_radiation",
@@ -130,12 +192,7 @@ class SolarService:
         try:
             response = await self.client.get(self.BASE_URL, params=params)
             response.raise_for_status()
-            data = response.json()
-            
-            # Cache the result
-            self._cache[cache_key] = (datetime.now(), data)
-            
-            return data
+            return split_locations(response.json())
             
         except httpx.HTTPError as e:
             raise Exception(f"Failed to fetch solar forecast: {str(e)}")
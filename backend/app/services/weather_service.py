@@ -1,7 +1,14 @@
+import logging
+from typing import Dict, Any, List
 import httpx
-from typing import Optional, Dict, Any
-from datetime import datetime, timedelta
 from app.config import settings
+from app.upstream import upstream_client
+from app.cache import cache
+from app.grid import snap
+from app.batch import Point, join_coordinates, split_locations, load_points
+from app.microbatch import MicroBatcher
+from app.encoding import EncodedBodyCache
+from app.metrics import FALLBACKS
 from app.models import (
     LocationSearchResponse,
     LocationResult,
@@ -16,31 +23,31 @@ from app.models import (
     ReverseGeocodeResponse,
 )
 
+logger = logging.getLogger(__name__)
+
 
 class WeatherService:
     """Service for fetching weather data"""
     
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=settings.api_timeout_seconds)
-        self.cache: Dict[str, tuple[Any, datetime]] = {}
+        self.client = upstream_client
+        self._cache = cache.namespace("weather", settings.cache_ttl_seconds)
+        self._bodies = EncodedBodyCache("weather")
+        self._reverse_geocode_fallbacks = FALLBACKS.labels("reverse_geocode")
+        # One micro-batcher per variable set, since a multi-point request shares its parameters
+        self._current_batchers = {
+            units: MicroBatcher(
+                f"weather_current_{units}",
+                lambda points, units=units: self._fetch_current_weather_many(points, units)
+            )
+            for units in ("metric", "imperial")
+        }
         
-    async def close(self):
-        """Close the HTTP client"""
-        await self.client.aclose()
-    
-    def _get_cache(self, key: str) -> Optional[Any]:
-        """Get value from cache if not expired"""
-        if key in self.cache:
-            value, timestamp = self.cache[key]
-            if datetime.utcnow() - timestamp < timedelta(seconds=settings.cache_ttl_seconds):
-                return value
-            else:
-                del self.cache[key]
-        return None
-    
-    def _set_cache(self, key: str, value: Any):
-        """Set value in cache with current timestamp"""
-        self.cache[key] = (value, datetime.utcnow())
+    @staticmethod
+    def _echo_location(result, lat: float, lon: float):
+        """Copy of a cached response whose location carries the caller's coordinates"""
+        location = result.location.model_copy(update={"latitude": lat, "longitude": lon})
+        return result.model_copy(update={"location": location})
     
     @staticmethod
     def _interpret_weather_code(code: int) -> str:
@@ -80,10 +87,15 @@ class WeatherService:
     async def search_location(self, query: str, count: int = 10) -> LocationSearchResponse:
         """Search for locations using Open-Meteo Geocoding API"""
         cache_key = f"geocoding:{query}:{count}"
-        cached = self._get_cache(cache_key)
-        if cached:
-            return cached
-        
+        return await self._cache.get_or_load(cache_key, lambda: self._fetch_location(query, count))
+    
+    async def search_location_json(self, query: str, count: int = 10) -> bytes:
+        """Location search results as encoded JSON, reused while the cached result is unchanged"""
+        result = await self.search_location(query, count)
+        return self._bodies.render(f"geocoding:{query}:{count}", result)
+    
+    async def _fetch_location(self, query: str, count: int) -> LocationSearchResponse:
+        """Fetch location search results from upstream"""
         params = {
             "name": query,
             "count": count,
@@ -112,7 +124,6 @@ class WeatherService:
                     ))
             
             result = LocationSearchResponse(results=results)
-            self._set_cache(cache_key, result)
             return result
             
         except httpx.HTTPError as e:
@@ -120,11 +131,24 @@ class WeatherService:
 
     async def reverse_geocode(self, lat: float, lon: float) -> ReverseGeocodeResponse:
         """Get location name from coordinates using OpenStreetMap Nominatim"""
-        cache_key = f"reverse:{lat}:{lon}"
-        cached = self._get_cache(cache_key)
-        if cached:
-            return cached
+        grid_lat, grid_lon = snap("reverse_geocode", lat, lon)
+        cache_key = f"reverse:{grid_lat}:{grid_lon}"
+        try:
+            return await self._cache.get_or_load(cache_key, lambda: self._fetch_reverse_geocode(grid_lat, grid_lon))
+        except Exception as e:
+            # Fallback if reverse geocoding fails
+            self._reverse_geocode_fallbacks.inc()
+            logger.warning("Reverse geocoding failed, using coordinates as the name: %s", e)
+            return ReverseGeocodeResponse(name=f"{lat:.2f}, {lon:.2f}", country="")
+
+    async def reverse_geocode_json(self, lat: float, lon: float) -> bytes:
+        """Reverse geocode as encoded JSON, reused while the cached result is unchanged"""
+        grid_lat, grid_lon = snap("reverse_geocode", lat, lon)
+        result = await self.reverse_geocode(lat, lon)
+        return self._bodies.render(f"reverse:{grid_lat}:{grid_lon}", result)
 
+    async def _fetch_reverse_geocode(self, lat: float, lon: float) -> ReverseGeocodeResponse:
+        """Fetch a reverse geocode from Nominatim"""
         # Use Nominatim for reverse geocoding
         url = "https://nominatim.openstreetmap.org/reverse"
         params = {
@@ -137,29 +161,20 @@ class WeatherService:
             "User-Agent": "AdiyogiWeatherApp/1.0"
         }
 
-        try:
-            response = await self.client.get(url, params=params, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-
-            address = data.get("address", {})
-            # Try to find the most relevant city name
-            name = address.get("city") or address.get("town") or address.get("village") or address.get("county") or "Unknown Location"
-            country = address.get("country", "")
+        response = await self.client.get(url, params=params, headers=headers)
+        response.raise_for_status()
+        data = response.json()
 
-            result = ReverseGeocodeResponse(
-                name=name,
-                city=name,
-                country=country
-            )
-            
-            self._set_cache(cache_key, result)
-            return result
+        address = data.get("address", {})
+        # Try to find the most relevant city name
+        name = address.get("city") or address.get("town") or address.get("village") or address.get("county") or "Unknown Location"
+        country = address.get("country", "")
 
-        except Exception as e:
-            # Fallback if reverse geocoding fails
-            print(f"Reverse geocoding failed: {e}")
-            return ReverseGeocodeResponse(name=f"{lat:.2f}, {lon:.2f}", country="")
+        return ReverseGeocodeResponse(
+            name=name,
+            city=name,
+            country=country
+        )
     
     async def get_current_weather(
         self, 
@@ -168,17 +183,45 @@ class WeatherService:
         units: str = "metric"
     ) -> CurrentWeatherResponse:
         """Get current weather for coordinates"""
-        cache_key = f"current:{lat}:{lon}:{units}"
-        cached = self._get_cache(cache_key)
-        if cached:
-            return cached
+        grid_lat, grid_lon = snap("forecast", lat, lon)
+        cache_key = f"current:{grid_lat}:{grid_lon}:{units}"
+        result = await self._cache.get_or_load(
+            cache_key, lambda: self._fetch_current_weather(grid_lat, grid_lon, units)
+        )
         
+        return self._echo_location(result, lat, lon)
+    
+    async def get_current_weather_json(self, lat: float, lon: float, units: str = "metric") -> bytes:
+        """Current weather as encoded JSON, reused while the cached result is unchanged"""
+        grid_lat, grid_lon = snap("forecast", lat, lon)
+        cache_key = f"current:{grid_lat}:{grid_lon}:{units}"
+        result = await self._cache.get_or_load(
+            cache_key, lambda: self._fetch_current_weather(grid_lat, grid_lon, units)
+        )
+        return self._bodies.render_located(cache_key, result, lat, lon)
+    
+    async def _fetch_current_weather(
+        self,
+        lat: float,
+        lon: float,
+        units: str
+    ) -> CurrentWeatherResponse:
+        """Fetch current weather from upstream"""
+        return await self._current_batchers[units].submit((lat, lon))
+    
+    async def _fetch_current_weather_many(
+        self,
+        points: List[Point],
+        units: str
+    ) -> List[CurrentWeatherResponse]:
+        """Fetch current weather for several grid points in one upstream request"""
         temp_unit = "celsius" if units == "metric" else "fahrenheit"
         wind_unit = "kmh" if units == "metric" else "mph"
+        latitudes, longitudes = join_coordinates(points)
         
         params = {
-            "latitude": lat,
-            "longitude": lon,
+            "latitude": latitudes,
+            "longitude": longitudes,
             "current": ",".join([
                 "temperature_2m",
                 "apparent_temperature",
@@ -199,49 +242,51 @@ class WeatherService:
         try:
             response = await self.client.get(settings.openmeteo_forecast_url, params=params)
             response.raise_for_status()
-            data = response.json()
-            
-            current_data = data.get("current", {})
-            
-            current_weather = CurrentWeather(
-                time=current_data.get("time", ""),
-                temperature=current_data.get("temperature_2m", 0),
-                apparent_temperature=current_data.get("apparent_temperature", 0),
-                weather_code=current_data.get("weather_code", 0),
-                weather_description=self._interpret_weather_code(current_data.get("weather_code", 0)),
-                humidity=current_data.get("relative_humidity_2m", 0),
-                pressure=current_data.get("surface_pressure", 0),
-                wind_speed=current_data.get("wind_speed_10m", 0),
-                wind_direction=current_data.get("wind_direction_10m", 0),
-                wind_gusts=current_data.get("wind_gusts_10m", 0),
-                cloud_cover=current_data.get("cloud_cover", 0),
-                precipitation=current_data.get("precipitation", 0),
-            )
             
-            location_info = LocationInfo(
-                latitude=data.get("latitude"),
-                longitude=data.get("longitude"),
-                timezone=data.get("timezone", "UTC"),
-                elevation=data.get("elevation"),
-            )
-            
-            units_info = WeatherUnits(
-                temperature="°C" if units == "metric" else "°F",
-                wind_speed="km/h" if units == "metric" else "mph",
-            )
-            
-            result = CurrentWeatherResponse(
-                location=location_info,
-                current=current_weather,
-                units=units_info,
-            )
-            
-            self._set_cache(cache_key, result)
-            return result
+            return [self._parse_current_weather(data, units) for data in split_locations(response.json())]
             
         except httpx.HTTPError as e:
             raise Exception(f"Failed to fetch current weather: {str(e)}")
     
+    def _parse_current_weather(self, data: Dict[str, Any], units: str) -> CurrentWeatherResponse:
+        """Build a CurrentWeatherResponse from one upstream location"""
+        current_data = data.get("current", {})
+        
+        current_weather = CurrentWeather(
+            time=current_data.get("time", ""),
+            temperature=current_data.get("temperature_2m", 0),
+            apparent_temperature=current_data.get("apparent_temperature", 0),
+            weather_code=current_data.get("weather_code", 0),
+            weather_description=self._interpret_weather_code(current_data.get("weather_code", 0)),
+            humidity=current_data.get("relative_humidity_2m", 0),
+            pressure=current_data.get("surface_pressure", 0),
+            wind_speed=current_data.get("wind_speed_10m", 0),
+            wind_direction=current_data.get("wind_direction_10m", 0),
+            wind_gusts=current_data.get("wind_gusts_10m", 0),
+            cloud_cover=current_data.get("cloud_cover", 0),
+            precipitation=current_data.get("precipitation", 0),
+        )
+        
+        location_info = LocationInfo(
+            latitude=data.get("latitude"),
+            longitude=data.get("longitude"),
+            timezone=data.get("timezone", "UTC"),
+            elevation=data.get("elevation"),
+        )
+        
+        units_info = WeatherUnits(
+            temperature="°C" if units == "metric" else "°F",
+            wind_speed="km/h" if units == "metric" else "mph",
+        )
+        
+        result = CurrentWeatherResponse(
+            location=location_info,
+            current=current_weather,
+            units=units_info,
+        )
+        
+        return result
+    
     async def get_forecast(
         self,
         lat: float,
@@ -251,17 +296,63 @@ class WeatherService:
     ) -> ForecastResponse:
         """Get hourly and daily forecast"""
         # BUST CACHE: Added 'v2' to key
-        cache_key = f"forecast:v2:{lat}:{lon}:{days}:{units}"
-        cached = self._get_cache(cache_key)
-        if cached:
-            return cached
+        grid_lat, grid_lon = snap("forecast", lat, lon)
+        cache_key = f"forecast:v2:{grid_lat}:{grid_lon}:{days}:{units}"
+        result = await self._cache.get_or_load(
+            cache_key, lambda: self._fetch_forecast(grid_lat, grid_lon, days, units)
+        )
         
+        return self._echo_location(result, lat, lon)
+    
+    async def get_forecast_json(self, lat: float, lon: float, days: int = 7, units: str = "metric") -> bytes:
+        """Forecast as encoded JSON, reused while the cached result is unchanged"""
+        grid_lat, grid_lon = snap("forecast", lat, lon)
+        cache_key = f"forecast:v2:{grid_lat}:{grid_lon}:{days}:{units}"
+        result = await self._cache.get_or_load(
+            cache_key, lambda: self._fetch_forecast(grid_lat, grid_lon, days, units)
+        )
+        return self._bodies.render_located(cache_key, result, lat, lon)
+    
+    async def get_forecast_batch(
+        self,
+        coordinates: List[Dict[str, float]],
+        days: int = 7,
+        units: str = "metric"
+    ) -> List[Any]:
+        """Get forecasts for many locations, in input order"""
+        return await load_points(
+            self._cache,
+            "forecast",
+            coordinates,
+            lambda lat, lon: f"forecast:v2:{lat}:{lon}:{days}:{units}",
+            lambda points: self._fetch_forecast_many(points, days, units),
+            echo=self._echo_location,
+        )
+    
+    async def _fetch_forecast(
+        self,
+        lat: float,
+        lon: float,
+        days: int,
+        units: str
+    ) -> ForecastResponse:
+        """Fetch the forecast from upstream"""
+        return (await self._fetch_forecast_many([(lat, lon)], days, units))[0]
+    
+    async def _fetch_forecast_many(
+        self,
+        points: List[Point],
+        days: int,
+        units: str
+    ) -> List[ForecastResponse]:
+        """Fetch forecasts for several grid points in one upstream request"""
         temp_unit = "celsius" if units == "metric" else "fahrenheit"
         wind_unit = "kmh" if units == "metric" else "mph"
+        latitudes, longitudes = join_coordinates(points)
         
         params = {
-            "latitude": lat,
-            "longitude": lon,
+            "latitude": latitudes,
+            "longitude": longitudes,
             "current": ",".join([
                 "temperature_2m",
                 "apparent_temperature",
@@ -303,96 +394,92 @@ class WeatherService:
         }
         
         try:
-            print(f"Fetching forecast for {lat}, {lon}")
             response = await self.client.get(settings.openmeteo_forecast_url, params=params)
             response.raise_for_status()
-            data = response.json()
-            
-            # DEBUG LOGS
-            print(f"API Response Keys: {data.keys()}")
-            print(f"Current Keys: {data.get('current', {}).keys()}")
-            print(f"Wind Speed 10m: {data.get('current', {}).get('wind_speed_10m')}")
-
-            current_data = data.get("current", {})
-            hourly_data = data.get("hourly", {})
-            daily_data = data.get("daily", {})
             
-            hourly_forecast = HourlyForecast(
-                time=hourly_data.get("time", []),
-                temperature=hourly_data.get("temperature_2m", []),
-                apparent_temperature=hourly_data.get("apparent_temperature", []),
-                weather_code=hourly_data.get("weather_code", []),
-                precipitation_probability=hourly_data.get("precipitation_probability", []),
-                precipitation=hourly_data.get("precipitation", []),
-                wind_speed=hourly_data.get("wind_speed_10m", []),
-                wind_direction=hourly_data.get("wind_direction_10m", []),
-                humidity=hourly_data.get("relative_humidity_2m", []),
-                cloud_cover=hourly_data.get("cloud_cover", []),
-            )
-            
-            daily_forecast = DailyForecast(
-                time=daily_data.get("time", []),
-                temperature_max=daily_data.get("temperature_2m_max", []),
-                temperature_min=daily_data.get("temperature_2m_min", []),
-                weather_code=daily_data.get("weather_code", []),
-                precipitation_sum=daily_data.get("precipitation_sum", []),
-                precipitation_probability_max=daily_data.get("precipitation_probability_max", []),
-                sunrise=daily_data.get("sunrise", []),
-                sunset=daily_data.get("sunset", []),
-                uv_index_max=daily_data.get("uv_index_max", []),
-                wind_speed_max=daily_data.get("wind_speed_10m_max", []),
-            )
+            return [self._parse_forecast(data, units) for data in split_locations(response.json())]
             
-            location_info = LocationInfo(
-                latitude=data.get("latitude"),
-                longitude=data.get("longitude"),
-                timezone=data.get("timezone", "UTC"),
-                elevation=data.get("elevation"),
-            )
+        except httpx.HTTPError as e:
+            raise Exception(f"Failed to fetch forecast: {str(e)}")
+    
+    def _parse_forecast(self, data: Dict[str, Any], units: str) -> ForecastResponse:
+        """Build a ForecastResponse from one upstream location"""
+        current_data = data.get("current", {})
+        hourly_data = data.get("hourly", {})
+        daily_data = data.get("daily", {})
+        
+        hourly_forecast = HourlyForecast(
+            time=hourly_data.get("time", []),
+            temperature=hourly_data.get("temperature_2m", []),
+            apparent_temperature=hourly_data.get("apparent_temperature", []),
+            weather_code=hourly_data.get("weather_code", []),
+            precipitation_probability=hourly_data.get("precipitation_probability", []),
+            precipitation=hourly_data.get("precipitation", []),
+            wind_speed=hourly_data.get("wind_speed_10m", []),
+            wind_direction=hourly_data.get("wind_direction_10m", []),
+            humidity=hourly_data.get("relative_humidity_2m", []),
+            cloud_cover=hourly_data.get("cloud_cover", []),
+        )
+        
+        daily_forecast = DailyForecast(
+            time=daily_data.get("time", []),
+            temperature_max=daily_data.get("temperature_2m_max", []),
+            temperature_min=daily_data.get("temperature_2m_min", []),
+            weather_code=daily_data.get("weather_code", []),
+            precipitation_sum=daily_data.get("precipitation_sum", []),
+            precipitation_probability_max=daily_data.get("precipitation_probability_max", []),
+            sunrise=daily_data.get("sunrise", []),
+            sunset=daily_data.get("sunset", []),
+            uv_index_max=daily_data.get("uv_index_max", []),
+            wind_speed_max=daily_data.get("wind_speed_10m_max", []),
+        )
+        
+        location_info = LocationInfo(
+            latitude=data.get("latitude"),
+            longitude=data.get("longitude"),
+            timezone=data.get("timezone", "UTC"),
+            elevation=data.get("elevation"),
+        )
 
-            current_weather = None
-            if current_data:
-                # Use daily max UV as proxy since current UV is not available
-                uv_proxy = 0
-                if daily_data and "uv_index_max" in daily_data:
-                    uv_list = daily_data.get("uv_index_max", [])
-                    if uv_list:
-                        uv_proxy = uv_list[0]
+        current_weather = None
+        if current_data:
+            # Use daily max UV as proxy since current UV is not available
+            uv_proxy = 0
+            if daily_data and "uv_index_max" in daily_data:
+                uv_list = daily_data.get("uv_index_max", [])
+                if uv_list:
+                    uv_proxy = uv_list[0]
 
-                current_weather = CurrentWeather(
-                    time=current_data.get("time", ""),
-                    temperature=current_data.get("temperature_2m", 0),
-                    apparent_temperature=current_data.get("apparent_temperature", 0),
-                    weather_code=current_data.get("weather_code", 0),
-                    weather_description=self._interpret_weather_code(current_data.get("weather_code", 0)),
-                    humidity=current_data.get("relative_humidity_2m", 0),
-                    pressure=current_data.get("surface_pressure", 0),
-                    wind_speed=current_data.get("wind_speed_10m", 0),
-                    wind_direction=current_data.get("wind_direction_10m", 0),
-                    wind_gusts=current_data.get("wind_gusts_10m", 0),
-                    cloud_cover=current_data.get("cloud_cover", 0),
-                    precipitation=current_data.get("precipitation", 0),
-                    uv_index=uv_proxy,
-                )
-            
-            units_info = WeatherUnits(
-                temperature="°C" if units == "metric" else "°F",
-                wind_speed="km/h" if units == "metric" else "mph",
-            )
-            
-            result = ForecastResponse(
-                location=location_info,
-                current=current_weather,
-                hourly=hourly_forecast,
-                daily=daily_forecast,
-                units=units_info,
+            current_weather = CurrentWeather(
+                time=current_data.get("time", ""),
+                temperature=current_data.get("temperature_2m", 0),
+                apparent_temperature=current_data.get("apparent_temperature", 0),
+                weather_code=current_data.get("weather_code", 0),
+                weather_description=self._interpret_weather_code(current_data.get("weather_code", 0)),
+                humidity=current_data.get("relative_humidity_2m", 0),
+                pressure=current_data.get("surface_pressure", 0),
+                wind_speed=current_data.get("wind_speed_10m", 0),
+                wind_direction=current_data.get("wind_direction_10m", 0),
+                wind_gusts=current_data.get("wind_gusts_10m", 0),
+                cloud_cover=current_data.get("cloud_cover", 0),
+                precipitation=current_data.get("precipitation", 0),
+                uv_index=uv_proxy,
             )
-            
-            self._set_cache(cache_key, result)
-            return result
-            
-        except httpx.HTTPError as e:
-            raise Exception(f"Failed to fetch forecast: {str(e)}")
+        
+        units_info = WeatherUnits(
+            temperature="°C" if units == "metric" else "°F",
+            wind_speed="km/h" if units == "metric" else "mph",
+        )
+        
+        result = ForecastResponse(
+            location=location_info,
+            current=current_weather,
+            hourly=hourly_forecast,
+            daily=daily_forecast,
+            units=units_info,
+        )
+        
+        return result
 
 
 # Global service instance
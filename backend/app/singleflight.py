@@ -0,0 +1,73 @@
+"""
+Single-Flight Request Coalescing
+Concurrent cache misses on the same key share one in-flight upstream fetch
+"""
+
+import asyncio
+from typing import Dict, Any, Awaitable, Callable, List, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into a single execution"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.executions = 0
+        self.collapsed = 0
+        _registry.append(self)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run fn once per key; concurrent callers for the same key await the same result
+
+        Args:
+            key: Coalescing key (normally the cache key)
+            fn: Zero-argument coroutine function performing the fetch
+
+        Returns:
+            The result of fn, shared by every caller that joined the flight
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self.collapsed += 1
+        else:
+            self.executions += 1
+            # Runs in the first caller's context on purpose: that request waits for the fetch, so its
+            # upstream time belongs in its Server-Timing. Phases ending after the request has finished
+            # are dropped by app.timing, and background refreshes start from an empty context.
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+
+        # Shield so one caller being cancelled does not cancel the shared fetch
+        return await asyncio.shield(task)
+
+    def is_in_flight(self, key: str) -> bool:
+        """Whether a call for this key is currently running"""
+        return key in self._inflight
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Coalescing counters for this flight group"""
+        return {
+            "executions": self.executions,
+            "collapsed": self.collapsed,
+            "in_flight": len(self._inflight),
+        }
+
+
+_registry: List[SingleFlight] = []
+
+
+def singleflight_stats() -> Dict[str, Dict[str, Any]]:
+    """Coalescing counters for every flight group, keyed by name"""
+    return {group.name: group.stats() for group in _registry}
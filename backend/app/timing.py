@@ -0,0 +1,332 @@
+"""
+Request Timing
+Per-request phase breakdown (cache, upstream, model, encode, compress) reported in a Server-Timing header
+and as sampled OpenTelemetry-compatible spans exported to a file or an OTLP/HTTP collector
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional
+import httpx
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+
+class RequestTiming:
+    """Phase totals and finished spans collected while handling one request"""
+
+    def __init__(self, trace_id: str, parent_span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_span_id = parent_span_id
+        self.sampled = sampled
+        self.phases: Dict[str, float] = {}
+        self.spans: List[Dict[str, Any]] = []
+        self.closed = False
+
+
+class _Frame:
+    __slots__ = ("timing", "span_id", "child_seconds")
+
+    def __init__(self, timing: RequestTiming, span_id: str):
+        self.timing = timing
+        self.span_id = span_id
+        self.child_seconds = 0.0
+
+
+_frame: ContextVar[Optional[_Frame]] = ContextVar("timing_frame", default=None)
+
+
+class phase:
+    """
+    Time a block as one phase of the current request
+
+    Nested phases are subtracted from the enclosing one, so each phase reports
+    its own (exclusive) time: a cache lookup that loads upstream contributes
+    only its bookkeeping to "cache", the loader's parsing to "model" and the
+    HTTP round trip to "upstream". Concurrent children can add up to more than
+    their parent's wall time; the parent is then clamped at zero. Outside a
+    request this is a no-op.
+
+    Usage:
+        with phase("upstream", host=host):
+            response = await client.get(url)
+    """
+
+    __slots__ = ("name", "attributes", "kind", "_parent", "_frame", "_token", "_started", "_started_ns")
+
+    def __init__(self, name: str, kind: int = SPAN_KIND_INTERNAL, **attributes: Any):
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self._frame = None
+
+    def __enter__(self):
+        parent = _frame.get()
+        if parent is None or parent.timing.closed:
+            return self
+        self._parent = parent
+        self._frame = _Frame(parent.timing, _new_id(8) if parent.timing.sampled else "")
+        self._token = _frame.set(self._frame)
+        self._started_ns = time.time_ns()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        frame = self._frame
+        if frame is None:
+            return False
+        elapsed = time.perf_counter() - self._started
+        _frame.reset(self._token)
+        self._parent.child_seconds += elapsed
+
+        timing = frame.timing
+        if timing.closed:
+            return False
+        timing.phases[self.name] = timing.phases.get(self.name, 0.0) + max(0.0, elapsed - frame.child_seconds)
+        if timing.sampled:
+            timing.spans.append(_span(
+                timing.trace_id, frame.span_id, self._parent.span_id, self.name, self.kind,
+                self._started_ns, self._started_ns + int(elapsed * 1e9), self.attributes, exc,
+            ))
+        return False
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware opening a timing context per HTTP request
+
+    Adds a Server-Timing header listing each phase's exclusive duration plus the
+    total time until the response headers, and records a server span (with the
+    phase spans as children) for sampled requests. An incoming W3C traceparent
+    is continued, including its sampling decision.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (settings.server_timing_enabled or exporter.enabled):
+            await self.app(scope, receive, send)
+            return
+
+        timing = _start_timing(scope)
+        root = _Frame(timing, timing.span_id)
+        token = _frame.set(root)
+        started_ns = time.time_ns()
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.server_timing_enabled:
+                    header = _server_timing(timing, time.perf_counter() - started)
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _frame.reset(token)
+            timing.closed = True
+            if timing.sampled:
+                route = getattr(scope.get("route"), "path", None) or scope["path"]
+                attributes = {
+                    "http.request.method": scope["method"],
+                    "http.route": route,
+                    "url.path": scope["path"],
+                    "http.response.status_code": status,
+                }
+                elapsed_ns = int((time.perf_counter() - started) * 1e9)
+                timing.spans.append(_span(
+                    timing.trace_id, timing.span_id, timing.parent_span_id, f"{scope['method']} {route}",
+                    SPAN_KIND_SERVER, started_ns, started_ns + elapsed_ns, attributes, None, error=status >= 500,
+                ))
+                exporter.export(timing.spans)
+
+
+def _start_timing(scope) -> RequestTiming:
+    traceparent = None
+    for key, value in scope["headers"]:
+        if key == b"traceparent":
+            traceparent = value.decode("latin-1")
+            break
+
+    parent = _parse_traceparent(traceparent) if traceparent else None
+    if parent is not None:
+        trace_id, parent_span_id, sampled = parent
+    else:
+        trace_id, parent_span_id = _new_id(16), ""
+        sampled = random.random() < settings.tracing_sample_rate
+    return RequestTiming(trace_id, parent_span_id, sampled and exporter.enabled)
+
+
+def _parse_traceparent(header: str):
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3][:2], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+def _server_timing(timing: RequestTiming, total: float) -> bytes:
+    metrics = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timing.phases.items()]
+    metrics.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(metrics).encode("latin-1")
+
+
+def _new_id(size: int) -> str:
+    return os.urandom(size).hex()
+
+
+def _span(
+    trace_id: str,
+    span_id: str,
+    parent_span_id: str,
+    name: str,
+    kind: int,
+    start_ns: int,
+    end_ns: int,
+    attributes: Dict[str, Any],
+    exc: Optional[BaseException],
+    error: bool = False,
+) -> Dict[str, Any]:
+    """One span in the OTLP/JSON encoding"""
+    span = {
+        "traceId": trace_id,
+        "spanId": span_id,
+        "name": name,
+        "kind": kind,
+        "startTimeUnixNano": str(start_ns),
+        "endTimeUnixNano": str(end_ns),
+        "attributes": [_attribute(key, value) for key, value in attributes.items() if value is not None],
+        "status": {"code": 2 if exc is not None or error else 0},
+    }
+    if parent_span_id:
+        span["parentSpanId"] = parent_span_id
+    if exc is not None:
+        span["status"]["message"] = str(exc) or type(exc).__name__
+    return span
+
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class SpanExporter:
+    """
+    Buffers finished spans and ships them in OTLP/JSON batches
+
+    "file" appends one ExportTraceServiceRequest per line (the format read by
+    the collector's otlpjsonfile receiver); "otlp" POSTs the same document to
+    an OTLP/HTTP endpoint. The buffer is bounded and drops spans when full, so
+    a slow or missing collector never holds up requests.
+    """
+
+    def __init__(self):
+        self._buffer: List[Dict[str, Any]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self.exported = 0
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.tracing_exporter in ("file", "otlp")
+
+    def export(self, spans: List[Dict[str, Any]]):
+        room = settings.tracing_max_buffered_spans - len(self._buffer)
+        if room < len(spans):
+            self.dropped += len(spans) - max(room, 0)
+            spans = spans[:max(room, 0)]
+        self._buffer.extend(spans)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.tracing_export_interval_seconds)
+            await self.flush()
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        spans, self._buffer = self._buffer, []
+        document = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_attribute("service.name", settings.tracing_service_name)]},
+                "scopeSpans": [{"scope": {"name": "app.timing"}, "spans": spans}],
+            }]
+        }
+        try:
+            if settings.tracing_exporter == "file":
+                await asyncio.to_thread(_append_line, settings.tracing_file_path, json.dumps(document))
+            else:
+                if self._client is None:
+                    self._client = httpx.AsyncClient(timeout=settings.api_timeout_seconds)
+                response = await self._client.post(settings.tracing_otlp_endpoint, json=document)
+                response.raise_for_status()
+            self.exported += len(spans)
+        except Exception as e:
+            self.dropped += len(spans)
+            logger.warning("Exporting %d spans failed: %s", len(spans), e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "exporter": settings.tracing_exporter,
+            "sample_rate": settings.tracing_sample_rate,
+            "buffered": len(self._buffer),
+            "exported": self.exported,
+            "dropped": self.dropped,
+        }
+
+
+def _append_line(path: str, line: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+exporter = SpanExporter()
@@ -0,0 +1,223 @@
+"""
+Upstream HTTP Client
+Shared, pooled httpx client used by every backend service to reach Open-Meteo and Nominatim
+"""
+
+import importlib.util
+import logging
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, Optional
+import httpx
+from app.config import settings
+from app.metrics import UpstreamHandles, registry
+from app.resilience import CircuitBreaker, call_with_retries
+from app.admission import admission_controller
+from app.timing import SPAN_KIND_CLIENT, phase
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HostPoolStats:
+    """Connection pool counters for a single upstream host"""
+
+    max_connections: int
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    requests: int = 0
+    saturated: int = 0  # requests that found every pooled connection busy
+    pool_timeouts: int = 0
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """Response stream that releases its in-flight slot once the body is consumed"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, stats: HostPoolStats):
+        self._stream = stream
+        self._stats = stats
+        self._released = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._stats.in_flight -= 1
+
+
+class _HostPoolTransport(httpx.AsyncBaseTransport):
+    """Routes each request to a connection pool dedicated to its host"""
+
+    def __init__(self, http2: bool):
+        self._http2 = http2
+        self._pools: Dict[str, httpx.AsyncHTTPTransport] = {}
+        self.stats: Dict[str, HostPoolStats] = {}
+        self.metrics: Dict[str, UpstreamHandles] = {}
+
+    def _limits_for(self, host: str) -> httpx.Limits:
+        max_connections = settings.upstream_host_connection_limits.get(
+            host, settings.upstream_max_connections_per_host
+        )
+        return httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=min(max_connections, settings.upstream_max_keepalive_per_host),
+            keepalive_expiry=settings.upstream_keepalive_expiry_seconds,
+        )
+
+    def _pool_for(self, host: str) -> httpx.AsyncHTTPTransport:
+        pool = self._pools.get(host)
+        if pool is None:
+            limits = self._limits_for(host)
+            pool = httpx.AsyncHTTPTransport(limits=limits, http2=self._http2)
+            self._pools[host] = pool
+            self.stats[host] = HostPoolStats(max_connections=limits.max_connections)
+            self.metrics[host] = UpstreamHandles(host)
+        return pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        pool = self._pool_for(host)
+        stats = self.stats[host]
+        metrics = self.metrics[host]
+
+        stats.requests += 1
+        if stats.in_flight >= stats.max_connections:
+            stats.saturated += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+
+        started = time.perf_counter()
+        try:
+            response = await pool.handle_async_request(request)
+        except httpx.PoolTimeout as e:
+            stats.pool_timeouts += 1
+            stats.in_flight -= 1
+            metrics.error(e, time.perf_counter() - started)
+            raise
+        except Exception as e:
+            stats.in_flight -= 1
+            metrics.error(e, time.perf_counter() - started)
+            raise
+        except BaseException:
+            stats.in_flight -= 1
+            raise
+
+        metrics.response(response.status_code, time.perf_counter() - started)
+        response.stream = _TrackedStream(response.stream, stats)
+        return response
+
+    async def aclose(self):
+        for pool in self._pools.values():
+            await pool.aclose()
+        self._pools.clear()
+
+
+class UpstreamClient:
+    """Single connection-pooled client shared by all services, owned by the app lifespan"""
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._transport: Optional[_HostPoolTransport] = None
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def _build_client(self) -> httpx.AsyncClient:
+        http2 = settings.upstream_http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("UPSTREAM_HTTP2 is enabled but the 'h2' package is not installed; using HTTP/1.1")
+            http2 = False
+
+        self._transport = _HostPoolTransport(http2=http2)
+        return httpx.AsyncClient(
+            transport=self._transport,
+            timeout=httpx.Timeout(
+                settings.api_timeout_seconds,
+                pool=settings.upstream_pool_timeout_seconds,
+            ),
+        )
+
+    async def start(self):
+        """Create the pooled client (called from the app lifespan)"""
+        if self._client is None:
+            self._client = self._build_client()
+
+    async def close(self):
+        """Close every pooled connection"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> httpx.Response:
+        """
+        Issue a GET request through the shared pool
+
+        Each attempt first passes the host's admission gate (concurrency cap
+        and rate limit, see app.admission). Transient failures are retried
+        with backoff behind the host's circuit breaker (see app.resilience).
+        Hosts listed in
+        settings.upstream_base_url_overrides are sent to the override instead,
+        e.g. a local fake upstream, while keeping their own breaker.
+
+        Raises:
+            UpstreamUnavailableError: The host is failing, its breaker is open,
+                or the request could not be admitted in time
+        """
+        if self._client is None:
+            await self.start()
+
+        target = httpx.URL(url)
+        host = target.host
+        override = settings.upstream_base_url_overrides.get(host)
+        if override:
+            url = override.rstrip("/") + target.raw_path.decode("ascii")
+
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(host)
+
+        admission = admission_controller.for_host(host)
+
+        async def send() -> httpx.Response:
+            if admission is None:
+                return await self._client.get(url, params=params, headers=headers)
+            await admission.acquire()
+            try:
+                return await self._client.get(url, params=params, headers=headers)
+            finally:
+                admission.release()
+
+        with phase("upstream", SPAN_KIND_CLIENT, **{"server.address": host}):
+            return await call_with_retries(breaker, send)
+
+    def pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-host pool usage and saturation counters"""
+        if self._transport is None:
+            return {}
+        return {host: asdict(stats) for host, stats in self._transport.stats.items()}
+
+    def breaker_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-host circuit breaker state and counters"""
+        return {host: breaker.stats() for host, breaker in self._breakers.items()}
+
+
+# Global upstream client shared by all services
+upstream_client = UpstreamClient()
+
+_BREAKER_STATES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+
+registry.collected(
+    "adiyogi_upstream_breaker_state",
+    "Circuit breaker state per host (0 closed, 1 half-open, 2 open)",
+    "gauge",
+    lambda: (("", {"host": host}, _BREAKER_STATES[breaker.state]) for host, breaker in upstream_client._breakers.items()),
+)
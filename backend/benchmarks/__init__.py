@@ -0,0 +1,4 @@
+"""
+Benchmarks
+Load profiles run against the API with every upstream pointed at a local fake Open-Meteo server
+"""
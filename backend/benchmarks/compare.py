@@ -0,0 +1,66 @@
+"""
+Benchmark Comparison
+Prints per-profile deltas between two benchmark reports
+
+Run: python -m benchmarks.compare BEFORE.json AFTER.json
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+# (label, path into a profile result, True when higher is better)
+METRICS: List[Tuple[str, Tuple[str, ...], bool]] = [
+    ("rps", ("rps",), True),
+    ("p50 ms", ("latency_ms", "p50"), False),
+    ("p95 ms", ("latency_ms", "p95"), False),
+    ("p99 ms", ("latency_ms", "p99"), False),
+    ("error rate", ("error_rate",), False),
+    ("upstream/request", ("upstream_per_request",), False),
+    ("rss growth MiB", ("rss_mib", "growth"), False),
+    ("rss peak MiB", ("rss_mib", "peak"), False),
+]
+
+
+def _lookup(result: Dict[str, Any], path: Tuple[str, ...]) -> Optional[float]:
+    value: Any = result
+    for part in path:
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def format_comparison(before: Dict[str, Any], after: Dict[str, Any]) -> str:
+    """Table of before/after values per profile, with relative change and a better/worse mark"""
+    lines = [f"{before['label']} -> {after['label']}"]
+    for name in after["profiles"]:
+        if name not in before["profiles"]:
+            continue
+        lines.append(f"\n{name}")
+        for label, path, higher_is_better in METRICS:
+            old = _lookup(before["profiles"][name], path)
+            new = _lookup(after["profiles"][name], path)
+            if old is None or new is None:
+                continue
+            if old:
+                change = (new - old) / abs(old)
+                mark = "" if abs(change) < 0.05 else ("better" if (change > 0) == higher_is_better else "worse")
+                delta = f"{change:+.1%}"
+            else:
+                mark, delta = "", "n/a" if new else "+0.0%"
+            lines.append(f"  {label:<18}{old:>12}{new:>12}{delta:>10}  {mark}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("before", type=Path)
+    parser.add_argument("after", type=Path)
+    args = parser.parse_args(argv)
+    print(format_comparison(json.loads(args.before.read_text()), json.loads(args.after.read_text())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+"""
+Fake Upstream Server
+Serves Open-Meteo-shaped forecast, archive, air quality, marine, flood, climate,
+elevation and geocoding payloads (plus Nominatim reverse geocoding) with
+configurable latency and error injection
+
+Each upstream host is mounted under its own path prefix, so the API is pointed
+at it with UPSTREAM_BASE_URL_OVERRIDES, e.g.
+{"api.open-meteo.com": "http://127.0.0.1:9100/api.open-meteo.com"}.
+
+Run: python -m benchmarks.fake_upstream --port 9100 --latency-ms 80 --error-rate 0.01
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import math
+import random
+from collections import Counter
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+from urllib.parse import parse_qsl
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+if importlib.util.find_spec("orjson") is not None:
+    import orjson
+else:
+    orjson = None
+
+
+def _dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+# Hosts the API talks to; each is served under /<host>/...
+UPSTREAM_HOSTS = [
+    "api.open-meteo.com",
+    "archive-api.open-meteo.com",
+    "air-quality-api.open-meteo.com",
+    "marine-api.open-meteo.com",
+    "flood-api.open-meteo.com",
+    "climate-api.open-meteo.com",
+    "geocoding-api.open-meteo.com",
+    "nominatim.openstreetmap.org",
+]
+
+WEATHER_CODES = [0, 0, 1, 1, 2, 3, 3, 45, 51, 61, 63, 80, 95]
+
+
+class FaultConfig:
+    """Latency and error injection, adjustable at runtime through POST /_fake/config"""
+
+    def __init__(
+        self,
+        latency_ms: float = 50.0,
+        jitter_ms: float = 20.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        rate_limit_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        timeout_seconds: float = 30.0,
+    ):
+        self.latency_ms = latency_ms  # median added latency per request
+        self.jitter_ms = jitter_ms  # spread of the log-normal latency distribution
+        self.error_rate = error_rate  # fraction answered with error_status
+        self.error_status = error_status
+        self.rate_limit_rate = rate_limit_rate  # fraction answered with 429 + Retry-After: 1
+        self.timeout_rate = timeout_rate  # fraction that hang for timeout_seconds
+        self.timeout_seconds = timeout_seconds
+
+    def update(self, values: Dict[str, Any]):
+        for name, value in values.items():
+            if not hasattr(self, name):
+                raise ValueError(f"Unknown fault setting: {name}")
+            setattr(self, name, type(getattr(self, name))(value))
+
+    def delay(self) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        sigma = math.log1p(self.jitter_ms / self.latency_ms) if self.jitter_ms > 0 else 0.0
+        return random.lognormvariate(math.log(self.latency_ms), sigma) / 1000
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+faults = FaultConfig()
+requests_by_host: Counter = Counter()
+responses_by_status: Counter = Counter()
+
+app = FastAPI(title="Fake Open-Meteo upstream", docs_url=None, redoc_url=None)
+
+
+# ============================================================================
+# CONTROL
+# ============================================================================
+
+@app.get("/_fake/stats")
+async def get_stats():
+    """Requests received per host and responses per status"""
+    return {
+        "requests": sum(requests_by_host.values()),
+        "hosts": dict(requests_by_host),
+        "statuses": {str(status): count for status, count in responses_by_status.items()},
+        "faults": faults.as_dict(),
+    }
+
+
+@app.post("/_fake/config")
+async def set_config(request: Request):
+    """Change latency/error injection, e.g. {"error_rate": 0.2, "latency_ms": 300}"""
+    try:
+        faults.update(await request.json())
+    except (ValueError, TypeError) as e:
+        return Response(_dumps({"error": str(e)}), status_code=400, media_type="application/json")
+    return faults.as_dict()
+
+
+@app.post("/_fake/reset")
+async def reset_stats():
+    requests_by_host.clear()
+    responses_by_status.clear()
+    return {"status": "ok"}
+
+
+# ============================================================================
+# UPSTREAM
+# ============================================================================
+
+@app.get("/{host}/{path:path}")
+async def upstream(host: str, path: str, request: Request):
+    requests_by_host[host] += 1
+    await asyncio.sleep(faults.delay())
+
+    roll = random.random()
+    if roll < faults.timeout_rate:
+        await asyncio.sleep(faults.timeout_seconds)
+    roll -= faults.timeout_rate
+    if roll < faults.rate_limit_rate:
+        return _error(429, "Too many requests", {"Retry-After": "1"})
+    roll -= faults.rate_limit_rate
+    if roll < faults.error_rate:
+        return _error(faults.error_status, "Injected failure")
+
+    try:
+        body = render(host, path.rsplit("/", 1)[-1], request.url.query)
+    except (KeyError, ValueError) as e:
+        return _error(400, f"Invalid request: {e}")
+    if body is None:
+        return _error(404, f"Unknown endpoint {host}/{path}")
+    responses_by_status[200] += 1
+    return Response(body, media_type="application/json")
+
+
+def _error(status: int, reason: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    responses_by_status[status] += 1
+    return Response(
+        _dumps({"error": True, "reason": reason}),
+        status_code=status,
+        headers=headers,
+        media_type="application/json",
+    )
+
+
+@lru_cache(maxsize=4096)
+def render(host: str, endpoint: str, query: str) -> Optional[bytes]:
+    """Encoded payload for a request; identical queries get identical bodies"""
+    params = _params(query)
+    if host == "nominatim.openstreetmap.org":
+        return _dumps(_reverse_geocode(float(params["lat"][0]), float(params["lon"][0])))
+    if endpoint == "search":
+        return _dumps(_search(params.get("name", [""])[0], int(params.get("count", ["10"])[0])))
+
+    builder = {
+        "forecast": _forecast,
+        "archive": _forecast,
+        "air-quality": _forecast,
+        "marine": _forecast,
+        "flood": _forecast,
+        "climate": _climate,
+    }.get(endpoint)
+    latitudes = [float(value) for value in params["latitude"][0].split(",")]
+    longitudes = [float(value) for value in params["longitude"][0].split(",")]
+    if endpoint == "elevation":
+        return _dumps({"elevation": [_elevation(lat, lon) for lat, lon in zip(latitudes, longitudes)]})
+    if builder is None:
+        return None
+
+    locations = [builder(lat, lon, params) for lat, lon in zip(latitudes, longitudes)]
+    return _dumps(locations if len(locations) > 1 else locations[0])
+
+
+def _params(query: str) -> Dict[str, List[str]]:
+    """Query parameters by name, each a list of its (repeated) values"""
+    params: Dict[str, List[str]] = {}
+    for name, value in parse_qsl(query, keep_blank_values=True):
+        params.setdefault(name, []).append(value)
+    return params
+
+
+def _variables(params: Dict[str, List[str]], name: str) -> List[str]:
+    return [variable for value in params.get(name, []) for variable in value.split(",") if variable]
+
+
+# ============================================================================
+# PAYLOADS
+# ============================================================================
+
+def _location(lat: float, lon: float) -> Dict[str, Any]:
+    return {
+        "latitude": round(lat, 4),
+        "longitude": round(lon, 4),
+        "generationtime_ms": 0.5,
+        "utc_offset_seconds": 0,
+        "timezone": "GMT",
+        "timezone_abbreviation": "GMT",
+        "elevation": _elevation(lat, lon),
+    }
+
+
+def _forecast(lat: float, lon: float, params: Dict[str, List[str]]) -> Dict[str, Any]:
+    """Forecast-style response (forecast, archive, air quality, marine, flood)"""
+    data = _location(lat, lon)
+    today = date(2026, 1, 1)
+    if "start_date" in params:
+        start = date.fromisoformat(params["start_date"][0])
+        end = date.fromisoformat(params["end_date"][0])
+    else:
+        past_days = int(params.get("past_days", ["0"])[0])
+        start = today - timedelta(days=past_days)
+        end = today + timedelta(days=int(params.get("forecast_days", ["7"])[0]) - 1)
+
+    current = _variables(params, "current")
+    if current:
+        now = datetime(2026, 1, 1, 12)
+        data["current_units"] = {"time": "iso8601", "interval": "seconds", **{v: _unit(v) for v in current}}
+        data["current"] = {
+            "time": now.isoformat(timespec="minutes"),
+            "interval": 900,
+            **{v: _value(v, lat, lon, 12, 0) for v in current},
+        }
+    for resolution, step in (("hourly", 1), ("daily", 24)):
+        variables = _variables(params, resolution)
+        if variables:
+            data[f"{resolution}_units"] = {"time": "iso8601", **{v: _unit(v) for v in variables}}
+            data[resolution] = _series(variables, lat, lon, start, end, step)
+    return data
+
+
+def _climate(lat: float, lon: float, params: Dict[str, List[str]]) -> Dict[str, Any]:
+    """Climate projections; variables get a model suffix when several models are requested"""
+    data = _location(lat, lon)
+    models = _variables(params, "models") or ["EC_Earth3P_HR"]
+    variables = _variables(params, "daily")
+    start = date.fromisoformat(params["start_date"][0])
+    end = date.fromisoformat(params["end_date"][0])
+    series = _series(variables, lat, lon, start, end, 24)
+    if len(models) > 1:
+        series = {
+            "time": series["time"],
+            **{f"{v}_{model}": values for model in models for v, values in series.items() if v != "time"},
+        }
+    data["daily_units"] = {"time": "iso8601", **{v: _unit(v) for v in variables}}
+    data["daily"] = series
+    return data
+
+
+def _series(
+    variables: List[str], lat: float, lon: float, start: date, end: date, step_hours: int
+) -> Dict[str, List[Any]]:
+    if end < start:
+        raise ValueError("end_date before start_date")
+    origin = datetime(start.year, start.month, start.day)
+    count = ((end - start).days + 1) * 24 // step_hours
+    if step_hours == 24:
+        times = [(start + timedelta(days=i)).isoformat() for i in range(count)]
+    else:
+        times = [(origin + timedelta(hours=i)).isoformat(timespec="minutes") for i in range(count)]
+    series: Dict[str, List[Any]] = {"time": times}
+    base_hour = (start - date(2026, 1, 1)).days * 24
+    for variable in variables:
+        if variable in ("sunrise", "sunset"):
+            hour = 6 if variable == "sunrise" else 18
+            series[variable] = [f"{day}T{hour:02d}:{int(abs(lat)) % 60:02d}" for day in times]
+        else:
+            series[variable] = [_value(variable, lat, lon, base_hour + i * step_hours, i) for i in range(count)]
+    return series
+
+
+def _value(variable: str, lat: float, lon: float, hour: int, index: int) -> Any:
+    """A plausible, deterministic value for an Open-Meteo variable"""
+    phase = math.sin((hour % 24 - 9) / 24 * 2 * math.pi)
+    season = math.cos((hour / 24 % 365) / 365 * 2 * math.pi)
+    wobble = math.sin(lat * 12.9898 + lon * 78.233 + index * 0.7)
+    if variable == "weather_code":
+        return WEATHER_CODES[int((wobble + 1) * 6 + index) % len(WEATHER_CODES)]
+    if variable == "is_day":
+        return int(phase > -0.3)
+    if "temperature" in variable:
+        return round(25 - abs(lat) * 0.4 + 8 * phase + 6 * season + 2 * wobble, 1)
+    if "humidity" in variable or "cloud_cover" in variable or "probability" in variable:
+        return int(max(0, min(100, 60 - 25 * phase + 20 * wobble)))
+    if "precipitation" in variable or "rain" in variable or "showers" in variable or "snowfall" in variable:
+        return round(max(0.0, wobble * 3), 1)
+    if "direction" in variable:
+        return int((wobble + 1) * 180) % 360
+    if "wind" in variable or "gust" in variable:
+        return round(12 + 8 * abs(wobble) + 4 * phase, 1)
+    if "pressure" in variable:
+        return round(1013 + 8 * wobble, 1)
+    if "radiation" in variable or "irradiance" in variable:
+        return round(max(0.0, 850 * phase), 1)
+    if variable.startswith("uv_index"):
+        return round(max(0.0, 10 * phase), 2)
+    if "visibility" in variable:
+        return round(24000 + 8000 * wobble, 0)
+    if "wave_height" in variable:
+        return round(1.2 + abs(wobble), 2)
+    if "period" in variable:
+        return round(8 + 3 * wobble, 2)
+    if "aqi" in variable:
+        return int(45 + 30 * abs(wobble))
+    if variable.startswith(("pm", "ozone", "nitrogen", "sulphur", "carbon", "dust", "ammonia")):
+        return round(20 + 15 * abs(wobble), 1)
+    if "discharge" in variable:
+        return round(80 + 60 * abs(wobble) + 20 * season, 2)
+    if "duration" in variable:
+        return round(max(0.0, 36000 + 7200 * season), 0)
+    return round(50 + 20 * wobble, 2)
+
+
+def _unit(variable: str) -> str:
+    for fragment, unit in (
+        ("temperature", "°C"), ("humidity", "%"), ("cloud_cover", "%"), ("probability", "%"),
+        ("precipitation", "mm"), ("rain", "mm"), ("snowfall", "cm"), ("direction", "°"),
+        ("wind", "km/h"), ("gust", "km/h"), ("pressure", "hPa"), ("radiation", "W/m²"),
+        ("wave_height", "m"), ("period", "s"), ("aqi", "EAQI"), ("discharge", "m³/s"),
+        ("visibility", "m"), ("duration", "s"), ("weather_code", "wmo code"),
+    ):
+        if fragment in variable:
+            return unit
+    return ""
+
+
+def _elevation(lat: float, lon: float) -> float:
+    return round(max(0.0, 400 + 380 * math.sin(lat * 0.3) * math.cos(lon * 0.2)), 1)
+
+
+def _search(name: str, count: int) -> Dict[str, Any]:
+    rng = random.Random(name)
+    results = []
+    for i in range(max(1, min(count, 10))):
+        lat, lon = rng.uniform(-60, 70), rng.uniform(-180, 180)
+        results.append({
+            "id": 1000 + i,
+            "name": name.title() if i == 0 else f"{name.title()} {i}",
+            "latitude": round(lat, 5),
+            "longitude": round(lon, 5),
+            "elevation": _elevation(lat, lon),
+            "feature_code": "PPLA",
+            "country_code": "XX",
+            "country": "Testland",
+            "admin1": "Region",
+            "timezone": "GMT",
+            "population": 100000 // (i + 1),
+        })
+    return {"results": results, "generationtime_ms": 0.4}
+
+
+def _reverse_geocode(lat: float, lon: float) -> Dict[str, Any]:
+    return {
+        "lat": str(lat),
+        "lon": str(lon),
+        "display_name": f"Town {round(lat, 1)}/{round(lon, 1)}, Region, Testland",
+        "address": {
+            "city": f"Town {round(lat, 1)}/{round(lon, 1)}",
+            "state": "Region",
+            "country": "Testland",
+            "country_code": "xx",
+        },
+    }
+
+
+def overrides(base_url: str) -> Dict[str, str]:
+    """UPSTREAM_BASE_URL_OVERRIDES mapping every upstream host to this server"""
+    base_url = base_url.rstrip("/")
+    return {host: f"{base_url}/{host}" for host in UPSTREAM_HOSTS}
+
+
+def main(argv: Optional[List[str]] = None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    defaults = FaultConfig()
+    for name, value in defaults.as_dict().items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args(argv)
+    faults.update({name: getattr(args, name) for name in defaults.as_dict()})
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
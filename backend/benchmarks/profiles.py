@@ -0,0 +1,154 @@
+"""
+Load Profiles
+Request mixes replayed by the benchmark runner: cache-hit-heavy, miss-heavy and mixed traffic
+"""
+
+import bisect
+import itertools
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Tuple
+
+# Popular cities, the working set of hit-heavy traffic
+CITIES: List[Tuple[float, float]] = [
+    (12.9716, 77.5946), (28.6139, 77.2090), (19.0760, 72.8777), (51.5074, -0.1278),
+    (40.7128, -74.0060), (35.6762, 139.6503), (48.8566, 2.3522), (-33.8688, 151.2093),
+    (37.7749, -122.4194), (55.7558, 37.6173), (-23.5505, -46.6333), (30.0444, 31.2357),
+    (1.3521, 103.8198), (52.5200, 13.4050), (41.9028, 12.4964), (25.2048, 55.2708),
+    (34.0522, -118.2437), (-1.2921, 36.8219), (43.6532, -79.3832), (39.9042, 116.4074),
+]
+CITY_NAMES = ["Bangalore", "Delhi", "Mumbai", "London", "New York", "Tokyo", "Paris", "Sydney"]
+
+# Archive data ends a few days before "today"; fixed dates keep runs comparable
+ARCHIVE_END = date(2025, 12, 31)
+
+
+@dataclass
+class Profile:
+    """A named request mix; next_request returns the path (with query) of one GET"""
+
+    name: str
+    description: str
+    next_request: Callable[[random.Random], str]
+
+
+class Weighted:
+    """Picks one of several request builders by weight"""
+
+    def __init__(self, choices: Dict[Callable[..., str], float]):
+        self.builders = list(choices)
+        self.cumulative = list(itertools.accumulate(choices.values()))
+
+    def pick(self, rng: random.Random) -> Callable[..., str]:
+        return self.builders[bisect.bisect(self.cumulative, rng.random() * self.cumulative[-1])]
+
+
+class Zipf:
+    """Zipf-distributed ranks 0..n-1: a few very popular items and a long tail"""
+
+    def __init__(self, n: int, exponent: float = 1.1):
+        self.cumulative = list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(n)))
+
+    def sample(self, rng: random.Random) -> int:
+        return bisect.bisect(self.cumulative, rng.random() * self.cumulative[-1])
+
+
+# ============================================================================
+# REQUEST BUILDERS
+# ============================================================================
+
+def current(lat: float, lon: float, rng: random.Random) -> str:
+    return f"/api/weather/current?lat={lat}&lon={lon}"
+
+
+def forecast(lat: float, lon: float, rng: random.Random) -> str:
+    return f"/api/weather/forecast?lat={lat}&lon={lon}&days=7"
+
+
+def air_quality(lat: float, lon: float, rng: random.Random) -> str:
+    return f"/api/air-quality/current?lat={lat}&lon={lon}"
+
+
+def marine(lat: float, lon: float, rng: random.Random) -> str:
+    return f"/api/marine/current?lat={lat}&lon={lon}"
+
+
+def solar(lat: float, lon: float, rng: random.Random) -> str:
+    return f"/api/solar/current?lat={lat}&lon={lon}"
+
+
+def flood(lat: float, lon: float, rng: random.Random) -> str:
+    return f"/api/flood/forecast?lat={lat}&lon={lon}"
+
+
+def elevation(lat: float, lon: float, rng: random.Random) -> str:
+    return f"/api/elevation?lat={lat}&lon={lon}"
+
+
+def dashboard(lat: float, lon: float, rng: random.Random) -> str:
+    return f"/api/dashboard?lat={lat}&lon={lon}&sections=current,forecast,air_quality,solar"
+
+
+def historical(lat: float, lon: float, rng: random.Random) -> str:
+    end = ARCHIVE_END - timedelta(days=rng.randrange(0, 365 * 3))
+    start = end - timedelta(days=rng.choice([7, 30, 90, 365]))
+    return f"/api/historical/weather?lat={lat}&lon={lon}&start_date={start}&end_date={end}"
+
+
+def historical_hourly(lat: float, lon: float, rng: random.Random) -> str:
+    end = ARCHIVE_END - timedelta(days=rng.randrange(0, 365))
+    start = end - timedelta(days=rng.choice([1, 7, 31]))
+    return f"/api/historical/hourly?lat={lat}&lon={lon}&start_date={start}&end_date={end}"
+
+
+def climate(lat: float, lon: float, rng: random.Random) -> str:
+    return f"/api/climate/projections?lat={lat}&lon={lon}&start_date=2030-01-01&end_date=2035-12-31"
+
+
+def search(lat: float, lon: float, rng: random.Random) -> str:
+    return f"/api/geocoding/search?query={rng.choice(CITY_NAMES)}&count=5"
+
+
+# ============================================================================
+# PROFILES
+# ============================================================================
+
+def _hit_heavy() -> Profile:
+    mix = Weighted({forecast: 35, current: 30, air_quality: 10, solar: 10, marine: 5, search: 5, dashboard: 5})
+
+    def next_request(rng: random.Random) -> str:
+        lat, lon = rng.choice(CITIES)
+        return mix.pick(rng)(lat, lon, rng)
+
+    return Profile("hit-heavy", "20 popular cities, live endpoints; nearly every request is a cache hit", next_request)
+
+
+def _miss_heavy() -> Profile:
+    mix = Weighted({forecast: 30, current: 25, air_quality: 10, historical: 15, elevation: 10, flood: 10})
+
+    def next_request(rng: random.Random) -> str:
+        # Random points at 4 decimals land in a new ~11 km grid cell almost every time
+        lat, lon = round(rng.uniform(-60, 70), 4), round(rng.uniform(-180, 180), 4)
+        return mix.pick(rng)(lat, lon, rng)
+
+    return Profile("miss-heavy", "Uniformly random coordinates and date ranges; nearly every request goes upstream", next_request)
+
+
+def _mixed() -> Profile:
+    rng = random.Random(42)
+    locations = CITIES + [(round(rng.uniform(-60, 70), 3), round(rng.uniform(-180, 180), 3)) for _ in range(4980)]
+    popularity = Zipf(len(locations))
+    mix = Weighted({
+        forecast: 30, current: 25, air_quality: 8, solar: 5, marine: 4, flood: 3, elevation: 3,
+        dashboard: 8, historical: 7, historical_hourly: 3, climate: 2, search: 2,
+    })
+
+    def next_request(rng: random.Random) -> str:
+        lat, lon = locations[popularity.sample(rng)]
+        return mix.pick(rng)(lat, lon, rng)
+
+    return Profile("mixed", "Zipf-popular locations over 5000 points, every endpoint family", next_request)
+
+
+PROFILES: Dict[str, Profile] = {profile.name: profile for profile in (_hit_heavy(), _miss_heavy(), _mixed())}
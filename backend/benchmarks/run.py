@@ -0,0 +1,334 @@
+"""
+Benchmark Runner
+Starts the fake upstream and the API (uvicorn, app.main:app) as subprocesses,
+replays load profiles against the API and reports latency percentiles,
+throughput, upstream calls and RSS growth as JSON that can be compared
+between commits
+
+Run from the backend directory:
+    python -m benchmarks.run --profile all --duration 30 --concurrency 32
+    python -m benchmarks.compare benchmarks/results/<before>.json benchmarks/results/<after>.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+import httpx
+from benchmarks.compare import format_comparison
+from benchmarks.fake_upstream import FaultConfig, overrides
+from benchmarks.profiles import PROFILES, Profile
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+# ============================================================================
+# PROCESSES
+# ============================================================================
+
+def _start(args: List[str], env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], cwd=BACKEND_DIR, env=env)
+
+
+def _stop(process: subprocess.Popen):
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+async def _wait_ready(client: httpx.AsyncClient, url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with status {process.returncode} during startup")
+        try:
+            if (await client.get(url)).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s")
+
+
+def _api_env(fake_url: str, extra: List[str]) -> Dict[str, str]:
+    """API settings for a benchmark run: upstreams on the fake, no quotas, nothing persisted between runs"""
+    env = dict(os.environ)
+    env.update({
+        "UPSTREAM_BASE_URL_OVERRIDES": json.dumps(overrides(fake_url)),
+        "UPSTREAM_RATE_LIMITS": "{}",
+        "CACHE_DISK_PATH": "",
+        "TRACING_EXPORTER": "none",
+    })
+    for assignment in extra:
+        name, _, value = assignment.partition("=")
+        env[name.upper()] = value
+    return env
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """Resident memory of a process and its children (uvicorn workers), from /proc; None elsewhere"""
+    total = 0
+    pending = [pid]
+    try:
+        while pending:
+            current = pending.pop()
+            with open(f"/proc/{current}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+            try:
+                with open(f"/proc/{current}/task/{current}/children") as children:
+                    pending.extend(int(child) for child in children.read().split())
+            except OSError:
+                pass
+    except (OSError, ValueError):
+        return None
+    return total
+
+
+# ============================================================================
+# LOAD
+# ============================================================================
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+async def run_profile(
+    profile: Profile,
+    api: httpx.AsyncClient,
+    fake: httpx.AsyncClient,
+    pid: int,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    seed: int,
+) -> Dict[str, Any]:
+    """
+    Closed-loop load: concurrency workers each issue the profile's requests back to back
+
+    The first warmup seconds are excluded from the statistics, except RSS
+    growth, which is measured from the idle process to the end of the run.
+    """
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    transport_errors: Counter = Counter()
+    rss_samples: List[int] = []
+    measuring = False
+    started = time.monotonic()
+    end = started + warmup + duration
+
+    async def worker(worker_id: int):
+        rng = random.Random(seed * 1000 + worker_id)
+        while time.monotonic() < end:
+            path = profile.next_request(rng)
+            request_started = time.perf_counter()
+            try:
+                response = await api.get(path)
+                await response.aread()
+                outcome = response.status_code
+            except httpx.HTTPError as e:
+                outcome = None
+                if measuring:
+                    transport_errors[type(e).__name__] += 1
+            elapsed = time.perf_counter() - request_started
+            if measuring and outcome is not None:
+                latencies.append(elapsed)
+                statuses[outcome] += 1
+
+    async def sample_rss():
+        while True:
+            rss = rss_bytes(pid)
+            if rss is not None:
+                rss_samples.append(rss)
+            await asyncio.sleep(0.5)
+
+    rss_start = rss_bytes(pid)
+    sampler = asyncio.create_task(sample_rss())
+    workers = [asyncio.create_task(worker(i)) for i in range(concurrency)]
+
+    await asyncio.sleep(warmup)
+    upstream_before = (await fake.get("/_fake/stats")).json()["requests"]
+    measuring = True
+    measure_started = time.monotonic()
+    await asyncio.gather(*workers)
+    elapsed = time.monotonic() - measure_started
+    upstream_after = (await fake.get("/_fake/stats")).json()["requests"]
+    sampler.cancel()
+    rss_end = rss_bytes(pid)
+
+    latencies.sort()
+    completed = len(latencies)
+    to_ms = lambda seconds: round(seconds * 1000, 2)  # noqa: E731
+    report: Dict[str, Any] = {
+        "description": profile.description,
+        "requests": completed,
+        "rps": round(completed / elapsed, 1) if elapsed > 0 else 0.0,
+        "error_rate": round(sum(n for s, n in statuses.items() if s >= 500) / completed, 4) if completed else 0.0,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "transport_errors": dict(transport_errors),
+        "latency_ms": {
+            "p50": to_ms(percentile(latencies, 0.50)),
+            "p95": to_ms(percentile(latencies, 0.95)),
+            "p99": to_ms(percentile(latencies, 0.99)),
+            "mean": to_ms(sum(latencies) / completed) if completed else 0.0,
+            "max": to_ms(latencies[-1]) if latencies else 0.0,
+        },
+        "upstream_requests": upstream_after - upstream_before,
+        "upstream_per_request": round((upstream_after - upstream_before) / completed, 3) if completed else 0.0,
+    }
+    if rss_start is not None and rss_end is not None:
+        mib = lambda value: round(value / 2 ** 20, 1)  # noqa: E731
+        report["rss_mib"] = {
+            "start": mib(rss_start),
+            "end": mib(rss_end),
+            "peak": mib(max(rss_samples + [rss_end])),
+            "growth": mib(rss_end - rss_start),
+        }
+    return report
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def _git_revision() -> str:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--", "app"], cwd=BACKEND_DIR, capture_output=True, text=True).stdout
+        return revision + ("-dirty" if dirty.strip() else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    names = list(PROFILES) if args.profile == "all" else args.profile.split(",")
+    unknown = [name for name in names if name not in PROFILES]
+    if unknown:
+        raise SystemExit(f"Unknown profile(s): {', '.join(unknown)} (available: {', '.join(PROFILES)})")
+
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    api_url = f"http://127.0.0.1:{args.api_port}"
+    fault_args = [
+        f"--{name.replace('_', '-')}={getattr(args, name)}" for name in FaultConfig().as_dict()
+    ]
+    fake_process = _start(["-m", "benchmarks.fake_upstream", "--port", str(args.fake_port), *fault_args])
+
+    report: Dict[str, Any] = {
+        "label": args.label or _git_revision(),
+        "revision": _git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "concurrency": args.concurrency,
+            "duration_seconds": args.duration,
+            "warmup_seconds": args.warmup,
+            "workers": args.workers,
+            "seed": args.seed,
+            "faults": {name: getattr(args, name) for name in FaultConfig().as_dict()},
+            "env": args.env,
+        },
+        "profiles": {},
+    }
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.request_timeout)
+    async with httpx.AsyncClient(base_url=fake_url) as fake, \
+            httpx.AsyncClient(base_url=api_url, limits=limits, timeout=timeout) as api:
+        try:
+            await _wait_ready(fake, "/_fake/stats", fake_process)
+            for name in names:
+                # A fresh API process per profile, so caches and RSS start from the same point
+                api_process = _start(
+                    ["-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(args.api_port),
+                     "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+                    env=_api_env(fake_url, args.env),
+                )
+                try:
+                    await _wait_ready(api, "/health", api_process)
+                    await fake.post("/_fake/reset")
+                    print(f"Running {name} for {args.warmup:g}s warmup + {args.duration:g}s ...", file=sys.stderr)
+                    report["profiles"][name] = await run_profile(
+                        PROFILES[name], api, fake, api_process.pid,
+                        args.concurrency, args.duration, args.warmup, args.seed,
+                    )
+                finally:
+                    _stop(api_process)
+        finally:
+            _stop(fake_process)
+    return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [
+        f"{report['label']} ({report['revision']}, {report['timestamp']})",
+        f"{'profile':<12}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>9}{'up/req':>8}{'rss +MiB':>10}",
+    ]
+    for name, result in report["profiles"].items():
+        latency = result["latency_ms"]
+        growth = result.get("rss_mib", {}).get("growth", "n/a")
+        lines.append(
+            f"{name:<12}{result['rps']:>9}{latency['p50']:>9}{latency['p95']:>9}{latency['p99']:>9}"
+            f"{result['error_rate']:>9.2%}{result['upstream_per_request']:>8}{growth:>10}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the API against a local fake Open-Meteo server")
+    parser.add_argument("--profile", default="all", help=f"all, or comma-separated of: {', '.join(PROFILES)}")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds per profile")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds before each measurement")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent client connections")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--request-timeout", type=float, default=30.0)
+    parser.add_argument("--api-port", type=int, default=9200)
+    parser.add_argument("--fake-port", type=int, default=9100)
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="extra API setting (repeatable)")
+    parser.add_argument("--label", help="report name (default: git revision)")
+    parser.add_argument("--output", type=Path, help="report path (default: benchmarks/results/<label>-<time>.json)")
+    parser.add_argument("--baseline", type=Path, help="earlier report to compare against")
+    defaults = FaultConfig()
+    for name, value in defaults.as_dict().items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value, help="fake upstream fault injection")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        output = RESULTS_DIR / f"{report['label']}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.write_text(json.dumps(report, indent=2) + "\n")
+
+    print(format_report(report))
+    if args.baseline:
+        print()
+        print(format_comparison(json.loads(args.baseline.read_text()), report))
+    print(f"\nReport written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
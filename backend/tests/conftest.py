@@ -0,0 +1,13 @@
+"""Shared test setup: an isolated configuration for the app package"""
+
+import os
+import sys
+from pathlib import Path
+
+# Keep tests off the persistent disk tier and span exporters, whatever .env says
+os.environ["CACHE_DISK_PATH"] = ""
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ["TRACING_EXPORTER"] = "none"
+os.environ["PREWARM_ENABLED"] = "false"
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
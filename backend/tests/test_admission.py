@@ -0,0 +1,26 @@
+"""Upstream admission: per-worker rate limit shares"""
+
+from app import admission
+from app.admission import RateLimit
+from app.config import settings
+
+
+def test_rate_limits_are_split_between_workers():
+    rate = RateLimit("open-meteo.com", [[600, 60], [10000, 86400]], workers=4)
+    assert [(bucket.capacity, bucket.rate) for bucket in rate.buckets] == [(150, 2.5), (2500, 10000 / 86400 / 4)]
+
+    # A quota smaller than the worker count keeps a burst of one and slows the refill instead
+    rate = RateLimit("nominatim.openstreetmap.org", [[1, 1]], workers=2)
+    assert [(bucket.capacity, bucket.rate) for bucket in rate.buckets] == [(1, 0.5)]
+
+
+def test_worker_count_falls_back_to_web_concurrency(monkeypatch):
+    monkeypatch.setattr(settings, "upstream_rate_limit_workers", 0)
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    assert admission._worker_count() == 1
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    assert admission._worker_count() == 3
+
+    monkeypatch.setattr(settings, "upstream_rate_limit_workers", 2)
+    assert admission._worker_count() == 2
@@ -0,0 +1,123 @@
+"""In-process cache: coalesced loads, batched loads, stale-while-revalidate and stale-if-error"""
+
+import asyncio
+import httpx
+import pytest
+from app import timing
+from app.cache import Cache, current_trace, start_trace
+from app.config import settings
+
+
+def test_background_refresh_runs_outside_the_request_context():
+    cache = Cache(max_entries=100, max_bytes=1 << 20)
+    namespace = cache.namespace("swr", ttl_seconds=0.05, stale_seconds=60)
+    seen = []
+
+    async def load():
+        seen.append((current_trace(), timing._frame.get()))
+        return len(seen)
+
+    async def main():
+        assert await namespace.get_or_load("key", load) == 1
+        await asyncio.sleep(0.06)
+
+        # A request: its own cache trace and timing frame
+        request_timing = timing.RequestTiming("0" * 32, "", sampled=False)
+        timing._frame.set(timing._Frame(request_timing, request_timing.span_id))
+        lookups = start_trace()
+
+        assert await namespace.get_or_load("key", load) == 1  # stale value, refresh scheduled
+        assert [lookup.status for lookup in lookups] == ["stale"]
+        await asyncio.gather(*namespace._refresh_tasks.values())
+
+        assert seen[1] == (None, None)
+        assert await namespace.get_or_load("key", load) == 2
+
+    asyncio.run(main())
+
+
+def test_zero_ttl_is_not_replaced_by_the_namespace_default():
+    cache = Cache(max_entries=100, max_bytes=1 << 20)
+    namespace = cache.namespace("ttl", ttl_seconds=300, stale_seconds=60)
+
+    assert not namespace.set("now-stale", "value", ttl_seconds=0).is_fresh
+    assert namespace.set("default", "value").is_fresh
+
+
+def test_concurrent_misses_share_one_load():
+    cache = Cache(max_entries=100, max_bytes=1 << 20)
+    namespace = cache.namespace("coalesce", ttl_seconds=60)
+    loads = []
+
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def main():
+        return await asyncio.gather(*(namespace.get_or_load("key", load) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["value"] * 5
+    assert len(loads) == 1
+
+
+def test_rejected_key_in_a_chunk_fails_alone():
+    cache = Cache(max_entries=100, max_bytes=1 << 20)
+    namespace = cache.namespace("chunks", ttl_seconds=300)
+    calls = []
+
+    async def load(keys):
+        calls.append(list(keys))
+        if "bad" in keys:
+            request = httpx.Request("GET", "https://api.open-meteo.com/v1/forecast")
+            raise httpx.HTTPStatusError("400 Bad Request", request=request, response=httpx.Response(400, request=request))
+        return [key.upper() for key in keys]
+
+    values = asyncio.run(namespace.get_or_load_many(["a", "bad", "b"], load))
+
+    assert values[0] == "A" and values[2] == "B"
+    assert isinstance(values[1], httpx.HTTPStatusError)
+    assert calls == [["a", "bad", "b"], ["a"], ["bad"], ["b"]]
+    assert namespace.get("a") == "A" and namespace.get("bad") is None
+
+
+def test_stale_values_are_served_while_one_refresh_runs():
+    cache = Cache(max_entries=100, max_bytes=1 << 20)
+    namespace = cache.namespace("stale", ttl_seconds=0.05, stale_seconds=60)
+    loads = []
+
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.02)
+        return len(loads)
+
+    async def main():
+        await namespace.get_or_load("key", load)
+        await asyncio.sleep(0.06)
+
+        # Every stale read answers at once with the old value; only one refresh starts
+        assert await asyncio.gather(*(namespace.get_or_load("key", load) for _ in range(3))) == [1, 1, 1]
+        assert len(namespace._refresh_tasks) == 1
+        await asyncio.gather(*namespace._refresh_tasks.values())
+        assert len(loads) == 2 and await namespace.get_or_load("key", load) == 2
+
+    asyncio.run(main())
+    assert cache.stats()["namespaces"]["stale"]["stale_hits"] == 3
+
+
+def test_expired_value_answers_a_failed_load(monkeypatch):
+    monkeypatch.setattr(settings, "cache_stale_if_error_seconds", 60)
+    cache = Cache(max_entries=100, max_bytes=1 << 20)
+    namespace = cache.namespace("fallback", ttl_seconds=0.02, stale_seconds=0)
+
+    async def failing():
+        raise RuntimeError("upstream down")
+
+    async def main():
+        namespace.set("key", "old")
+        await asyncio.sleep(0.03)
+        assert await namespace.get_or_load("key", failing) == "old"
+        with pytest.raises(RuntimeError):
+            await namespace.get_or_load("other", failing)
+
+    asyncio.run(main())
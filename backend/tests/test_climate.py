@@ -0,0 +1,18 @@
+"""Climate routes: request validation"""
+
+import asyncio
+import httpx
+from app.main import app
+
+
+def test_unknown_emission_scenario_is_a_client_error():
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/api/climate/scenarios", params={
+                "lat": 12.97, "lon": 77.59, "start_date": "2030-01-01", "end_date": "2030-12-31",
+                "scenarios": "ssp245,ssp999",
+            })
+        assert response.status_code == 400
+        assert response.json()["message"] == "Unknown emission scenario(s): ssp999"
+
+    asyncio.run(main())
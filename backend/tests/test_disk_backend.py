@@ -0,0 +1,98 @@
+"""Persistent disk store: running byte total, LRU eviction and path resolution"""
+
+import asyncio
+import os
+import sqlite3
+from app import cache_backends
+from app.cache_backends import DiskCacheBackend, create_disk_backend
+from app.config import settings
+
+
+def test_only_the_disk_table_is_created(tmp_path):
+    async def main():
+        backend = DiskCacheBackend(str(tmp_path / "cache.sqlite3"), 1 << 20)
+        await backend.set("key", b"value" * 100, 60)
+        assert await backend.get("key") == b"value" * 100
+        await backend.close()
+
+    asyncio.run(main())
+    conn = sqlite3.connect(tmp_path / "cache.sqlite3")
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert tables == {"disk_cache", "disk_cache_meta"}
+
+
+def stored_sizes(path):
+    conn = sqlite3.connect(path)
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM disk_cache").fetchone()[0]
+    tracked = conn.execute("SELECT value FROM disk_cache_meta WHERE name = 'bytes'").fetchone()[0]
+    conn.close()
+    return total, tracked
+
+
+def test_running_total_tracks_every_write(tmp_path):
+    async def main():
+        path = str(tmp_path / "cache.sqlite3")
+        backend = DiskCacheBackend(path, 1 << 20)
+        await backend.set("a", os.urandom(1000), 60)
+        await backend.set("b", os.urandom(2000), 60)
+        await backend.set("a", os.urandom(500), 60)
+        await backend.set("old", os.urandom(700), -1)
+        total, tracked = stored_sizes(path)
+        assert total == tracked == backend.usage()["bytes"] > 3200
+
+        await backend.delete("b")
+        await backend.delete("missing")
+        assert await backend.purge_expired() == 1
+        total, tracked = stored_sizes(path)
+        assert total == tracked == backend.usage()["bytes"] < 600
+        await backend.close()
+
+    asyncio.run(main())
+
+
+def test_usage_is_shared_between_processes(tmp_path):
+    async def main():
+        path = str(tmp_path / "cache.sqlite3")
+        first, second = DiskCacheBackend(path, 1 << 20), DiskCacheBackend(path, 1 << 20)
+        await first.set("a", os.urandom(1000), 60)
+        await second.set("b", os.urandom(2000), 60)
+        assert second.usage()["bytes"] > 3000
+
+        # Each process reads the shared total back on its next write or purge
+        await second.delete("a")
+        await first.purge_expired()
+        assert 2000 < first.usage()["bytes"] == second.usage()["bytes"] < 3000
+        await first.close()
+        await second.close()
+
+    asyncio.run(main())
+
+
+def test_eviction_drops_least_recently_read_entries(tmp_path, monkeypatch):
+    clock = iter(range(1_000_000, 2_000_000))
+    monkeypatch.setattr(cache_backends.time, "time", lambda: float(next(clock)))
+
+    async def main():
+        # Random bytes do not compress, so each entry costs a little over 1000 bytes
+        backend = DiskCacheBackend(str(tmp_path / "cache.sqlite3"), 5000)
+        for key in "abcd":
+            await backend.set(key, os.urandom(1000), 3600)
+        assert await backend.get("a") is not None
+
+        await backend.set("e", os.urandom(1000), 3600)
+        assert backend.usage()["bytes"] <= 5000 * 0.9
+        assert [key for key in "abcde" if await backend.get(key) is not None] == ["a", "c", "d", "e"]
+        assert stored_sizes(backend.path) == (backend.usage()["bytes"],) * 2
+        await backend.close()
+
+    asyncio.run(main())
+
+
+def test_relative_disk_path_resolves_against_the_backend_directory(monkeypatch):
+    monkeypatch.setattr(settings, "cache_disk_path", "data/cache.sqlite3")
+    backend = create_disk_backend()
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(cache_backends.__file__)))
+    assert backend.path == os.path.join(backend_dir, "data", "cache.sqlite3")
+
+    monkeypatch.setattr(settings, "cache_disk_path", "")
+    assert create_disk_backend() is None
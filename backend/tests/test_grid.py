@@ -0,0 +1,57 @@
+"""Grid snapping of cache-key coordinates and per-cell encoded bodies"""
+
+from app.config import settings
+from app.encoding import EncodedBodyCache, encode_json
+from app.grid import echo_coordinates, snap
+from app.models import CurrentWeather, CurrentWeatherResponse, LocationInfo, WeatherUnits
+
+
+def test_nearby_points_share_a_grid_point(monkeypatch):
+    monkeypatch.setitem(settings.grid_resolution_degrees, "forecast", 0.1)
+
+    assert snap("forecast", 12.9716, 77.5946) == (13.0, 77.6)
+    assert snap("forecast", 12.9549, 77.6049) == (13.0, 77.6)
+    assert snap("forecast", -33.8688, 151.2093) == (-33.9, 151.2)
+
+
+def test_snapping_stays_on_the_globe(monkeypatch):
+    monkeypatch.setitem(settings.grid_resolution_degrees, "coarse", 0.4)
+
+    assert snap("coarse", 89.9, 0.0) == (90.0, 0.0)
+    assert snap("coarse", -89.9, 0.0) == (-90.0, 0.0)
+    assert snap("coarse", 0.0, 179.9) == (0.0, 180.0)
+    assert snap("coarse", 0.0, -179.9) == (0.0, -180.0)
+
+
+def test_unconfigured_datasets_are_unchanged():
+    assert snap("no-such-dataset", 12.9716, 77.5946) == (12.9716, 77.5946)
+
+
+def test_echo_restores_the_caller_coordinates():
+    cached = {"latitude": 13.0, "longitude": 77.6, "current": {"temperature_2m": 24.5}}
+
+    echoed = echo_coordinates(cached, 12.9716, 77.5946)
+
+    assert echoed == {"latitude": 12.9716, "longitude": 77.5946, "current": {"temperature_2m": 24.5}}
+    assert cached["latitude"] == 13.0
+
+
+def test_encoded_bodies_are_shared_across_a_grid_cell():
+    cached = CurrentWeatherResponse(
+        location=LocationInfo(latitude=13.0, longitude=77.6, timezone="Asia/Kolkata", elevation=920.0),
+        current=CurrentWeather(
+            time="2024-06-01T12:00", temperature=24.5, apparent_temperature=25.1, weather_code=3,
+            weather_description="Overcast", humidity=70, pressure=1008.0, wind_speed=12.0,
+            wind_direction=250, wind_gusts=20.0, cloud_cover=90, precipitation=0.0,
+        ),
+        units=WeatherUnits(),
+    )
+    bodies = EncodedBodyCache("test-grid")
+
+    for lat, lon in ((12.9716, 77.5946), (12.9549, 77.6049)):
+        body = bodies.render_located("current:13.0:77.6:metric", cached, lat, lon)
+        location = cached.location.model_copy(update={"latitude": lat, "longitude": lon})
+        assert body == encode_json(cached.model_copy(update={"location": location}))
+
+    assert bodies.stats()["entries"] == 1
+    assert (bodies.hits, bodies.misses) == (1, 1)
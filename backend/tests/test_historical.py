@@ -0,0 +1,169 @@
+"""Historical range splitting, block caching and stitching"""
+
+import asyncio
+import json
+from datetime import date, timedelta
+import httpx
+import pytest
+from app.config import settings
+from app.encoding import ndjson_response
+from app.main import app
+from app.services.historical_service import HistoricalWeatherService
+
+
+def archive_fetch(calls, section="hourly"):
+    """Upstream stub returning an archive-shaped payload for each requested range"""
+
+    async def fetch(latitude, longitude, start_date, end_date):
+        calls.append((start_date, end_date))
+        start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+        days = [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+        times = days if section == "daily" else [f"{day}T{hour:02d}:00" for day in days for hour in range(24)]
+        return {
+            "latitude": latitude,
+            "longitude": longitude,
+            "timezone": "GMT",
+            section: {"time": times, "temperature_2m": [float(i) for i in range(len(times))]},
+        }
+
+    return fetch
+
+
+def test_calendar_blocks_are_whole_years():
+    service = HistoricalWeatherService()
+
+    blocks = service._calendar_blocks(date(1999, 3, 15), date(2001, 6, 1))
+
+    assert blocks == [
+        (date(1999, 1, 1), date(1999, 12, 31)),
+        (date(2000, 1, 1), date(2000, 12, 31)),
+        (date(2001, 1, 1), date(2001, 12, 31)),
+    ]
+
+
+def test_hourly_ranges_use_one_request_per_year():
+    service = HistoricalWeatherService()
+    calls = []
+
+    data = asyncio.run(service._load_blocks(
+        "hourly", 10.1, 20.1, "1990-01-01", "2019-12-31", archive_fetch(calls)
+    ))
+
+    assert len(calls) == 30
+    times = data["hourly"]["time"]
+    assert times[0] == "1990-01-01T00:00" and times[-1] == "2019-12-31T23:00"
+    assert len(times) == len(set(times)) == (date(2020, 1, 1) - date(1990, 1, 1)).days * 24
+
+
+
+def test_stitched_blocks_are_trimmed_to_the_requested_range():
+    service = HistoricalWeatherService()
+    blocks = [
+        {"timezone": "GMT", "daily": {"time": ["2000-12-30", "2000-12-31"], "temperature_2m_max": [1.0, 2.0]}},
+        {"timezone": "GMT", "daily": {"time": ["2001-01-01", "2001-01-02"], "temperature_2m_max": [3.0, None]}},
+    ]
+
+    data = service._stitch_blocks(blocks, "daily", "2000-12-31", "2001-01-01")
+
+    assert data == {"timezone": "GMT", "daily": {"time": ["2000-12-31", "2001-01-01"], "temperature_2m_max": [2.0, 3.0]}}
+
+
+def test_compact_dates_are_normalised_before_trimming():
+    service = HistoricalWeatherService()
+
+    data = asyncio.run(service._load_blocks(
+        "daily", 10.3, 20.3, "20000301", "20000303", archive_fetch([], section="daily")
+    ))
+
+    assert data["daily"]["time"] == ["2000-03-01", "2000-03-02", "2000-03-03"]
+
+
+@pytest.mark.parametrize("start_date, end_date", [
+    ("20000301", "2000-03-31"),
+    ("2000-02-30", "2000-03-31"),
+    ("2000-03-31", "2000-03-01"),
+])
+def test_historical_routes_reject_malformed_dates(start_date, end_date):
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            for path in ("/api/historical/weather", "/api/historical/hourly", "/api/historical/stats"):
+                response = await client.get(path, params={
+                    "lat": 12.97, "lon": 77.59, "start_date": start_date, "end_date": end_date,
+                })
+                assert response.status_code == 400
+
+    asyncio.run(main())
+
+
+def test_overlapping_ranges_reuse_cached_blocks():
+    service = HistoricalWeatherService()
+    calls = []
+    fetch = archive_fetch(calls, "daily")
+
+    first = asyncio.run(service._load_blocks("daily", 14.1, 24.1, "2000-03-01", "2002-02-28", fetch))
+    second = asyncio.run(service._load_blocks("daily", 14.1, 24.1, "2001-06-01", "2003-01-31", fetch))
+
+    assert calls == [
+        ("2000-01-01", "2000-12-31"), ("2001-01-01", "2001-12-31"), ("2002-01-01", "2002-12-31"),
+        ("2003-01-01", "2003-12-31"),
+    ]
+    assert first["daily"]["time"][0] == "2000-03-01" and first["daily"]["time"][-1] == "2002-02-28"
+    assert second["daily"]["time"][0] == "2001-06-01" and second["daily"]["time"][-1] == "2003-01-31"
+    assert len(second["daily"]["time"]) == (date(2003, 2, 1) - date(2001, 6, 1)).days
+
+def failing_fetch(calls, status, fail_ranges):
+    """Archive stub answering `status` for the listed (start, end) ranges, wrapped like the real fetchers"""
+    ok = archive_fetch(calls)
+
+    async def fetch(latitude, longitude, start_date, end_date):
+        if (start_date, end_date) in fail_ranges:
+            calls.append((start_date, end_date))
+            request = httpx.Request("GET", "https://archive-api.open-meteo.com/v1/archive")
+            try:
+                httpx.Response(status, request=request).raise_for_status()
+            except httpx.HTTPError as e:
+                raise Exception(f"Failed to fetch hourly historical data: {e}") from e
+        return await ok(latitude, longitude, start_date, end_date)
+
+    return fetch
+
+
+def test_failed_block_is_retried_in_halves_unless_rejected():
+    service = HistoricalWeatherService()
+    year = {("2001-01-01", "2001-12-31")}
+
+    calls = []
+    data = asyncio.run(service._load_blocks("hourly", 11.1, 21.1, "2001-01-01", "2001-12-31", failing_fetch(calls, 502, year)))
+    assert calls == [("2001-01-01", "2001-12-31"), ("2001-01-01", "2001-07-02"), ("2001-07-03", "2001-12-31")]
+    assert len(data["hourly"]["time"]) == 365 * 24
+
+    calls = []
+    with pytest.raises(Exception, match="400 Bad Request"):
+        asyncio.run(service._load_blocks("hourly", 12.1, 22.1, "2001-01-01", "2001-12-31", failing_fetch(calls, 400, year)))
+    assert calls == [("2001-01-01", "2001-12-31")]
+
+
+def test_stream_reports_failed_blocks_and_continues(monkeypatch):
+    monkeypatch.setattr(settings, "historical_partial_results", True)
+    service = HistoricalWeatherService()
+    fetch = failing_fetch([], 400, {("2001-01-01", "2001-12-31")})
+
+    async def collect(start_date, end_date):
+        return [block async for block in service._stream_blocks("hourly", 13.1, 23.1, start_date, end_date, fetch)]
+
+    blocks = asyncio.run(collect("2000-06-01", "2002-01-31"))
+    assert [block["hourly"]["time"][0] if "hourly" in block else block["missing_range"]["start_date"] for block in blocks] == [
+        "2000-06-01T00:00", "2001-01-01", "2002-01-01T00:00"
+    ]
+    assert "400 Bad Request" in blocks[1]["missing_range"]["error"]
+
+    async def respond():
+        response = await ndjson_response(service._stream_blocks("hourly", 13.1, 23.1, "2001-03-01", "2002-01-02", fetch), "hourly")
+        return [json.loads(line) async for chunk in response.body_iterator for line in chunk.splitlines()]
+
+    lines = asyncio.run(respond())
+    assert "meta" in lines[0] and lines[1]["missing_range"]["end_date"] == "2001-12-31"
+    assert lines[2]["time"] == "2002-01-01T00:00" and len(lines) == 2 + 48
+
+    with pytest.raises(Exception, match="400 Bad Request"):
+        asyncio.run(collect("2001-02-01", "2001-03-01"))
@@ -0,0 +1,119 @@
+"""HTTP caching middleware: validators, 304s and stored-body replay"""
+
+import asyncio
+import httpx
+from fastapi import FastAPI
+from app.cache import Cache, mark_volatile
+from app.http_cache import HTTPCacheMiddleware
+
+
+def make_client():
+    """An app whose responses are built from one cache entry, wrapped in the middleware"""
+    cache = Cache(max_entries=100, max_bytes=1 << 20)
+    namespace = cache.namespace("test", ttl_seconds=60)
+    app = FastAPI()
+    runs = {"data": 0, "dashboard": 0}
+
+    async def load():
+        return {"values": list(range(500))}
+
+    @app.get("/data")
+    async def data():
+        runs["data"] += 1
+        return await namespace.get_or_load("values", load)
+
+    @app.get("/dashboard")
+    async def dashboard():
+        runs["dashboard"] += 1
+        mark_volatile()
+        return {**await namespace.get_or_load("values", load), "run": runs["dashboard"]}
+
+    transport = httpx.ASGITransport(app=HTTPCacheMiddleware(app, cache=cache))
+    return httpx.AsyncClient(transport=transport, base_url="http://test"), runs, namespace
+
+
+def test_etag_follows_the_cache_entry_behind_the_response():
+    async def main():
+        client, runs, namespace = make_client()
+        async with client:
+            first = await client.get("/data")
+            assert first.headers["etag"].startswith('W/"')
+            assert first.headers["cache-control"].startswith("public, max-age=")
+            assert "last-modified" in first.headers
+
+            cached = await client.get("/data", headers={"If-None-Match": first.headers["etag"]})
+            assert cached.status_code == 304 and cached.content == b""
+
+            # A new version of the entry changes the validator
+            namespace.set("values", {"values": [1, 2, 3]})
+            changed = await client.get("/data", headers={"If-None-Match": first.headers["etag"]})
+            assert changed.status_code == 200 and changed.json() == {"values": [1, 2, 3]}
+            assert changed.headers["etag"] != first.headers["etag"]
+            assert runs["data"] == 2
+
+    asyncio.run(main())
+
+
+def test_not_modified_carries_the_same_vary_as_the_full_response():
+    async def main():
+        client, runs, _ = make_client()
+        async with client:
+            first = await client.get("/data", headers={"Accept-Encoding": "gzip"})
+            assert first.headers["vary"] == "Accept-Encoding"
+            assert first.headers["content-encoding"] == "gzip"
+
+            again = await client.get("/data", headers={"If-None-Match": first.headers["etag"]})
+            assert again.status_code == 304
+            assert again.headers["vary"] == "Accept-Encoding"
+            assert again.headers["etag"] == first.headers["etag"]
+            assert runs["data"] == 1
+
+    asyncio.run(main())
+
+
+def test_head_from_a_stored_record_sends_headers_only():
+    async def main():
+        client, runs, _ = make_client()
+        async with client:
+            full = await client.get("/data", headers={"Accept-Encoding": "identity"})
+            head = await client.head("/data", headers={"Accept-Encoding": "identity"})
+            assert head.status_code == 200 and head.content == b""
+            assert head.headers["content-length"] == str(len(full.content))
+            assert head.headers["etag"] == full.headers["etag"]
+            assert runs["data"] == 1
+
+    asyncio.run(main())
+
+
+def test_volatile_bodies_are_validated_but_not_replayed():
+    async def main():
+        client, runs, _ = make_client()
+        async with client:
+            first = await client.get("/dashboard")
+            second = await client.get("/dashboard")
+            assert (first.json()["run"], second.json()["run"]) == (1, 2)
+            assert first.headers["etag"] == second.headers["etag"]
+
+            again = await client.get("/dashboard", headers={"If-None-Match": first.headers["etag"]})
+            assert again.status_code == 304 and runs["dashboard"] == 2
+
+    asyncio.run(main())
+
+
+def test_replayed_records_count_as_hits_on_their_entries():
+    async def main():
+        client, runs, namespace = make_client()
+        cache = namespace.cache
+        async with client:
+            first = await client.get("/data")
+            namespace.set("other", {"values": []})
+            hits = cache.namespace_stats()["test"]["hits"]
+
+            await client.get("/data")
+            await client.get("/data", headers={"If-None-Match": first.headers["etag"]})
+            assert runs["data"] == 1
+            assert cache.namespace_stats()["test"]["hits"] == hits + 2
+            # The replayed entry is now the most recently used, ahead of the later write
+            assert list(cache._entries)[-1] == ("test", "values")
+
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+"""Metrics: route label resolution and per-scrape cache snapshots"""
+
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+from app import metrics
+from app.cache import cache
+from app.config import settings
+from app.metrics import MetricsMiddleware
+
+
+def test_unmatched_paths_are_resolved_once_and_bounded(monkeypatch):
+    monkeypatch.setattr(settings, "metrics_enabled", True)
+    monkeypatch.setattr(settings, "metrics_max_routes", 2)
+    scans = []
+    route_template = metrics._route_template
+    monkeypatch.setattr(metrics, "_route_template", lambda scope: scans.append(scope["path"]) or route_template(scope))
+
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    middleware = MetricsMiddleware(app)
+
+    async def asgi(scope, receive, send):
+        # Starlette sets scope["app"] before its middleware stack runs
+        await middleware({**scope, "app": app}, receive, send)
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi), base_url="http://test") as client:
+            for path in ("/missing", "/missing", "/items/1", "/items/1", "/a", "/b", "/missing"):
+                await client.get(path)
+
+    asyncio.run(main())
+    # /missing was evicted from the unmatched paths by /a and /b, so it is scanned again
+    assert scans == ["/missing", "/items/1", "/a", "/b", "/missing"]
+    assert len(middleware._unmatched_paths) == 2
+    assert middleware._handles[("GET", "/items/1")].route == "/items/{item_id}"
+    assert middleware._unmatched_paths[("GET", "/missing")] is middleware._unmatched["GET"]
+
+
+def test_cache_stats_are_read_once_per_render(monkeypatch):
+    reads = []
+    namespace_stats = cache.namespace_stats
+    monkeypatch.setattr(cache, "namespace_stats", lambda: reads.append(1) or namespace_stats())
+    monkeypatch.setattr(cache, "stats", lambda: pytest.fail("full cache stats read during a scrape"))
+
+    metrics.registry.render()
+    assert len(reads) == 1
+    metrics.registry.render()
+    assert len(reads) == 2
@@ -0,0 +1,92 @@
+"""Micro-batching of single-point fetches"""
+
+import asyncio
+import httpx
+import pytest
+from app.config import settings
+from app.microbatch import MicroBatcher
+
+
+@pytest.fixture(autouse=True)
+def enable_microbatch(monkeypatch):
+    monkeypatch.setattr(settings, "microbatch_enabled", True)
+    monkeypatch.setattr(settings, "microbatch_window_ms", 1.0)
+
+
+def test_concurrent_points_share_one_fetch():
+    calls = []
+
+    async def fetch_many(points):
+        calls.append(list(points))
+        return [f"{lat},{lon}" for lat, lon in points]
+
+    async def main():
+        batcher = MicroBatcher("test-share", fetch_many)
+        return await asyncio.gather(*(batcher.submit((float(i), 0.0)) for i in range(3)))
+
+    assert asyncio.run(main()) == ["0.0,0.0", "1.0,0.0", "2.0,0.0"]
+    assert len(calls) == 1
+
+
+def test_short_result_list_fails_every_waiter_instead_of_hanging():
+    async def fetch_many(points):
+        return ["only one"]
+
+    async def main():
+        batcher = MicroBatcher("test-short", fetch_many)
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit((float(i), 0.0)) for i in range(3)), return_exceptions=True),
+            timeout=2,
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_rejected_point_fails_alone():
+    calls = []
+
+    async def fetch_many(points):
+        calls.append(list(points))
+        try:
+            if (99.0, 0.0) in points:
+                request = httpx.Request("GET", "https://api.open-meteo.com/v1/forecast")
+                response = httpx.Response(400, request=request)
+                raise httpx.HTTPStatusError("Latitude must be in range of -90 to 90°", request=request, response=response)
+            return [f"{lat},{lon}" for lat, lon in points]
+        except httpx.HTTPError as e:
+            # Services wrap upstream errors like this
+            raise Exception(f"Failed to fetch: {e}")
+
+    async def main():
+        batcher = MicroBatcher("test-reject", fetch_many)
+        return await asyncio.gather(
+            *(batcher.submit(point) for point in ((1.0, 0.0), (99.0, 0.0), (2.0, 0.0))), return_exceptions=True
+        )
+
+    first, rejected, last = asyncio.run(main())
+    assert (first, last) == ("1.0,0.0", "2.0,0.0")
+    assert str(rejected).startswith("Failed to fetch")
+    assert len(calls) == 4  # the batch, then each point alone
+
+
+def test_running_batches_are_referenced_until_done():
+    release = None
+
+    async def fetch_many(points):
+        await release.wait()
+        return [None] * len(points)
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        batcher = MicroBatcher("test-tasks", fetch_many)
+        waiter = asyncio.ensure_future(batcher.submit((1.0, 2.0)))
+        await asyncio.sleep(0.02)
+        assert len(batcher._tasks) == 1
+        release.set()
+        await waiter
+        await asyncio.sleep(0)
+        assert not batcher._tasks
+
+    asyncio.run(main())
@@ -0,0 +1,168 @@
+"""Redis L2 backend against an in-process RESP2 server"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+import pytest
+from app.cache_backends import RedisCacheBackend, RedisProtocolError, decode_entry, encode_entry
+from app.models import LocationInfo
+
+
+class FakeRedis:
+    """Just enough of Redis for the backend: GET, SET (with PX), DEL, PING, AUTH and SELECT"""
+
+    def __init__(self, password: Optional[str] = None):
+        self.password = password
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.commands: List[List[bytes]] = []
+        self.connections: List[asyncio.StreamWriter] = []
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections.append(writer)
+        try:
+            while True:
+                header = await reader.readline()
+                if not header:
+                    return
+                args = []
+                for _ in range(int(header[1:-2])):
+                    length = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                self.commands.append(args)
+                writer.write(self.reply(args))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def reply(self, args: List[bytes]) -> bytes:
+        name = args[0].upper()
+        if name == b"AUTH":
+            return b"+OK\r\n" if args[1].decode() == self.password else b"-WRONGPASS invalid password\r\n"
+        if name in (b"SELECT", b"PING"):
+            return b"+OK\r\n"
+        if name == b"SET":
+            expires = time.monotonic() + int(args[4]) / 1000 if len(args) > 4 and args[3].upper() == b"PX" else None
+            self.data[args[1]] = (args[2], expires)
+            return b"+OK\r\n"
+        if name == b"GET":
+            value, expires = self.data.get(args[1], (None, None))
+            if value is None or (expires is not None and expires <= time.monotonic()):
+                return b"$-1\r\n"
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        if name == b"DEL":
+            return b":%d\r\n" % int(self.data.pop(args[1], None) is not None)
+        return b"-ERR unknown command '%s'\r\n" % name
+
+    def drop_connections(self):
+        for writer in self.connections:
+            writer.close()
+        self.connections.clear()
+
+
+@asynccontextmanager
+async def redis_server(password: Optional[str] = None):
+    fake = FakeRedis(password)
+    server = await asyncio.start_server(fake.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    auth = f":{password}@" if password else ""
+    try:
+        yield fake, f"redis://{auth}127.0.0.1:{port}/2"
+    finally:
+        fake.drop_connections()
+        server.close()
+        await server.wait_closed()
+
+
+def test_set_get_and_delete_round_trip_entries():
+    async def main():
+        async with redis_server() as (fake, url):
+            backend = RedisCacheBackend(url)
+            assert await backend.get("missing") is None
+
+            model = LocationInfo(latitude=1.0, longitude=2.0, timezone="UTC", elevation=123.5)
+            await backend.set("model", encode_entry(model, 1.0, 2.0, 3.0), 60)
+            await backend.set("binary", b"\x00\r\n\xff", 60)
+
+            value, stored_at, fresh_until, expires_at = decode_entry(await backend.get("model"))
+            assert value == model and (stored_at, fresh_until, expires_at) == (1.0, 2.0, 3.0)
+            assert await backend.get("binary") == b"\x00\r\n\xff"
+
+            await backend.delete("binary")
+            assert await backend.get("binary") is None
+            assert [b"SELECT", b"2"] in fake.commands
+            await backend.close()
+
+    asyncio.run(main())
+
+
+def test_entries_expire_after_their_ttl():
+    async def main():
+        async with redis_server() as (fake, url):
+            backend = RedisCacheBackend(url)
+            await backend.set("short", b"value", 0.05)
+            assert fake.commands[-1][3:] == [b"PX", b"50"]
+            assert await backend.get("short") == b"value"
+            await asyncio.sleep(0.08)
+            assert await backend.get("short") is None
+            await backend.close()
+
+    asyncio.run(main())
+
+
+def test_error_replies_raise_and_keep_the_connection():
+    async def main():
+        async with redis_server() as (fake, url):
+            backend = RedisCacheBackend(url, pool_size=1)
+            with pytest.raises(RedisProtocolError, match="unknown command"):
+                await backend._execute("NOSUCHCOMMAND")
+            assert await backend.get("missing") is None
+            assert len(fake.connections) == 1
+            await backend.close()
+
+    asyncio.run(main())
+
+
+def test_password_is_sent_on_connect():
+    async def main():
+        async with redis_server(password="secret") as (fake, url):
+            backend = RedisCacheBackend(url)
+            await backend.set("key", b"value", 60)
+            assert fake.commands[0] == [b"AUTH", b"secret"]
+            await backend.close()
+
+        async with redis_server(password="secret") as (fake, url):
+            backend = RedisCacheBackend(url.replace("secret", "wrong"))
+            with pytest.raises(RedisProtocolError, match="WRONGPASS"):
+                await backend.get("key")
+
+    asyncio.run(main())
+
+
+def test_lost_connection_is_reopened():
+    async def main():
+        async with redis_server() as (fake, url):
+            backend = RedisCacheBackend(url)
+            await backend.set("key", b"value", 60)
+
+            # Server side drops every connection, e.g. a restart or idle timeout
+            fake.drop_connections()
+            await asyncio.sleep(0.01)
+
+            assert await backend.get("key") == b"value"
+            await backend.close()
+
+    asyncio.run(main())
+
+
+def test_unreachable_server_raises_connection_error():
+    async def main():
+        async with redis_server() as (_, url):
+            pass
+        backend = RedisCacheBackend(url)
+        with pytest.raises(OSError):
+            await backend.get("key")
+
+    asyncio.run(main())
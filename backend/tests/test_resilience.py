@@ -0,0 +1,159 @@
+"""Upstream retries, Retry-After handling and circuit breakers"""
+
+import asyncio
+import time
+import httpx
+import pytest
+from app.config import settings
+from app.resilience import CircuitBreaker, UpstreamUnavailableError, call_with_retries
+from benchmarks import fake_upstream
+
+FORECAST_URL = "http://fake/api.open-meteo.com/v1/forecast?latitude=1&longitude=2&current=temperature_2m"
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "upstream_retry_attempts", 3)
+    monkeypatch.setattr(settings, "upstream_retry_backoff_seconds", 0.0)
+    monkeypatch.setattr(settings, "upstream_retry_after_max_seconds", 1.0)
+    monkeypatch.setattr(settings, "upstream_breaker_failure_threshold", 2)
+    monkeypatch.setattr(settings, "upstream_breaker_reset_seconds", 0.05)
+
+
+@pytest.fixture
+def fake_faults():
+    """The fake upstream's fault injection, reset around each test"""
+    fake_upstream.faults.update({"latency_ms": 0.0, "error_rate": 0.0, "rate_limit_rate": 0.0, "timeout_rate": 0.0})
+    fake_upstream.requests_by_host.clear()
+    yield fake_upstream.faults
+    fake_upstream.faults.update({"error_rate": 0.0, "rate_limit_rate": 0.0})
+
+
+def scripted(*outcomes):
+    """A send() replaying status codes (or exceptions) in order, counting attempts"""
+    remaining = list(outcomes)
+    attempts = []
+
+    async def send():
+        attempts.append(time.monotonic())
+        outcome = remaining.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        status, headers = outcome if isinstance(outcome, tuple) else (outcome, {})
+        return httpx.Response(status, headers=headers)
+
+    return send, attempts
+
+
+def test_transient_failures_are_retried_until_success():
+    send, attempts = scripted(503, httpx.ConnectError("refused"), 200)
+    breaker = CircuitBreaker("retry.test")
+
+    response = asyncio.run(call_with_retries(breaker, send))
+
+    assert response.status_code == 200
+    assert len(attempts) == 3
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+
+def test_client_errors_are_not_retried():
+    send, attempts = scripted(404)
+
+    assert asyncio.run(call_with_retries(CircuitBreaker("4xx.test"), send)).status_code == 404
+    assert len(attempts) == 1
+
+
+def test_exhausted_retries_count_as_one_breaker_failure():
+    send, attempts = scripted(500, 502, 504)
+    breaker = CircuitBreaker("exhausted.test")
+
+    with pytest.raises(UpstreamUnavailableError):
+        asyncio.run(call_with_retries(breaker, send))
+
+    assert len(attempts) == 3
+    assert breaker.failures == 1
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retry_after_is_honored():
+    send, attempts = scripted((429, {"Retry-After": "0.2"}), 200)
+
+    asyncio.run(call_with_retries(CircuitBreaker("retry-after.test"), send))
+
+    assert attempts[1] - attempts[0] >= 0.19
+
+
+def test_long_retry_after_fails_without_waiting():
+    send, attempts = scripted((503, {"Retry-After": "60"}), 200)
+
+    with pytest.raises(UpstreamUnavailableError) as raised:
+        asyncio.run(call_with_retries(CircuitBreaker("long-retry-after.test"), send))
+
+    assert len(attempts) == 1
+    assert raised.value.retry_after == 60
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker("states.test")
+
+    async def main():
+        for _ in range(2):
+            send, _ = scripted(503, 503, 503)
+            with pytest.raises(UpstreamUnavailableError):
+                await call_with_retries(breaker, send)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        # Open: fails fast without sending
+        send, attempts = scripted(200)
+        with pytest.raises(UpstreamUnavailableError, match="circuit breaker open"):
+            await call_with_retries(breaker, send)
+        assert not attempts
+
+        # Half-open: a failed probe gets one attempt and reopens the breaker
+        await asyncio.sleep(0.06)
+        send, attempts = scripted(503, 200)
+        with pytest.raises(UpstreamUnavailableError):
+            await call_with_retries(breaker, send)
+        assert len(attempts) == 1
+        assert breaker.state == CircuitBreaker.OPEN
+
+        # Half-open again: a successful probe closes it
+        await asyncio.sleep(0.06)
+        send, attempts = scripted(200)
+        assert (await call_with_retries(breaker, send)).status_code == 200
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(main())
+    assert breaker.trips == 2
+
+
+def test_fault_injected_errors_against_fake_upstream(fake_faults):
+    fake_faults.update({"error_rate": 1.0, "error_status": 503})
+    breaker = CircuitBreaker("api.open-meteo.com")
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_upstream.app)) as client:
+            with pytest.raises(UpstreamUnavailableError):
+                await call_with_retries(breaker, lambda: client.get(FORECAST_URL))
+            assert fake_upstream.requests_by_host["api.open-meteo.com"] == 3
+
+            fake_faults.update({"error_rate": 0.0})
+            response = await call_with_retries(breaker, lambda: client.get(FORECAST_URL))
+            assert response.json()["current"]["temperature_2m"] is not None
+
+    asyncio.run(main())
+
+
+def test_fault_injected_rate_limits_are_retried_after_the_delay(fake_faults, monkeypatch):
+    monkeypatch.setattr(settings, "upstream_retry_after_max_seconds", 0.5)
+    fake_faults.update({"rate_limit_rate": 1.0})
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_upstream.app)) as client:
+            # The fake asks for Retry-After: 1, longer than we are willing to wait
+            with pytest.raises(UpstreamUnavailableError) as raised:
+                await call_with_retries(CircuitBreaker("rate-limited.test"), lambda: client.get(FORECAST_URL))
+            assert raised.value.retry_after == 1.0
+            assert fake_upstream.requests_by_host["api.open-meteo.com"] == 1
+
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+"""Single-flight coalescing of concurrent loads"""
+
+import asyncio
+import pytest
+from app.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test-shared")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def main():
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(10)))
+        assert results == ["value"] * 10
+        assert not flight.is_in_flight("key")
+        assert await flight.do("key", fetch) == "value"
+
+    asyncio.run(main())
+    assert len(calls) == 2
+    assert flight.stats() == {"executions": 2, "collapsed": 9, "in_flight": 0}
+
+
+def test_failure_reaches_every_waiter():
+    flight = SingleFlight("test-failure")
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(3)), return_exceptions=True)
+        assert [str(result) for result in results] == ["upstream down"] * 3
+
+    asyncio.run(main())
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_fetch():
+    flight = SingleFlight("test-cancel")
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "value"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", fetch))
+        second = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second == "value"
+
+    asyncio.run(main())